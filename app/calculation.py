@@ -2,165 +2,189 @@
 ## IS 601 Midterm
 ## Evan Garvey
 
-from dataclasses import dataclass, field
+from dataclasses import FrozenInstanceError
 import datetime
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal, InvalidOperation, localcontext
 import logging
-from typing import Any, Dict
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from app.exceptions import OperationError
+from app.exceptions import OperationError, ValidationError
+from app.operations import OperationFactory
+
+## Timestamps are kept as whole microseconds since this (naive) epoch and turned back into datetimes on demand
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds = 1)
+
+def _split_timestamp(timestamp: datetime.datetime) -> Tuple[int, Optional[datetime.tzinfo]]:
+
+    ## Splits a datetime into wall clock microseconds since the epoch and its tzinfo (None if naive)
+
+    ## Plain integer arithmetic on the timedelta, as dividing timedeltas is several times slower
+
+    tzinfo = timestamp.tzinfo
+    delta = (timestamp if tzinfo is None else timestamp.replace(tzinfo = None)) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds, tzinfo
+
+def _same_result(calculated: Decimal, saved: Decimal) -> bool:
+
+    ## Compares a recalculated result with a saved one, rounded to the saved result's last digit
+    ## The calculator works at a precision sized for each result, so a saved result may have
+    ## fewer (or more) digits than the default context gives, and still be right
+
+    if not (calculated.is_finite() and saved.is_finite()):
+
+        return calculated == saved
+
+    try:
+
+        with localcontext() as context:
+
+            context.prec = max(context.prec, calculated.adjusted() - saved.as_tuple().exponent + 1)
+            return calculated.quantize(saved) == saved
+
+    except InvalidOperation:
+
+        return False
 
 
-@dataclass
 class Calculation:
 
-    ## Calculation data class
+    ## Calculation class
     ## This class will handle what a calculation might deal with in its life cycle
     ## i.e., how it is created, validated, and executed
 
+    ## The history can hold a very large number of these, so the class is kept compact:
+    ## attributes live in __slots__ instead of a per-instance dict, operation names are interned,
+    ## and the timestamp is stored as an integer and only turned into a datetime when read
+
     ## Attributes:
     ## operation: str
     ## num1: Decimal
     ## num2: Decimal
-    ## result: Decimal
-    ## timestamp: datetime
+    ## result: Decimal (optional - calculated if not given)
+    ## timestamp: datetime (optional - now if not given)
+    ## verify: bool (init only - recalculate a given result and check it)
+    ## latency_ns: int (optional - how long the calculator took to produce it, set when it times operations; not saved)
+
+    __slots__ = ('operation', 'num1', 'num2', 'result', '_timestamp', '_tzinfo', 'latency_ns')
 
-    operation: str
-    num1: Decimal
-    num2: Decimal
-    result: Decimal = field(init = False)
-    timestamp: datetime.datetime = field(default_factory = datetime.datetime.now)
+    ## Calculations compare by value and are mutable, so they are not hashable (see FrozenCalculation)
 
-    def __post_init__(self):
+    __hash__ = None
 
-        ## Init method for the Calculation data class
+    def __init__(
+            self,
+            operation: str,
+            num1: Decimal,
+            num2: Decimal,
+            result: Optional[Decimal] = None,
+            timestamp: Optional[datetime.datetime] = None,
+            verify: bool = False
+    ):
+
+        ## Init method for the Calculation class
+        ## If the result was already computed (by an Operation, or read from a file) we keep it
+        ## as is, so each calculation is only evaluated once. Verify mode recalculates it anyway
 
         ## Params:
-        ## None
+        ## Operation / num1 / num2 / result / timestamp: see Attributes
+        ## Verify: bool
 
         ## Returns:
         ## None
 
-        self.result = self.calculate()
+        ## Operation names repeat constantly, so every calculation shares one copy of each
 
-    def calculate(self) -> Decimal:
+        self.operation = sys.intern(str(operation)) if isinstance(operation, str) else operation
+        self.num1 = num1
+        self.num2 = num2
+        self._timestamp, self._tzinfo = _split_timestamp(timestamp or datetime.datetime.now())
+        self.latency_ns = None
 
-        ## Calculates the result of the calculation
+        if result is None:
 
-        ## Params:
-        ## None
+            result = self.calculate()
 
-        ## Returns:
-        ## Decimal: The result of the calculation
+        elif verify:
 
-        ## Raises:
-        ## Exception: OperationError
+            ## Recalculated with at least as many digits as the saved result has
 
-        ## First we need to map our functions and how to do them
-        ## We will be utilizing lambda functions for this purpose
-
-        operations = {
-            "add": lambda x, y: x + y,
-            "subtract": lambda x, y: x - y,
-            "multiply": lambda x, y: x * y,
-            "divide": lambda x, y: x / y if y != 0 else self._raise_div_zero(),            
-            "power": lambda x, y: pow(x, y) 
-            if not (x == 0 and y < 0) 
-            else self._raise_invalid_power(),                      
-            "root": lambda x, y: (Decimal(
-                pow(float(x), 1 / float(y))
-            )) if x >= 0 and y != 0 else self._raise_invalid_root(x, y),                    
-            "modulo": lambda x, y: x % y if y != 0 else self._raise_mod_zero(),              
-            "integer division": lambda x, y: x // y if y != 0 else self._raise_div_zero(),   
-            "percentage calculation": lambda x, y: x * (y / 100),
-            "absolute difference": lambda x, y: abs(x - y)
-        }
+            with localcontext() as context:
 
-        ## Now we get our operation from self
+                context.prec = max(context.prec, len(result.as_tuple().digits) + 2)
+                calculated = self.calculate()
 
-        op = operations.get(self.operation)
+            if not _same_result(calculated, result):
 
-        if not op:
+                logging.error(f"Saved result {result} does not match calculated result {calculated}")
+                result = calculated
 
-            ## If the operation is invalid, pass the error
+        self.result = result
 
-            raise OperationError(f"Invalid operation: {self.operation}")
-        
-        
-        try:
+    @property
+    def timestamp(self) -> datetime.datetime:
 
-            ## Now we attempt a return
+        ## The time of the calculation, rebuilt from the stored microseconds
 
-            return op(self.num1, self.num2)
-        
-        except(InvalidOperation, ValueError, ArithmeticError) as e:
+        timestamp = _EPOCH + self._timestamp * _MICROSECOND
+        return timestamp if self._tzinfo is None else timestamp.replace(tzinfo = self._tzinfo)
 
-            ## If any errors occur, we catch them and pass the error
-            ## Had to pragma this as it is being covered by pytest and would not report
+    @timestamp.setter
+    def timestamp(self, value: datetime.datetime) -> None:
 
-            raise OperationError(f"Calculation failed: {str(e)}") # pragma: no cover
-        
-    @staticmethod
-    def _raise_div_zero():
+        self._timestamp, self._tzinfo = _split_timestamp(value)
 
-        ## Raises a division by zero error
+    def freeze(self) -> 'FrozenCalculation':
 
-        ## Params:
-        ## None
+        ## Returns an immutable, hashable copy of the calculation
 
-        ## Raises:
-        ## Exception: OperationError
+        return FrozenCalculation(self.operation, self.num1, self.num2, self.result, self.timestamp)
 
-        raise OperationError("Cannot divide by zero")
-    
-    @staticmethod
-    def _raise_mod_zero():
+    def calculate(self) -> Decimal:
 
-        ## Raises a modulo by zero error
+        ## Calculates the result of the calculation
 
         ## Params:
         ## None
 
+        ## Returns:
+        ## Decimal: The result of the calculation
+
         ## Raises:
         ## Exception: OperationError
 
-        raise OperationError("Cannot calculate modulo with zero")
-    
-    @staticmethod
-    def _raise_invalid_power():
+        ## The operations come from the same registry OperationFactory uses, already bound to a shared
+        ## instance, so a calculation does exactly what the matching Operation does
 
-        ## Raises an invalid power error
+        op = OperationFactory.dispatch.get(self.operation)
 
-        ## Params:
-        ## None
+        if not op:
 
-        ## Raises:
-        ## Exception: OperationError
+            ## If the operation is invalid, pass the error
 
-        raise OperationError("Cannot calculate zero to the power of a negative number")
-    
-    @staticmethod
-    def _raise_invalid_root(num1: Decimal, num2: Decimal):
+            raise OperationError(f"Invalid operation: {self.operation}")
+        
+        try:
 
-        ## Raises an invalid root error
+            ## Now we attempt a return
 
-        ## Params:
-        ## Num1: decimal
-        ## Num2: decimal
+            return op(self.num1, self.num2)
+        
+        except ValidationError as e:
 
-        ## Raises:
-        ## Exception: OperationError
+            ## Operations report bad operands as validation errors, a calculation reports them as operation errors
 
-        if num1 < 0:
+            raise OperationError(str(e))
 
-            raise OperationError("Cannot take the root of a negative number")
-        
-        if num2 == 0:
+        except(InvalidOperation, ValueError, ArithmeticError) as e:
 
-            raise OperationError("Cannot take the zeroth root of a number")
+            ## If any errors occur, we catch them and pass the error
+            ## Had to pragma this as it is being covered by pytest and would not report
+
+            raise OperationError(f"Calculation failed: {str(e)}") # pragma: no cover
         
-        raise OperationError("Invalid root operation")
-    
     def to_dict(self) -> Dict[str, Any]:
 
         ## Converts the calculation to a dictionary for serialization
@@ -179,34 +203,28 @@ class Calculation:
             'timestamp': self.timestamp.isoformat()
         }
     
-    def from_dict(data: Dict[str, Any]) -> 'Calculation':
+    def from_dict(data: Dict[str, Any], verify: bool = False) -> 'Calculation':
 
         ## Converts the dictionary into a calculation object
+        ## The saved result is trusted unless verify is set, in which case it is recalculated
 
         ## Params:
         ## Data: dict
+        ## Verify: bool (default: False)
 
         ## Returns:
         ## Calculation: The calculation
 
-        ## First we get the base calculation data
-
         try: 
 
-            output = Calculation(
+            return Calculation(
                 operation=data['operation'],
                 num1=Decimal(data['num1']),
                 num2=Decimal(data['num2']),
+                result=Decimal(data['result']),
+                timestamp=datetime.datetime.fromisoformat(data['timestamp']),
+                verify=verify
             )
-
-            saved_result = Decimal(data['result'])
-            if output.result != saved_result:
-
-                logging.error(f"Saved result {saved_result} does not match calculated result {output.result}")
-
-            output.timestamp = datetime.datetime.fromisoformat(data['timestamp'])
-
-            return output
         
         except (KeyError, InvalidOperation, ValueError) as e:
 
@@ -214,6 +232,44 @@ class Calculation:
 
             raise OperationError(f"Invalid calculation data: {str(e)}")
         
+    @staticmethod
+    def from_columns(
+        operations: Iterable[str],
+        num1s: Iterable[Any],
+        num2s: Iterable[Any],
+        results: Iterable[Any],
+        timestamps: Iterable[str]
+    ) -> List['Calculation']:
+
+        ## Builds many calculations at once from column data (i.e. straight out of a DataFrame)
+        ## Each column is converted in a single pass, and the saved results are trusted
+
+        ## Params:
+        ## Operations: column of operation names
+        ## Num1s / Num2s / Results: columns of Decimal compatible values
+        ## Timestamps: column of ISO formatted timestamps
+
+        ## Returns:
+        ## List[Calculation]: The calculations, in column order
+
+        ## Raises:
+        ## Exception: OperationError
+
+        try:
+
+            return list(map(
+                Calculation,
+                operations,
+                map(Decimal, num1s),
+                map(Decimal, num2s),
+                map(Decimal, results),
+                map(datetime.datetime.fromisoformat, timestamps)
+            ))
+
+        except (InvalidOperation, ValueError, TypeError) as e:
+
+            raise OperationError(f"Invalid calculation data: {str(e)}")
+
     def __str__(self) -> str:
 
         ## Returns a string representation of the calculation
@@ -297,4 +353,44 @@ class Calculation:
 
             ## if formatting throws an error, we just return the result
 
-            return str(self.result)
\ No newline at end of file
+            return str(self.result)
+
+
+class FrozenCalculation(Calculation):
+
+    ## An immutable Calculation
+    ## Attributes can only be set while the calculation is being built, so frozen calculations
+    ## can be shared freely (e.g. between history snapshots) and used as dict keys or in sets
+
+    __slots__ = ('_frozen',)
+
+    def __init__(self, *args, **kwargs):
+
+        ## Builds the calculation as Calculation does, then freezes it
+
+        super().__init__(*args, **kwargs)
+        object.__setattr__(self, '_frozen', True)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+
+        ## Allows the assignments made in __init__, and nothing after
+
+        if getattr(self, '_frozen', False):
+
+            raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str) -> None:
+
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def __hash__(self) -> int:
+
+        ## Matches __eq__, which ignores the timestamp
+
+        return hash((self.operation, self.num1, self.num2, self.result))
+
+    def freeze(self) -> 'FrozenCalculation':
+
+        return self
@@ -2,27 +2,69 @@
 ## IS 601 Midterm
 ## Evan Garvey
 
-from decimal import Decimal
+from __future__ import annotations
+
+from decimal import Context, Decimal, getcontext, setcontext
+from itertools import chain, repeat
+import math
 import os
 from pathlib import Path
 import sys
-from typing import List, Optional, Union
-import pandas as pd
+import threading
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Union
+import uuid
 
 from app.calculation import Calculation
 from app.calculator_config import CalculatorConfig
-from app.calculator_memento import CalculatorMemento
+from app.calculator_memento import HistoryDelta
+from app.cost_guard import GUARDED_OPERATIONS, CostGuard, estimated_exponent
 from app.exceptions import OperationError, ValidationError
 from app.history import HistoryObserver, LoggingObserver
+from app.history_buffer import HistoryBuffer
+from app.history_storage import HistoryStorage, HistoryStorageFactory
 from app.input_validators import InputValidator
 from app.logger import CalculationLogger
+from app.observer_dispatch import AsyncDispatcher
 from app.operations import Operation, OperationFactory
+from app.result_cache import ResultCache
+from app.stage_timings import StageTimings
+from app.structured_log import JsonLinesWriter
+
+## pandas and numpy take hundreds of milliseconds to import, so they are only imported
+## inside the methods that need them (saving, loading, DataFrames and batches)
+
+if TYPE_CHECKING: # pragma: no cover
+
+    import numpy as np
+    import pandas as pd
 
 ## Definining type aliases that we will be using often
 
 Number = Union[int, float, Decimal]
 CalculationResult = Union[Number, str]
 
+## Whole number results are kept exact up to this many digits (the default Decimal precision)
+## Larger ones are rounded, so a low precision keeps results such as 2 ** 3000 short
+
+EXACT_DIGITS = 28
+
+def __getattr__(name: str) -> Any:
+
+    ## Keeps app.calculator.pd and app.calculator.np available without importing them up front
+
+    if name == 'pd':
+
+        import pandas
+        return pandas
+
+    if name == 'np':
+
+        import numpy
+        return numpy
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class Calculator:
 
     ## Calculator class which will be the heart of our applicaiton
@@ -41,6 +83,11 @@ class Calculator:
         ## Initialize the observers first
 
         self.observers: List[HistoryObserver] = []
+        self._dispatcher: Optional[AsyncDispatcher] = None
+
+        ## Calculations waiting to be sent as one batch while notifications are held (see hold_notifications)
+
+        self._held: Optional[List[Calculation]] = None
 
         if config is None:
 
@@ -55,18 +102,63 @@ class Calculator:
         self.config = config
         self.config.validate()
 
+        ## Identifies this calculator's records in the structured log
+
+        self.session_id = uuid.uuid4().hex
+
         os.makedirs(self.config.log_dir, exist_ok = True)
 
+        ## Observers are notified from a background thread only when asked for
+
+        if self.config.async_observers:
+
+            self._dispatcher = AsyncDispatcher(
+                self.config.observer_queue_size,
+                self.config.observer_backpressure
+            )
+
         self._setup_logging()
 
-        self.history: List[Calculation] = []
+        self.history = []
         self.operation_strategy: Optional[Operation] = None
 
-        self.undo_stack: List[CalculatorMemento] = []
-        self.redo_stack: List[CalculatorMemento] = []
+        ## Every operation runs under this calculator's own Decimal context rather than the global one
+        ## The contexts actually installed are copies of it, one per working precision, kept per thread
+        ## (see _decimal_context), so calculators and threads never share or change each other's context
+
+        self.decimal_context = Context(prec = self.config.precision)
+        self._decimal_contexts = threading.local()
+
+        ## Per stage timing of perform_operation, only when asked for
+        ## The structured log records each calculation's latency, so it turns the clock on too
+
+        self.stage_timings: Optional[StageTimings] = StageTimings() if self.config.stage_timing else None
+        self._timed = self.stage_timings is not None or self.config.structured_log
+        self._clock = perf_counter_ns if self._timed else int
+
+        ## Power, root and multiply are checked against the configured budget before they run
+
+        self.cost_guard = CostGuard(self.config.max_digits, self.config.max_exponent, self.config.cost_policy)
+        self.last_precision_loss: Optional[np.ndarray] = None
+
+        ## Memoized results, only when a cache size is configured
+
+        self.result_cache: Optional[ResultCache] = (
+            ResultCache(self.config.cache_size) if self.config.cache_size else None
+        )
+
+        ## The undo / redo stacks hold deltas rather than full copies of the history
+
+        self.undo_stack: List[HistoryDelta] = []
+        self.redo_stack: List[HistoryDelta] = []
 
         self._setup_directories()
 
+        self.storage: HistoryStorage = HistoryStorageFactory.create(
+            self.config.history_backend,
+            self.config.history_path
+        )
+
         try:
 
             self.load_history()
@@ -75,39 +167,87 @@ class Calculator:
 
             ## Update logging observer with error
 
-            self._send_message(40, f"Error loading history: {e}")
+            self._send_message(40, "Error loading history: %s", e)
             raise e
 
-        self._send_message(20, f"Calculator initialized at: {self.config.root_dir}")
+        self._send_message(20, "Calculator initialized at: %s", self.config.root_dir)
+
+    @property
+    def history(self) -> HistoryBuffer:
+
+        ## The calculation history, bounded by max_history
+
+        return self._history
+
+    @history.setter
+    def history(self, calculations: Iterable[Calculation]) -> None:
+
+        ## Replaces the history. Any iterable is accepted and wrapped in a HistoryBuffer
+        ## sized from the current config, keeping only the newest max_history entries
+
+        self._history = HistoryBuffer(self.config.max_history, calculations)
 
     def _setup_logging(self):
 
         try:
 
             os.makedirs(self.config.log_dir, exist_ok = True)
-            log_file = self.config.log_file.resolve()
 
-            logger = LoggingObserver(CalculationLogger())
-            logger.update_message(20, f"Logging initialized at: {log_file}")
+            ## Each calculator logs through its own logger, named after its session. The file is written on a
+            ## background thread shared by every calculator logging to it; close() lets go of it
+
+            self.calculation_logger = CalculationLogger(self.config, self.session_id)
+            self.calculation_logger.setup_logging()
 
-            self.observers.append(logger)
+            sink = None
+
+            if self.config.structured_log:
+
+                sink = JsonLinesWriter(
+                    str(self.config.structured_log_file),
+                    self.session_id,
+                    self.config.structured_log_flush_bytes,
+                    self.config.structured_log_flush_interval
+                )
+
+            ## setup_logging logs where the log is, so it is not logged again here
+
+            self.observers.append(LoggingObserver(self.calculation_logger, sink))
 
         except Exception as e:
 
             print(f"Error setting up logging: {e}")
             raise
 
-    def _send_message(self, level: int, message: str) -> None:
+    def _notify(self, method: str, *args) -> None:
 
-        for i in self.observers:
+        ## Calls the given observer method on every observer
+        ## With async dispatch on, the calls are queued and made on the dispatcher thread
 
-            i.update_message(level, message)
+        if self._dispatcher is not None:
 
-    def _send_calculation(self, calculation: Calculation) -> None:
+            self._dispatcher.submit(self._deliver, method, args)
+
+        else:
+
+            self._deliver(method, args)
+
+    def _deliver(self, method: str, args: tuple) -> None:
 
         for i in self.observers:
 
-            i.update(calculation)
+            getattr(i, method)(*args)
+
+    def _send_message(self, level: int, message: str, *args) -> None:
+
+        ## The message is a %-style format string. The arguments are passed along unformatted,
+        ## so the logger only pays for formatting when the level is enabled
+
+        self._notify('update_message', level, message, *args)
+
+    def _send_calculation(self, calculation: Calculation) -> None:
+
+        self._notify('update', calculation)
 
     def _setup_directories(self) -> None:
 
@@ -116,21 +256,109 @@ class Calculator:
     def add_observer(self, observer: HistoryObserver) -> None:
 
         self.observers.append(observer)
-        self._send_message(20, f"Added observer: {observer.__class__.__name__}")
+        self._send_message(20, "Added observer: %s", observer.__class__.__name__)
 
     def remove_observer(self, observer: HistoryObserver) -> None:
 
         self.observers.remove(observer)
-        self._send_message(20, f"Removed observer: {observer.__class__.__name__}")
+        self._send_message(20, "Removed observer: %s", observer.__class__.__name__)
+
+    def _send_batch(self, calculations: List[Calculation]) -> None:
+
+        ## An empty batch changed nothing, so observers are not told about it
+
+        if calculations:
+
+            self._notify('update_batch', calculations)
+
+    def hold_notifications(self) -> None:
+
+        ## Collects new calculations instead of notifying observers of each one, until they are sent
+        ## with send_held_notifications, so a long run is logged and saved a batch at a time
+
+        if self._held is None:
+
+            self._held = []
+
+    def send_held_notifications(self) -> None:
+
+        ## Sends the calculations held so far to the observers as one batch, and keeps holding
+
+        if self._held:
+
+            held, self._held = self._held, []
+            self._send_batch(held)
+
+    def release_notifications(self) -> None:
+
+        ## Sends anything held and goes back to notifying observers of each calculation
+
+        self.send_held_notifications()
+        self._held = None
+
+    def flush_observers(self) -> None:
+
+        ## Sends any held calculations and waits for any queued notifications, then flushes every observer
+
+        self.send_held_notifications()
+
+        if self._dispatcher is not None:
+
+            self._dispatcher.drain()
+
+        for i in self.observers:
+
+            i.flush()
+
+    def dispatch_stats(self) -> Optional[Dict[str, Union[int, str]]]:
+
+        ## Returns the async dispatcher counters, or None when observers are notified synchronously
+
+        if self._dispatcher is None:
+
+            return None
+
+        return self._dispatcher.stats()
+
+    def log_stats(self) -> Optional[Dict[str, int]]:
+
+        ## Returns the logging queue counters: records enqueued, dropped, waiting now and the queue size
+
+        return self.calculation_logger.stats()
+
+    def close(self) -> None:
+
+        ## Delivers any queued notifications, stops the dispatcher and closes every observer
+        ## (writing out the logging queue) and the history storage. Notifications sent after this are delivered synchronously
+
+        self.release_notifications()
+
+        if self._dispatcher is not None:
+
+            dispatcher = self._dispatcher
+            self._dispatcher = None
+            dispatcher.close()
+
+        for i in self.observers:
+
+            i.close()
+
+        self.storage.close()
 
     def notify_observers(self, calculation: Calculation) -> None:
 
-        self._send_calculation(calculation)
+        if self._held is not None:
+
+            self._held.append(calculation)
+
+        else:
+
+            self._send_calculation(calculation)
 
     def set_operation(self, operation: Operation) -> None:
 
         self.operation_strategy = operation
-        self._send_message(20, f"Operation set to: {operation}")
+        self._send_message(20, "Operation set to: %s", operation)
 
     def perform_operation(self, str1: Union[str, Number], str2: Union[str, Number]) -> CalculationResult:
 
@@ -138,119 +366,421 @@ class Calculator:
 
             raise OperationError("No operation set")
             
+        ## The clock is perf_counter_ns when stage timing is on, and int (which just returns 0) when it is off
+
+        clock = self._clock
+
         try:
 
+            start = clock()
+
             validated_str1 = InputValidator.validate_input(str1, self.config)
             validated_str2 = InputValidator.validate_input(str2, self.config)
 
-            result = self.operation_strategy.execute(validated_str1, validated_str2)
+            ## Expensive work is refused (or run at a lower precision) before it starts
+
+            precision = self.cost_guard.check(
+                self.operation_strategy.name,
+                validated_str1,
+                validated_str2,
+                self._working_precision(self.operation_strategy.name, (validated_str1,), (validated_str2,))
+            )
+
+            validated = clock()
+
+            previous_context = getcontext()
+            setcontext(self._decimal_context(precision))
+
+            try:
+
+                if self.result_cache is None:
 
-            operation_name = None
+                    result = self.operation_strategy.execute(validated_str1, validated_str2)
+
+                else:
+
+                    result = self._cached_execute(validated_str1, validated_str2)
+
+            finally:
+
+                setcontext(previous_context)
+
+            executed = clock()
+
+            ## The strategy has already produced the result, so the calculation just records it
 
             calculation = Calculation(
                 operation = self.operation_strategy.name,
                 num1 = validated_str1,
-                num2 = validated_str2
+                num2 = validated_str2,
+                result = result
             )
 
-            self.undo_stack.append(CalculatorMemento(self.history.copy()))
+            delta = HistoryDelta(added = [calculation])
+            built = clock()
 
+            evicted = self.history.append(calculation)
+
+            if evicted is not None:
+
+                delta.evicted.append(evicted)
+
+            stored = clock()
+
+            self._push_undo(delta)
             self.redo_stack.clear()
+            journaled = clock()
 
-            self.history.append(calculation)
+            ## The latency travels with the calculation, so it is still right if observers are notified later
 
-            if len(self.history) > self.config.max_history:
+            if self._timed:
 
-                self.history.pop(0)
+                calculation.latency_ns = journaled - start
 
             self.notify_observers(calculation)
 
+            if self.stage_timings is not None:
+
+                self.stage_timings.record(
+                    calculation.operation,
+                    (start, validated, executed, built, stored, journaled, clock())
+                )
+
             return result
             
         except ValidationError as e:
 
-            self._send_message(40, f"Validation Error: {e}")
+            self._send_message(40, "Validation Error: %s", e)
             raise
 
         except Exception as e:
 
-            self._send_message(40, f"Operation Failed: {e}")
+            self._send_message(40, "Operation Failed: %s", e)
             raise
 
-    def save_history(self) -> None:
+    def _working_precision(self, operation: str, lhs: Sequence[Decimal], rhs: Sequence[Decimal]) -> int:
+
+        ## The Decimal precision an operation runs at
+        ## config.precision counts decimal places, while a context counts significant digits, so the digits
+        ## in front of the point are added on top: those of the largest operand, or of the largest result
+        ## (estimated from the operands) if it has more, up to EXACT_DIGITS.
+        ## That way whole numbers, including products and powers of a moderate size, are not rounded,
+        ## and a low precision still keeps division, roots and large powers short
+
+        ## Params:
+        ## Operation: the operation name
+        ## Lhs / Rhs: the first and second operands of each calculation
+
+        ## Returns:
+        ## Integer: the number of significant digits
+
+        operand_digits = max(map(Decimal.adjusted, chain(lhs, rhs)), default = 0) + 1
+        result = max(map(estimated_exponent, repeat(operation), lhs, rhs), default = 0)
+
+        ## A result past the cap (or too large to estimate, which the cost guard refuses) gets no more digits
+
+        result_digits = EXACT_DIGITS if result >= EXACT_DIGITS else math.floor(result) + 1
+        return self.config.precision + max(operand_digits, result_digits, 1)
+
+    def _decimal_context(self, precision: int) -> Context:
+
+        ## The Decimal context an operation runs under
+        ## Contexts are built once per precision and thread, which is much cheaper than copying one per call
+
+        ## Params:
+        ## Precision: the working precision
+
+        ## Returns:
+        ## Context: a copy of decimal_context at that precision, owned by the current thread
+
+        contexts = self._decimal_contexts.__dict__
+        context = contexts.get(precision)
+
+        if context is None:
+
+            context = self.decimal_context.copy()
+            context.prec = precision
+            contexts[precision] = context
+
+        return context
+
+    def _cached_execute(self, num1: Decimal, num2: Decimal) -> Decimal:
+
+        ## Executes the current operation through the result cache
+        ## Errors are never cached, so invalid input is still rejected every time
+
+        key = (self.operation_strategy.name, num1, num2)
+        result = self.result_cache.get(key)
+
+        if result is None:
+
+            result = self.operation_strategy.execute(num1, num2)
+            self.result_cache.put(key, result)
+
+        return result
+
+    def stage_stats(self) -> Optional[Dict[str, Dict[str, Dict[str, Any]]]]:
+
+        ## Returns the perform_operation stage timings per operation, or None when stage timing is off
+
+        if self.stage_timings is None:
+
+            return None
+
+        return self.stage_timings.snapshot()
+
+    def cost_stats(self) -> Dict[str, Union[int, str]]:
+
+        ## Returns the cost guard counters (how many calculations were checked, rejected and downgraded)
+
+        return self.cost_guard.stats()
+
+    def cache_stats(self) -> Optional[Dict[str, int]]:
+
+        ## Returns the result cache counters, or None when caching is off
+
+        if self.result_cache is None:
+
+            return None
+
+        return self.result_cache.stats()
+
+    def perform_batch(
+            self,
+            operation: Union[Operation, str],
+            lhs_values: Iterable[Union[str, Number]],
+            rhs_values: Iterable[Union[str, Number]],
+            as_array: bool = False
+    ) -> Union[List[Decimal], List[float], np.ndarray]:
+
+        ## Performs one operation over many operand pairs at once
+        ## With the float64 backend the pairs are evaluated with NumPy instead of Decimal
+        ## Inputs are validated and evaluated in bulk, then the whole batch is recorded as a single
+        ## history change (one undo step) and observers are notified once with every calculation
+        ## The batch is all or nothing: if any pair fails, nothing is recorded
+
+        ## Params:
+        ## Operation: an Operation, or a name for OperationFactory
+        ## Lhs_values / Rhs_values: the first and second operands, paired in order
+        ## As_array: return a NumPy array instead of a list
+
+        ## Returns:
+        ## The results, in input order. Decimals, or floats when config.backend is 'float64'
+
+        ## Raises:
+        ## Exception: ValidationError, OperationError
 
         try:
 
-            self.config.history_dir.mkdir(parents = True, exist_ok = True)
+            if isinstance(operation, str):
+
+                operation = OperationFactory.create(operation)
+
+            validate = InputValidator.validate_input
+            config = self.config
+
+            lhs = [validate(value, config) for value in lhs_values]
+            rhs = [validate(value, config) for value in rhs_values]
+
+            if len(lhs) != len(rhs):
+
+                raise ValidationError(f"Operand count mismatch: {len(lhs)} first operands, {len(rhs)} second operands")
+
+            if self.config.backend == 'float64':
+
+                results = self._execute_float64(operation, lhs, rhs)
+                recorded = map(Decimal, map(repr, results.tolist()))
+
+            else:
+
+                ## One context for the whole batch, sized for its largest result
+                ## Every pair of a guarded operation is checked first, so an expensive pair rejects the whole batch
+
+                precision = self._working_precision(operation.name, lhs, rhs)
+
+                if operation.name in GUARDED_OPERATIONS:
+
+                    check = self.cost_guard.check
+                    precision = min([check(operation.name, a, b, precision) for a, b in zip(lhs, rhs)], default = precision)
+
+                previous_context = getcontext()
+                setcontext(self._decimal_context(precision))
 
-            history_data = []
+                try:
 
-            for calc in self.history:
+                    results = list(map(operation.execute, lhs, rhs))
 
-                history_data.append({
-                    'operation': str(calc.operation),
-                    'num1': str(calc.num1),
-                    'num2': str(calc.num2),
-                    'result': str(calc.result),
-                    'timestamp': calc.timestamp.isoformat()
-                })
+                finally:
 
-            if history_data:
+                    setcontext(previous_context)
 
-                df = pd.DataFrame(history_data)
-                df.to_csv(self.config.history_file, index = False)
+                recorded = results
 
-                self._send_message(20, f"History saved to: {self.config.history_file}")
+            calculations = list(map(Calculation, repeat(operation.name), lhs, rhs, recorded))
+
+            self._record_batch(calculations)
+            self._send_batch(calculations)
+
+        except ValidationError as e:
+
+            self._send_message(40, "Validation Error: %s", e)
+            raise
+
+        except Exception as e:
+
+            self._send_message(40, "Batch Operation Failed: %s", e)
+            raise
+
+        ## NumPy is only imported when an array is asked for or the float64 backend produced one
+
+        if as_array:
+
+            import numpy as np
+            return np.asarray(results, dtype = np.float64 if self.config.backend == 'float64' else object)
+
+        if self.config.backend == 'float64':
+
+            return results.tolist()
+
+        return results
+
+    def _execute_float64(self, operation: Operation, lhs: List[Decimal], rhs: List[Decimal]) -> np.ndarray:
+
+        ## Evaluates a batch with the operation's NumPy implementation
+        ## Results that cannot be trusted to float64 precision are flagged in last_precision_loss:
+        ## anything where an operand or the result reaches 2**53 (past which float64 no longer
+        ## holds every integer), and results that overflowed or are undefined
+        ## Those last two have no value to record, so, as the Decimal backend does, they fail the batch
+
+        ## Raises:
+        ## Exception: OperationError
+
+        import numpy as np
+
+        lhs_array = np.array(lhs, dtype = np.float64)
+        rhs_array = np.array(rhs, dtype = np.float64)
+
+        with np.errstate(all = 'ignore'):
+
+            results = operation.execute_vectorized(lhs_array, rhs_array)
+
+            self.last_precision_loss = (
+                ~np.isfinite(results)
+                | (np.abs(results) >= 2.0 ** 53)
+                | (np.abs(lhs_array) >= 2.0 ** 53)
+                | (np.abs(rhs_array) >= 2.0 ** 53)
+            )
+
+        undefined = ~np.isfinite(results)
+        if undefined.any():
+
+            index = int(np.argmax(undefined))
+            raise OperationError(
+                f"Result of {operation.name} ({lhs[index]}, {rhs[index]}) is undefined or out of float64 range"
+            )
+
+        lossy = int(self.last_precision_loss.sum())
+        if lossy:
+
+            self._send_message(30, "Precision loss in %d of %d float64 results", lossy, len(results))
+
+        return results
+
+    def _record_batch(self, calculations: List[Calculation]) -> None:
+
+        ## Appends a batch to the history as one undo step
+
+        ## When the batch overflows max_history, the entries evicted from before the batch are
+        ## journaled so undo can restore them, while batch entries that never fit are just dropped
+        ## An empty batch changes nothing, so it gets no undo step
+
+        if not calculations:
+
+            return
+
+        previous_size = len(self.history)
+        evicted = self.history.extend(calculations)
+
+        old_evicted = evicted[:previous_size]
+        kept = calculations[len(evicted) - len(old_evicted):]
+
+        self._push_undo(HistoryDelta(added = kept, evicted = old_evicted))
+        self.redo_stack.clear()
+
+    def _push_undo(self, delta: HistoryDelta) -> None:
+
+        ## Records an undo step, dropping the oldest once max_undo steps are held
+        ## so long runs (such as batch mode) do not grow the undo stack without bound
+
+        self.undo_stack.append(delta)
+
+        if len(self.undo_stack) > self.config.max_undo:
+
+            del self.undo_stack[0]
+
+    def save_history(self) -> None:
+
+        try:
+
+            ## Anything still queued for the observers is delivered first, so the auto save file
+            ## and the log are complete before the history file is rewritten
+
+            self.flush_observers()
+
+            self.config.history_dir.mkdir(parents = True, exist_ok = True)
+
+            self.storage.save(self.history)
+
+            if self.history:
+
+                self._send_message(20, "History saved to: %s", self.storage.path)
 
             else:
 
-                pd.DataFrame(columns = [
-                    'operation', 'num1', 'num2', 'result', 'timestamp'
-                    ]).to_csv(self.config.history_file, index = False)
-                self._send_message(20, f"Empty history saved to: {self.config.history_file}")
+                self._send_message(20, "Empty history saved to: %s", self.storage.path)
 
         except Exception as e:
 
-            self._send_message(40, f"Error saving history: {e}")
+            self._send_message(40, "Error saving history: %s", e)
             raise OperationError(f"Error saving history: {e}")
         
     def load_history(self) -> None:
 
         try:
 
-            if self.config.history_file.exists():
+            if self.storage.exists():
+
+                ## Only the newest max_history entries can be kept, so only those are fetched
 
-                df = pd.read_csv(self.config.history_file)
-                if not df.empty:
+                calculations = self.storage.load_recent(self.config.max_history)
+                if calculations:
 
-                    self.history = [
-                        Calculation.from_dict({
-                            'operation': row['operation'],
-                            'num1': row['num1'],
-                            'num2': row['num2'],
-                            'result': row['result'],
-                            'timestamp': row['timestamp']
-                        })
-                        for _, row in df.iterrows()
-                    ]
+                    self.history = calculations
 
-                    self._send_message(20, f"Loaded {len(self.history)} calculations from history file")
+                    ## The journal describes changes to the old history, so it cannot be replayed on the new one
+
+                    self.undo_stack.clear()
+                    self.redo_stack.clear()
+
+                    self._send_message(20, "Loaded %d calculations from history file", len(self.history))
 
                 else:
 
-                    self._send_message(20, f"Loaded empty history file")
+                    self._send_message(20, "Loaded empty history file")
 
             else:
 
-                self._send_message(20, f"No history file found - starting with empty history")
+                self._send_message(20, "No history file found - starting with empty history")
 
         except Exception as e:
 
-            self._send_message(40, f"Error loading history: {e}")
+            self._send_message(40, "Error loading history: %s", e)
             raise OperationError(f"Error loading history: {e}")
         
     def get_history_dataframe(self) -> pd.DataFrame:
 
+        import pandas as pd
+
         history_data = []
         for calc in self.history:
 
@@ -275,7 +805,7 @@ class Calculator:
         self.history.clear()
         self.redo_stack.clear()
         self.undo_stack.clear()
-        self._send_message(20, f"History cleared")
+        self._send_message(20, "History cleared")
 
     def undo(self) -> bool:
 
@@ -283,9 +813,9 @@ class Calculator:
 
             return False
         
-        memento = self.undo_stack.pop()
-        self.redo_stack.append(CalculatorMemento(self.history.copy()))
-        self.history = memento.history.copy()
+        delta = self.undo_stack.pop()
+        delta.undo(self.history)
+        self.redo_stack.append(delta)
         
         return True
     
@@ -295,9 +825,9 @@ class Calculator:
 
             return False
         
-        memento = self.redo_stack.pop()
-        self.undo_stack.append(CalculatorMemento(self.history.copy()))
-        self.history = memento.history.copy()
+        delta = self.redo_stack.pop()
+        delta.redo(self.history)
+        self.undo_stack.append(delta)
         
         return True
     
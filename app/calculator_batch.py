@@ -0,0 +1,191 @@
+## calculator_batch.py
+## IS 601 Midterm
+## Evan Garvey
+
+from decimal import Decimal
+import sys
+import time
+from typing import Iterable, Optional, TextIO, Tuple
+from app.calculator import Calculator
+from app.exceptions import OperationError, ValidationError
+from app.history import AutoSaveObserver, StorageObserver
+from app.operations import OperationFactory
+
+## How many result lines are collected before they are written out together
+
+OUTPUT_CHUNK = 4096
+
+def run_batch(calc: Calculator, lines: Iterable[str], out: TextIO) -> Tuple[int, int]:
+
+    ## Runs one calculation per line and writes one result line per calculation
+    ## Lines look like '<operation> <num1> <num2>', e.g. 'add 3 4' or 'integer division 7 2'
+    ## Blank lines and lines starting with '#' are skipped
+    ## Lines are read and results written as they go, so memory use does not depend on input size
+
+    ## Params:
+    ## Calc: the calculator to run the calculations on
+    ## Lines: the input lines
+    ## Out: where results are written
+
+    ## Returns:
+    ## Tuple[int, int]: the number of calculations run and how many of them failed
+
+    current: Optional[str] = None
+    chunk = []
+    processed = 0
+    errors = 0
+
+    ## Observers hear about the calculations a chunk at a time, so the log gets one line per chunk
+    ## and auto save one write, rather than one of each per line
+
+    calc.hold_notifications()
+
+    try:
+
+        for line in lines:
+
+            line = line.strip()
+            if not line or line.startswith('#'):
+
+                continue
+
+            processed += 1
+
+            try:
+
+                ## Split from the right, as some operation names contain spaces
+
+                parts = line.rsplit(None, 2)
+                if len(parts) != 3:
+
+                    raise ValidationError(f"Expected '<operation> <num1> <num2>', got: {line}")
+
+                name, num1, num2 = parts
+                name = name.lower()
+
+                ## The factory hands out shared instances; the calculator is only switched when the line asks for a different one
+                ## It is switched directly rather than through set_operation, which would log every switch
+
+                if name != current:
+
+                    calc.operation_strategy = OperationFactory.create(name)
+                    current = name
+
+                result = calc.perform_operation(num1, num2)
+                if isinstance(result, Decimal):
+
+                    result = result.normalize()
+
+                chunk.append(f"{result}\n")
+
+            except (ValidationError, OperationError, ValueError) as e:
+
+                errors += 1
+                chunk.append(f"Error: {e}\n")
+
+            except ArithmeticError as e:
+
+                ## Undefined results (e.g. a fractional power of a negative number) raise Decimal signals,
+                ## whose message is just the signal's class, so the class name is reported
+
+                errors += 1
+                chunk.append(f"Error: Calculation failed: {type(e).__name__}\n")
+
+            if len(chunk) >= OUTPUT_CHUNK:
+
+                text = ''.join(chunk)
+                chunk.clear()
+                out.write(text)
+                calc.send_held_notifications()
+
+    finally:
+
+        ## Whatever was finished is written even if the run stops early
+
+        try:
+
+            out.write(''.join(chunk))
+            out.flush()
+
+        finally:
+
+            calc.release_notifications()
+
+    return processed, errors
+
+def calculator_batch(source: str, out: Optional[TextIO] = None, err: Optional[TextIO] = None) -> int:
+
+    ## Non-interactive entry point. Runs every line of a file (or stdin for '-') without prompting
+
+    ## Params:
+    ## Source: the input file path, or '-' for stdin
+    ## Out: where results are written, stdout by default
+    ## Err: where the throughput summary is written, stderr by default
+
+    ## Returns:
+    ## Integer: the exit status, 0 if every line succeeded, 1 if any failed and 2 if the input or output failed
+
+    out = out or sys.stdout
+    err = err or sys.stderr
+
+    ## The input is opened before the calculator is built, so a bad path fails fast
+
+    try:
+
+        source_file = sys.stdin if source == '-' else open(source, 'r', encoding = 'utf-8')
+
+    except OSError as e:
+
+        err.write(f"Error: cannot read {source}: {e.strerror or e}\n")
+        return 2
+
+    calc = Calculator()
+
+    try:
+
+        ## Auto save keeps its usual meaning: each new row is appended to the history file
+        ## The rows are buffered a chunk at a time rather than flushed after every calculation,
+        ## and whatever is left is written when the calculator is closed
+
+        if calc.config.auto_save:
+
+            if calc.config.history_backend in ('sqlite', 'binary'):
+
+                autosave = StorageObserver(calc.storage, flush_every = OUTPUT_CHUNK)
+
+            else:
+
+                autosave = AutoSaveObserver(
+                    str(calc.config.history_file),
+                    append = True,
+                    flush_every = OUTPUT_CHUNK,
+                    fsync = calc.config.auto_save_fsync
+                )
+
+            calc.add_observer(autosave)
+
+        start = time.perf_counter()
+
+        try:
+
+            processed, errors = run_batch(calc, source_file, out)
+
+        except OSError as e:
+
+            err.write(f"Error: {e.strerror or e}\n")
+            return 2
+
+        elapsed = time.perf_counter() - start
+
+    finally:
+
+        if source_file is not sys.stdin:
+
+            source_file.close()
+
+        calc.close()
+
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    err.write(f"Processed {processed} calculations ({errors} errors) in {elapsed:.3f}s ({rate:,.0f}/s)\n")
+
+    return 1 if errors else 0
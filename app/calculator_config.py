@@ -9,11 +9,29 @@ import os
 from pathlib import Path
 from typing import Optional
 from app.exceptions import ConfigurationError
-from dotenv import load_dotenv
 
-## Before we start we must load the dotenv
+_env_loaded = False
 
-load_dotenv()
+def load_env() -> None:
+
+    ## Loads the .env file the first time a config is built
+    ## This used to happen at import, which made every import of the app pay for python-dotenv
+
+    ## Params:
+    ## None
+
+    ## Returns:
+    ## None
+
+    global _env_loaded
+
+    if _env_loaded:
+
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    _env_loaded = True
 
 def get_root() -> Path:
 
@@ -45,7 +63,28 @@ class CalculatorConfig:
             auto_save: Optional[bool] = None,
             precision: Optional[int] = None,
             max_input_val: Optional[Number] = None,
-            default_encoding: Optional[str] = None
+            default_encoding: Optional[str] = None,
+            auto_save_flush_every: Optional[int] = None,
+            auto_save_fsync: Optional[bool] = None,
+            backend: Optional[str] = None,
+            cache_size: Optional[int] = None,
+            async_observers: Optional[bool] = None,
+            observer_queue_size: Optional[int] = None,
+            observer_backpressure: Optional[str] = None,
+            max_undo: Optional[int] = None,
+            history_backend: Optional[str] = None,
+            max_digits: Optional[int] = None,
+            max_exponent: Optional[int] = None,
+            cost_policy: Optional[str] = None,
+            stage_timing: Optional[bool] = None,
+            log_queue_size: Optional[int] = None,
+            log_level: Optional[str] = None,
+            log_max_bytes: Optional[int] = None,
+            log_rotate_interval: Optional[int] = None,
+            log_backup_count: Optional[int] = None,
+            structured_log: Optional[bool] = None,
+            structured_log_flush_bytes: Optional[int] = None,
+            structured_log_flush_interval: Optional[float] = None
     ):
         
         ## Initialize the config values
@@ -59,6 +98,27 @@ class CalculatorConfig:
         ## precision: Optional[int] = how precise we want to be with our results
         ## max_input_val: Optional[Number] = the maximum input value
         ## default_encoding: Optional[str] = our default encoding
+        ## auto_save_flush_every: Optional[int] = how many auto saved rows to buffer before flushing (0 = on close only)
+        ## auto_save_fsync: Optional[bool] = whether auto save flushes are also synced to disk
+        ## backend: Optional[str] = the numeric backend for batch work, 'decimal' (exact) or 'float64' (fast)
+        ## cache_size: Optional[int] = how many results to memoize (0 = no cache)
+        ## async_observers: Optional[bool] = whether observers are notified on a background thread
+        ## observer_queue_size: Optional[int] = how many notifications may wait for the background thread
+        ## observer_backpressure: Optional[str] = what to do when that queue is full, 'block', 'drop_oldest' or 'drop_newest'
+        ## max_undo: Optional[int] = the maximum number of undo steps we want to hold
+        ## history_backend: Optional[str] = where history is saved, 'csv' (history_file), 'sqlite' (history_db) or 'binary' (history_bin)
+        ## max_digits: Optional[int] = the most digits an operand, or the precision of a power or root, may need
+        ## max_exponent: Optional[int] = the largest result exponent power, root and multiply may produce
+        ## cost_policy: Optional[str] = what to do with a power or root over max_digits, 'reject' or 'downgrade' (run at max_digits)
+        ## stage_timing: Optional[bool] = whether perform_operation times each of its stages (see Calculator.stage_stats)
+        ## log_queue_size: Optional[int] = how many log records may wait for the logging thread before new ones are dropped
+        ## log_level: Optional[str] = the least severe level logged, 'DEBUG', 'INFO', 'WARNING', 'ERROR' or 'CRITICAL'
+        ## log_max_bytes: Optional[int] = the size the log file may reach before it is rotated (0 = no size limit)
+        ## log_rotate_interval: Optional[int] = seconds between log rotations (0 = no time limit)
+        ## log_backup_count: Optional[int] = how many rotated (gzipped) log files to keep
+        ## structured_log: Optional[bool] = whether every calculation is also written as a JSON line to structured_log_file
+        ## structured_log_flush_bytes: Optional[int] = how much of that log to buffer before writing it (0 = every line)
+        ## structured_log_flush_interval: Optional[float] = the most seconds a line stays buffered while calculations keep coming
         ## All args default to none.
 
         ## Outputs:
@@ -67,6 +127,8 @@ class CalculatorConfig:
         ## First we must locate our root path. this is where our .env file is
         ## All params will be dealt with this way - sticking to None or getting our value from the .env
 
+        load_env()
+
         project_root = get_root()
         self.root_dir = root_dir or Path(
             os.getenv('CALCULATOR_ROOT_DIR', str(project_root))
@@ -78,6 +140,12 @@ class CalculatorConfig:
             os.getenv('CALCULATOR_MAX_HISTORY', '1000')
         )
 
+        ## Max undo
+
+        self.max_undo = max_undo or int(
+            os.getenv('CALCULATOR_MAX_UNDO', '1000')
+        )
+
         ## Auto save
         ## This one is different than the last one as we have to do 2 things:
         ## 1. get the value from the .env and evaluate it
@@ -106,6 +174,114 @@ class CalculatorConfig:
             'CALCULATOR_DEFAULT_ENCODING', 'utf-8'
         )
 
+        ## Auto save flush policy
+        ## 0 is a valid value here, so we check for None rather than using 'or'
+
+        self.auto_save_flush_every = auto_save_flush_every if auto_save_flush_every is not None else int(
+            os.getenv('CALCULATOR_AUTO_SAVE_FLUSH_EVERY', '1')
+        )
+
+        ## Auto save fsync policy
+
+        auto_save_fsync_env = os.getenv('CALCULATOR_AUTO_SAVE_FSYNC', 'false').lower()
+        self.auto_save_fsync = auto_save_fsync if auto_save_fsync is not None else (
+            auto_save_fsync_env == 'true' or auto_save_fsync_env == '1'
+            )
+
+        ## Numeric backend
+
+        self.backend = (backend or os.getenv(
+            'CALCULATOR_BACKEND', 'decimal'
+        )).lower()
+
+        ## Result cache size
+
+        self.cache_size = cache_size if cache_size is not None else int(
+            os.getenv('CALCULATOR_CACHE_SIZE', '0')
+        )
+
+        ## Asynchronous observer dispatch
+
+        async_observers_env = os.getenv('CALCULATOR_ASYNC_OBSERVERS', 'false').lower()
+        self.async_observers = async_observers if async_observers is not None else (
+            async_observers_env == 'true' or async_observers_env == '1'
+            )
+
+        self.observer_queue_size = observer_queue_size if observer_queue_size is not None else int(
+            os.getenv('CALCULATOR_OBSERVER_QUEUE_SIZE', '1024')
+        )
+
+        self.observer_backpressure = (observer_backpressure or os.getenv(
+            'CALCULATOR_OBSERVER_BACKPRESSURE', 'block'
+        )).lower()
+
+        ## History storage backend
+
+        self.history_backend = (history_backend or os.getenv(
+            'CALCULATOR_HISTORY_BACKEND', 'csv'
+        )).lower()
+
+        ## Computation cost budget
+
+        self.max_digits = max_digits or int(
+            os.getenv('CALCULATOR_MAX_DIGITS', '2000')
+        )
+
+        self.max_exponent = max_exponent or int(
+            os.getenv('CALCULATOR_MAX_EXPONENT', '999999')
+        )
+
+        self.cost_policy = (cost_policy or os.getenv(
+            'CALCULATOR_COST_POLICY', 'reject'
+        )).lower()
+
+        ## Stage timing
+
+        stage_timing_env = os.getenv('CALCULATOR_STAGE_TIMING', 'false').lower()
+        self.stage_timing = stage_timing if stage_timing is not None else (
+            stage_timing_env == 'true' or stage_timing_env == '1'
+            )
+
+        ## Log queue size
+
+        self.log_queue_size = log_queue_size if log_queue_size is not None else int(
+            os.getenv('CALCULATOR_LOG_QUEUE_SIZE', '10000')
+        )
+
+        ## Log level
+
+        self.log_level = (log_level or os.getenv('CALCULATOR_LOG_LEVEL', 'INFO')).upper()
+
+        ## Log rotation
+        ## 0 turns off size or time based rotation, so we check for None rather than using 'or'
+
+        self.log_max_bytes = log_max_bytes if log_max_bytes is not None else int(
+            os.getenv('CALCULATOR_LOG_MAX_BYTES', str(10 * 1024 * 1024))
+        )
+
+        self.log_rotate_interval = log_rotate_interval if log_rotate_interval is not None else int(
+            os.getenv('CALCULATOR_LOG_ROTATE_INTERVAL', '0')
+        )
+
+        self.log_backup_count = log_backup_count if log_backup_count is not None else int(
+            os.getenv('CALCULATOR_LOG_BACKUP_COUNT', '5')
+        )
+
+        ## Structured (JSON lines) calculation log
+
+        structured_log_env = os.getenv('CALCULATOR_STRUCTURED_LOG', 'false').lower()
+        self.structured_log = structured_log if structured_log is not None else (
+            structured_log_env == 'true' or structured_log_env == '1'
+            )
+
+        self.structured_log_flush_bytes = structured_log_flush_bytes if structured_log_flush_bytes is not None else int(
+            os.getenv('CALCULATOR_STRUCTURED_LOG_FLUSH_BYTES', '65536')
+        )
+
+        self.structured_log_flush_interval = structured_log_flush_interval if structured_log_flush_interval is not None else float(
+            os.getenv('CALCULATOR_STRUCTURED_LOG_FLUSH_INTERVAL', '1.0')
+        )
+
     @property
     def log_dir(self) -> Path:
         
@@ -145,6 +321,22 @@ class CalculatorConfig:
             'CALCULATOR_LOG_FILE',
             str(self.log_dir / 'calculator.log')
         )).resolve()
+
+    @property
+    def structured_log_file(self) -> Path:
+        
+        ## Get the structured (JSON lines) log file path
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Path: The structured log file path
+
+        return Path(os.getenv(
+            'CALCULATOR_STRUCTURED_LOG_FILE',
+            str(self.log_dir / 'calculations.jsonl')
+        )).resolve()
     
     @property
     def history_dir(self) -> Path:
@@ -182,6 +374,59 @@ class CalculatorConfig:
 
         return (self.history_dir / 'calculator_history.csv').resolve()
 
+    @property
+    def history_db(self) -> Path:
+
+        ## Get the history database path, used by the sqlite history backend
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Path: The history database path
+
+        return Path(os.getenv(
+            'CALCULATOR_HISTORY_DB',
+            str(self.history_dir / 'calculator_history.db')
+        )).resolve()
+
+    @property
+    def history_bin(self) -> Path:
+
+        ## Get the binary history file path, used by the binary history backend
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Path: The binary history file path
+
+        return Path(os.getenv(
+            'CALCULATOR_HISTORY_BIN',
+            str(self.history_dir / 'calculator_history.bin')
+        )).resolve()
+
+    @property
+    def history_path(self) -> Path:
+
+        ## Get the path the configured history backend saves to
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Path: history_db for the sqlite backend, history_bin for the binary backend, history_file otherwise
+
+        if self.history_backend == 'sqlite':
+
+            return self.history_db
+
+        if self.history_backend == 'binary':
+
+            return self.history_bin
+
+        return self.history_file
+
     def validate(self) -> None:
         
         ## Validate the config settings
@@ -199,6 +444,10 @@ class CalculatorConfig:
 
             raise ConfigurationError("Max history must be greater than 0")
 
+        if self.max_undo <= 0:
+
+            raise ConfigurationError("Max undo must be greater than 0")
+
         if self.precision <= 0:
 
             raise ConfigurationError("Precision must be greater than 0")
@@ -206,6 +455,64 @@ class CalculatorConfig:
         if self.max_input_val <= 0:
 
             raise ConfigurationError("Max input value must be greater than 0")
+
+        if self.auto_save_flush_every < 0:
+
+            raise ConfigurationError("Auto save flush interval cannot be negative")
+
+        if self.backend not in ('decimal', 'float64'):
+
+            raise ConfigurationError(f"Unknown numeric backend: {self.backend}")
+
+        if self.cache_size < 0:
+
+            raise ConfigurationError("Cache size cannot be negative")
+
+        if self.observer_queue_size <= 0:
+
+            raise ConfigurationError("Observer queue size must be greater than 0")
+
+        if self.observer_backpressure not in ('block', 'drop_oldest', 'drop_newest'):
+
+            raise ConfigurationError(f"Unknown backpressure policy: {self.observer_backpressure}")
+
+        if self.history_backend not in ('csv', 'sqlite', 'binary'):
+
+            raise ConfigurationError(f"Unknown history backend: {self.history_backend}")
+
+        if self.max_digits <= 0:
+
+            raise ConfigurationError("Max digits must be greater than 0")
+
+        if self.max_exponent <= 0:
+
+            raise ConfigurationError("Max exponent must be greater than 0")
+
+        if self.cost_policy not in ('reject', 'downgrade'):
+
+            raise ConfigurationError(f"Unknown cost policy: {self.cost_policy}")
+
+        if self.log_queue_size <= 0:
+
+            raise ConfigurationError("Log queue size must be greater than 0")
+
+        if self.log_level not in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'):
+
+            raise ConfigurationError(f"Unknown log level: {self.log_level}")
+
+        if self.log_max_bytes < 0 or self.log_rotate_interval < 0:
+
+            raise ConfigurationError("Log rotation limits cannot be negative")
+
+        ## Without a backup to rotate into, a full log file would be reopened and rotated again on every line
+
+        if self.log_backup_count <= 0:
+
+            raise ConfigurationError("Log backup count must be greater than 0")
+
+        if self.structured_log_flush_bytes < 0 or self.structured_log_flush_interval < 0:
+
+            raise ConfigurationError("Structured log flush limits cannot be negative")
         
 
 
@@ -7,6 +7,7 @@ import datetime
 from typing import Any, Dict, List
 
 from app.calculation import Calculation
+from app.history_buffer import HistoryBuffer
 
 
 
@@ -54,4 +55,59 @@ class CalculatorMemento:
         return cls(
             history=[Calculation.from_dict(calc) for calc in data['history']],
             timestamp=datetime.datetime.fromisoformat(data['timestamp'])
-        )
\ No newline at end of file
+        )
+
+@dataclass
+class HistoryDelta:
+
+    ## HistoryDelta class
+
+    ## A single entry in the undo / redo journal
+    ## Instead of snapshotting the whole history like CalculatorMemento does,
+    ## we only record what a change did to it, so undo / redo never copy the history
+
+    ## Fields:
+    ## added: List[Calculation] - entries appended to the end of the history
+    ## evicted: List[Calculation] - entries dropped from the front of the history (oldest first)
+    ## timestamp: datetime
+
+    added: List[Calculation] = field(default_factory = list)
+    evicted: List[Calculation] = field(default_factory = list)
+    timestamp: datetime.datetime = field(default_factory = datetime.datetime.now)
+
+    def undo(self, history: HistoryBuffer) -> None:
+
+        ## Reverts the change on the history in place
+
+        ## Params:
+        ## History: the calculator history
+
+        ## Returns:
+        ## None
+
+        ## First we drop what was appended, then we put back what was evicted
+        ## Both ends of the buffer are O(1), so this only costs the size of the delta
+
+        for _ in range(len(self.added)):
+
+            history.pop()
+
+        if self.evicted:
+
+            history.extendleft(self.evicted)
+
+    def redo(self, history: HistoryBuffer) -> None:
+
+        ## Re-applies the change on the history in place
+
+        ## Params:
+        ## History: the calculator history
+
+        ## Returns:
+        ## None
+
+        for _ in range(len(self.evicted)):
+
+            history.popleft()
+
+        history.extend(self.added)
@@ -5,7 +5,7 @@
 from decimal import Decimal
 from app.calculator import Calculator
 from app.exceptions import OperationError, ValidationError
-from app.history import AutoSaveObserver
+from app.history import AutoSaveObserver, StorageObserver
 from app.operations import OperationFactory
 from colorama import init, Fore, Style
 
@@ -18,7 +18,24 @@ def calculator_repl():
     try:
 
         calc = Calculator()
-        calc.add_observer(AutoSaveObserver(str(calc.config.history_file)))
+
+        ## Auto save appends each new row to the history file rather than rewriting it
+        ## With the sqlite or binary backends, rows are appended through the history storage instead
+
+        if calc.config.history_backend in ('sqlite', 'binary'):
+
+            autosave = StorageObserver(calc.storage, flush_every = calc.config.auto_save_flush_every)
+
+        else:
+
+            autosave = AutoSaveObserver(
+                str(calc.config.history_file),
+                append = True,
+                flush_every = calc.config.auto_save_flush_every,
+                fsync = calc.config.auto_save_fsync
+            )
+
+        calc.add_observer(autosave)
         print("Calculator started. Type 'help' for commands.")
 
         while True:
@@ -46,6 +63,10 @@ def calculator_repl():
                     print("      - Save history to file.")
                     print("    load:")
                     print("      - Load history from file.")
+                    print("    cache:")
+                    print("      - Show result cache statistics.")
+                    print("    stats:")
+                    print("      - Show how long each stage of a calculation takes.")
                     print("    help:")
                     print("      - Show available commands.")
                     print("    exit:")
@@ -55,6 +76,9 @@ def calculator_repl():
                  
                 if command == "exit":
 
+                    ## save_history delivers any queued notifications first, so nothing buffered lands after
+                    ## the full save. The calculator is closed last, so the save (or its error) is logged
+
                     try:
 
                         calc.save_history()
@@ -66,6 +90,7 @@ def calculator_repl():
                         print(f"Error saving history: {e}")
                         print(Style.RESET_ALL)
 
+                    calc.close()
                     print("Goodbye!")
                     break
 
@@ -151,6 +176,53 @@ def calculator_repl():
 
                     continue
 
+                if command == "cache":
+
+                    stats = calc.cache_stats()
+                    if stats is None:
+
+                        print(Fore.YELLOW + Style.BRIGHT)
+                        print("Result cache is disabled.")
+                        print(Style.RESET_ALL)
+
+                    else:
+
+                        print(
+                            f"Result cache: {stats['size']}/{stats['max_size']} entries, "
+                            f"{stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions"
+                        )
+
+                    continue
+
+                if command == "stats":
+
+                    stats = calc.stage_stats()
+                    if stats is None:
+
+                        print(Fore.YELLOW + Style.BRIGHT)
+                        print("Stage timing is disabled. Set CALCULATOR_STAGE_TIMING=true to enable it.")
+                        print(Style.RESET_ALL)
+
+                    elif not stats:
+
+                        print("No calculations timed yet.")
+
+                    else:
+
+                        for operation, stages in stats.items():
+
+                            print(f"\n{operation} ({next(iter(stages.values()))['count']} calculations), in microseconds:")
+                            print(f"    {'stage':<12}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}")
+
+                            for stage, timing in stages.items():
+
+                                print(
+                                    f"    {stage:<12}{timing['mean_ns'] / 1000:>10.1f}{timing['p50_ns'] / 1000:>10.1f}"
+                                    f"{timing['p99_ns'] / 1000:>10.1f}{timing['max_ns'] / 1000:>10.1f}"
+                                )
+
+                    continue
+
                 if command in ['add', 'subtract', 'multiply', 'divide', 'power', 'root', 'modulo', 'int_divide', 'percent', 'abs_diff']:
 
                     try:
@@ -205,6 +277,7 @@ def calculator_repl():
                 print(Fore.RED + Style.BRIGHT)
                 print("\nEOFError detected: terminating program...")
                 print(Style.RESET_ALL)
+                calc.close()
                 break
 
             except Exception as e:
@@ -220,6 +293,7 @@ def calculator_repl():
         print(Style.RESET_ALL)
         if calc is not None:
 
-            calc._send_message(40, f"Fatal error during initialization: {e}")
+            calc._send_message(40, "Fatal error during initialization: %s", e)
+            calc.close()
 
         raise
\ No newline at end of file
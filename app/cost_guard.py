@@ -0,0 +1,206 @@
+## cost_guard.py
+## IS 601 Midterm
+## Evan Garvey
+
+from decimal import Decimal
+import math
+from typing import Dict, Union
+
+from app.exceptions import OperationError
+
+## The operations whose cost can grow far beyond the size of their inputs
+
+GUARDED_OPERATIONS = ('power', 'root', 'multiply')
+
+## Of those, the ones that go through ln / exp or Newton's method, where the time grows with the working precision
+
+PRECISION_BOUND_OPERATIONS = ('power', 'root')
+
+POLICIES = ('reject', 'downgrade')
+
+
+def _digits(value: Decimal) -> int:
+
+    ## The number of digits in the coefficient of a Decimal
+
+    return len(value.as_tuple().digits)
+
+def _log10(value: Decimal) -> float:
+
+    ## A float estimate of log10(|value|) that cannot overflow, however large the value
+
+    exponent = value.adjusted()
+    return exponent + math.log10(abs(float(value.scaleb(-exponent))))
+
+def estimated_exponent(operation: str, num1: Decimal, num2: Decimal) -> float:
+
+    ## Estimates the (base 10) exponent of an operation's result from its operands, without running it
+    ## The estimate is an upper bound (for power and root, give or take float rounding)
+
+    ## Params:
+    ## Operation: the operation name
+    ## Num1 / Num2: the operands
+
+    ## Returns:
+    ## Float: at least the result's adjusted exponent (infinite for a power far too large to compute)
+
+    if not num1.is_finite() or not num2.is_finite():
+
+        return 0
+
+    if operation == 'divide':
+
+        return num1.adjusted() - num2.adjusted()
+
+    ## A percentage is a division scaled by 100
+
+    if operation == 'percentage calculation':
+
+        return num1.adjusted() - num2.adjusted() + 2
+
+    if operation in ('multiply', 'power', 'root') and (not num1 or not num2):
+
+        return 0
+
+    if operation == 'multiply':
+
+        return num1.adjusted() + num2.adjusted() + 1
+
+    if operation in ('power', 'root'):
+
+        log10 = _log10(num1)
+
+        ## A huge power becomes float infinity, which is over any limit unless the base is 1
+
+        estimate = log10 / float(num2) if operation == 'root' else (log10 * float(num2) if log10 else 0)
+
+        ## Nudged up a little, so float rounding cannot take it below a power of ten the result reaches
+
+        return estimate + abs(estimate) * 1e-9
+
+    ## Everything else (add, subtract, modulo, ...) is at most a digit longer than its largest operand
+
+    return max(num1.adjusted(), num2.adjusted()) + 1
+
+
+class CostGuard:
+
+    ## CostGuard class
+    ## Estimates what an operation will cost before it runs, and refuses work over budget
+    ## A single request such as 'power 9e998 0.5' at a high precision can otherwise keep a core busy for seconds
+
+    ## The checks, in order:
+    ## 1. no operand may have more than max_digits digits
+    ## 2. the result's exponent, estimated from the operands, may not exceed max_exponent (either way)
+    ## 3. power and root may not need more than max_digits digits of working precision
+    ##    With the 'downgrade' policy they run at max_digits instead; with 'reject' they are refused
+
+    ## Attributes:
+    ## max_digits / max_exponent: int - the budget
+    ## policy: str - 'reject' or 'downgrade'
+    ## checked / rejected / downgraded: int - counters for reporting
+
+    def __init__(self, max_digits: int, max_exponent: int, policy: str = 'reject'):
+
+        ## Initializes the CostGuard
+
+        ## Params:
+        ## Max_digits: the most digits an operand or the working precision may have
+        ## Max_exponent: the largest result exponent allowed
+        ## Policy: 'reject' or 'downgrade'
+
+        ## Returns:
+        ## None
+
+        ## Raises:
+        ## Exception: ValueError
+
+        if max_digits <= 0 or max_exponent <= 0:
+
+            raise ValueError("Cost limits must be greater than 0")
+
+        if policy not in POLICIES:
+
+            raise ValueError(f"Unknown cost policy: {policy}")
+
+        self.max_digits = max_digits
+        self.max_exponent = max_exponent
+        self.policy = policy
+
+        self.checked = 0
+        self.rejected = 0
+        self.downgraded = 0
+
+    def check(self, operation: str, num1: Decimal, num2: Decimal, precision: int) -> int:
+
+        ## Checks an operation against the budget before it runs
+
+        ## Params:
+        ## Operation: the operation name
+        ## Num1 / Num2: the operands
+        ## Precision: the working precision the operation would run at
+
+        ## Returns:
+        ## Integer: the precision to run at (lower than asked for if the operation was downgraded)
+
+        ## Raises:
+        ## Exception: OperationError
+
+        if operation not in GUARDED_OPERATIONS:
+
+            return precision
+
+        self.checked += 1
+
+        digits = max(_digits(num1), _digits(num2))
+        if digits > self.max_digits:
+
+            self._reject(f"Operand has {digits} digits, more than the limit of {self.max_digits}")
+
+        if self._result_exponent(operation, num1, num2) > self.max_exponent:
+
+            self._reject(f"Result of {operation} is out of range: its exponent would exceed {self.max_exponent}")
+
+        if precision > self.max_digits and operation in PRECISION_BOUND_OPERATIONS:
+
+            if self.policy == 'downgrade':
+
+                self.downgraded += 1
+                return self.max_digits
+
+            self._reject(
+                f"{operation.capitalize()} would need {precision} digits of precision, more than the limit of {self.max_digits}"
+            )
+
+        return precision
+
+    @staticmethod
+    def _result_exponent(operation: str, num1: Decimal, num2: Decimal) -> float:
+
+        ## Estimates the size of the result's (base 10) exponent, ignoring its sign
+
+        return abs(estimated_exponent(operation, num1, num2))
+
+    def _reject(self, message: str) -> None:
+
+        self.rejected += 1
+        raise OperationError(message)
+
+    def stats(self) -> Dict[str, Union[int, str]]:
+
+        ## Returns the guard's counters and budget
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Dict: checked, rejected, downgraded, policy, max_digits and max_exponent
+
+        return {
+            'checked': self.checked,
+            'rejected': self.rejected,
+            'downgraded': self.downgraded,
+            'policy': self.policy,
+            'max_digits': self.max_digits,
+            'max_exponent': self.max_exponent
+        }
@@ -0,0 +1,149 @@
+## decimal_math.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Decimal routines that the decimal module does not provide directly
+## Everything here works under the active Decimal context: results are rounded to its precision,
+## and any extra working precision is taken in a local context so the caller's is left untouched
+
+from decimal import Decimal, getcontext, localcontext
+import math
+
+
+def integer_root(value: int, n: int) -> int:
+
+    ## The integer part of the nth root of a non-negative integer (Newton's method on integers)
+
+    ## Params:
+    ## Value: int (>= 0)
+    ## N: int (>= 1)
+
+    ## Returns:
+    ## Integer: the largest r with r ** n <= value
+
+    if n == 2:
+
+        return math.isqrt(value)
+
+    if value < 2 or n == 1:
+
+        return value
+
+    if n >= value.bit_length():
+
+        return 1
+
+    ## Start above the root and come down; the iteration stops as soon as it stops decreasing
+
+    root = 1 << -(-value.bit_length() // n)
+    while True:
+
+        next_root = ((n - 1) * root + value // root ** (n - 1)) // n
+        if next_root >= root:
+
+            return root
+
+        root = next_root
+
+def _exact_root(x: Decimal, n: int, max_shift: int) -> Decimal:
+
+    ## Returns the nth root of x if it is an exact decimal (e.g. the cube root of 0.008), else None
+
+    _, digits, exponent = x.as_tuple()
+
+    ## Move digits from the exponent to the coefficient until the exponent divides by n
+
+    shift = exponent % n
+    if shift > max_shift:
+
+        return None
+
+    coefficient = int(''.join(map(str, digits))) * 10 ** shift
+    root = integer_root(coefficient, n)
+
+    if root ** n != coefficient:
+
+        return None
+
+    return Decimal(root).scaleb((exponent - shift) // n)
+
+def nth_root(x: Decimal, n: Decimal) -> Decimal:
+
+    ## The nth root of x, rounded to the precision of the active context
+    ## Integer n uses an exact result when there is one, and Newton's method otherwise, run at
+    ## doubling precision from a float estimate so each step only pays for the digits it can get right
+    ## A negative n gives the reciprocal of the root, and a fractional n goes through exp and ln
+
+    ## Params:
+    ## X: Decimal (> 0)
+    ## N: Decimal (non-zero)
+
+    ## Returns:
+    ## Decimal: x ** (1 / n)
+
+    context = getcontext()
+    precision = context.prec
+
+    if n != n.to_integral_value():
+
+        with localcontext() as ctx:
+
+            ctx.prec = precision + 5
+            root = (x.ln() / n).exp()
+
+        return context.plus(root)
+
+    k = abs(int(n))
+
+    ## Guard digits cover the rounding in y ** (k - 1), which grows with the number of digits in k
+
+    working = precision + len(str(k)) + 3
+
+    root = _exact_root(x, k, working)
+
+    if root is None:
+
+        root = _newton_root(x, k, working)
+
+    if n < 0:
+
+        with localcontext() as ctx:
+
+            ctx.prec = working
+            root = 1 / root
+
+    return context.plus(root)
+
+def _newton_root(x: Decimal, k: int, working: int) -> Decimal:
+
+    ## Newton's method for y ** k = x, finishing at the working precision
+
+    with localcontext() as ctx:
+
+        ## A float estimate is good to about 15 digits. The exponent is taken out first so the float cannot overflow,
+        ## except for very large k, where a short ln / exp estimate is used instead
+
+        ctx.prec = 20
+        if k <= 300:
+
+            scale = x.adjusted() // k
+            root = Decimal((float(x.scaleb(-scale * k)) ** (1.0 / k))).scaleb(scale)
+
+        else:
+
+            root = (x.ln() / k).exp()
+
+        digits = 15
+        while True:
+
+            digits = min(2 * digits, working)
+            ctx.prec = digits
+            root = ((k - 1) * root + x / root ** (k - 1)) / k
+
+            if digits == working:
+
+                break
+
+        ## One more step at full precision to settle the last digits
+
+        return ((k - 1) * root + x / root ** (k - 1)) / k
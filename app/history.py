@@ -5,13 +5,17 @@
 
 
 from abc import ABC, abstractmethod
+import csv
+import datetime
 import logging
-from typing import Any
-import pandas as pd
+import os
+from typing import Any, List, Optional, TextIO
 import warnings
 
 from app.calculation import Calculation
+from app.history_storage import HistoryStorage
 from app.logger import CalculationLogger
+from app.structured_log import JsonLinesWriter
 
 
 class HistoryObserver(ABC):
@@ -25,27 +29,51 @@ class HistoryObserver(ABC):
         
         pass # pragma: no cover
 
-    def update_message(self, level: int, message: str) -> None:
+    def update_message(self, level: int, message: str, *args) -> None:
 
         ## Optionally overrideable method for updating the log with a new message
+        ## The message is a %-style format string, with its arguments passed separately
         
         pass # pragma: no cover
 
+    def update_batch(self, calculations: List[Calculation]) -> None:
+
+        ## Optionally overrideable method for handling many calculations at once
+        ## By default each calculation is passed to update in order
+
+        for calculation in calculations:
+
+            self.update(calculation)
+
+    def flush(self) -> None:
+
+        ## Optionally overrideable method for pushing out anything the observer has buffered
+
+        pass
+
+    def close(self) -> None:
+
+        ## Optionally overrideable method for releasing anything the observer holds open
+
+        pass
+
 class LoggingObserver(HistoryObserver):
 
     ## Non-abstract class for logging calculations
 
-    def __init__(self, logger: CalculationLogger):
+    def __init__(self, logger: CalculationLogger, sink: Optional[JsonLinesWriter] = None):
 
         ## Initializes the LoggingObserver
 
         ## Params:
         ## Logger: The logger object
+        ## Sink: Optional structured log every calculation is also written to, one JSON line each
 
         ## Returns:
         ## None
 
         self.logger = logger
+        self.sink = sink
 
     def update(self, calculation: Calculation) -> None:
 
@@ -59,45 +87,136 @@ class LoggingObserver(HistoryObserver):
 
         if calculation is None:
 
-            self.logger.log_error(f"Calculation cannot be None")
+            self.logger.log_error("Calculation cannot be None")
             raise AttributeError
         
+        ## The Decimals are only turned into strings if the line is actually logged
+
         self.logger.log_info(
-            f"History updated: {calculation.operation}, "
-            f"({calculation.num1}, {calculation.num2}) = "
-            f"{calculation.result}"
+            "History updated: %s, (%s, %s) = %s",
+            calculation.operation,
+            calculation.num1,
+            calculation.num2,
+            calculation.result
         )
 
-    def update_message(self, level: int, message: str) -> None:
+        if self.sink is not None:
+
+            self.sink.write(calculation)
+
+    def update_batch(self, calculations: List[Calculation]) -> None:
+
+        ## Logs a whole batch with a single line rather than one per calculation
+
+        ## Params:
+        ## Calculations: The calculations to log
+
+        ## Returns:
+        ## None
+
+        if not calculations:
+
+            return
+
+        first = calculations[0]
+        self.logger.log_info(
+            "History updated: batch of %d calculations, first %s (%s, %s) = %s",
+            len(calculations),
+            first.operation,
+            first.num1,
+            first.num2,
+            first.result
+        )
+
+        ## The structured log still gets one line per calculation
+
+        if self.sink is not None:
+
+            for calculation in calculations:
+
+                self.sink.write(calculation)
+
+    def update_message(self, level: int, message: str, *args) -> None:
 
         if level == 20:
 
-            self.logger.log_info(message)
+            self.logger.log_info(message, *args)
 
         elif level == 30:
 
-            self.logger.log_warning(message)
+            self.logger.log_warning(message, *args)
 
         elif level == 40:
 
-            self.logger.log_error(message)
+            self.logger.log_error(message, *args)
 
         else:
 
-            self.logger.log_error(f"Invalid level: {level}")
+            self.logger.log_error("Invalid level: %s", level)
+
+    def flush(self) -> None:
+
+        ## Writes out the structured log's buffer
+
+        if self.sink is not None:
+
+            self.sink.flush()
+
+    def close(self) -> None:
+
+        ## Writes out anything still waiting in the logger's queue and the structured log's buffer
+
+        self.logger.close()
+
+        if self.sink is not None:
+
+            self.sink.close()
 
 class AutoSaveObserver(HistoryObserver):
 
     ## Non-abstract class for saving calculations
 
-    def __init__(self, csv_path: str):
+    ## There are two modes:
+    ## rewrite (default): keeps every row in a DataFrame and rewrites the whole CSV on each calculation
+    ## append: writes only the new row to an open, buffered file handle, writing the header once
+
+    COLUMNS = ["operation", "num1", "num2", "result", "timestamp"]
+
+    def __init__(self, csv_path: str, append: bool = False, flush_every: int = 1, fsync: bool = False):
+
+        ## Initializes the AutoSaveObserver
+
+        ## Params:
+        ## csv_path: the file to save to
+        ## append: whether to append rows instead of rewriting the file
+        ## flush_every: in append mode, flush the buffer after this many rows (0 = only when closing)
+        ## fsync: in append mode, also fsync the file each time it is flushed
+
+        ## Returns:
+        ## None
+
+        ## Raises:
+        ## Exception: TypeError
 
         if csv_path is None:
 
             raise TypeError("csv_path cannot be None")
 
         self.csv_path = csv_path
-        self.df = pd.DataFrame(columns=["operation", "num1", "num2", "result", "timestamp"])
+        self.append = append
+        self.flush_every = flush_every
+        self.fsync = fsync
+
+        self._file: Optional[TextIO] = None
+        self._writer = None
+        self._pending = 0
+
+        ## pandas is slow to import and only the rewrite mode needs it
+
+        if not append:
+
+            import pandas as pd
+            self.df = pd.DataFrame(columns=self.COLUMNS)
 
     def update(self, calculation: Calculation) -> None:
 
@@ -116,8 +235,15 @@ class AutoSaveObserver(HistoryObserver):
 
             raise AttributeError("Calculation cannot be None")
 
+        if self.append:
+
+            self._append_rows([calculation])
+            return
+
         ## Append the calculation to the dataframe
 
+        import pandas as pd
+
         new_row = pd.DataFrame([{
             "operation": calculation.operation,
             "num1": calculation.num1,
@@ -132,4 +258,200 @@ class AutoSaveObserver(HistoryObserver):
 
         ## Save the dataframe to the file
 
-        self.df.to_csv(self.csv_path, index=False)
\ No newline at end of file
+        self.df.to_csv(self.csv_path, index=False)
+
+    def update_batch(self, calculations: List[Calculation]) -> None:
+
+        ## Saves a whole batch with a single write (append mode) or a single rewrite
+
+        ## Params:
+        ## Calculations: The calculations to save
+
+        ## Returns:
+        ## None
+
+        if self.append:
+
+            self._append_rows(calculations)
+            return
+
+        import pandas as pd
+
+        new_rows = pd.DataFrame([{
+            "operation": calculation.operation,
+            "num1": calculation.num1,
+            "num2": calculation.num2,
+            "result": calculation.result,
+            "timestamp": calculation.timestamp
+        } for calculation in calculations], columns=self.COLUMNS)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            self.df = pd.concat([self.df, new_rows], ignore_index=True)
+
+        self.df.to_csv(self.csv_path, index=False)
+
+    def _append_rows(self, calculations: List[Calculation]) -> None:
+
+        ## Writes rows to the open file, opening it on first use
+
+        ## Params:
+        ## Calculations: The calculations to save
+
+        ## Returns:
+        ## None
+
+        if self._file is None:
+
+            self._file = open(self.csv_path, "a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+
+            ## In append mode the position starts at the end, so 0 means the file is empty
+
+            if self._file.tell() == 0:
+
+                self._writer.writerow(self.COLUMNS)
+
+        self._writer.writerows(self._row(calculation) for calculation in calculations)
+
+        self._pending += len(calculations)
+        if self.flush_every and self._pending >= self.flush_every:
+
+            self.flush()
+
+    @staticmethod
+    def _row(calculation: Calculation) -> list:
+
+        ## Converts a calculation to a CSV row
+
+        timestamp = calculation.timestamp
+        if isinstance(timestamp, datetime.datetime):
+
+            timestamp = timestamp.isoformat()
+
+        return [
+            calculation.operation,
+            calculation.num1,
+            calculation.num2,
+            calculation.result,
+            timestamp
+        ]
+
+    def flush(self) -> None:
+
+        ## Pushes any buffered rows to the file (and to disk if fsync is on)
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## None
+
+        if self._file is None:
+
+            return
+
+        self._file.flush()
+        if self.fsync:
+
+            os.fsync(self._file.fileno())
+
+        self._pending = 0
+
+    def close(self) -> None:
+
+        ## Flushes and closes the file. Safe to call more than once
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## None
+
+        if self._file is None:
+
+            return
+
+        try:
+
+            self.flush()
+
+        finally:
+
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def __enter__(self) -> "AutoSaveObserver":
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+
+        self.close()
+
+class StorageObserver(HistoryObserver):
+
+    ## Non-abstract class for saving calculations through a HistoryStorage backend
+    ## Used for auto save when the history is kept somewhere other than a CSV file (e.g. SQLite)
+    ## Calculations are buffered and written together, so each flush is a single transaction
+
+    def __init__(self, storage: HistoryStorage, flush_every: int = 1):
+
+        ## Initializes the StorageObserver
+
+        ## Params:
+        ## storage: the backend to save to
+        ## flush_every: write the buffer after this many calculations (0 = only when flushed or closed)
+
+        ## Returns:
+        ## None
+
+        self.storage = storage
+        self.flush_every = flush_every
+        self._pending: List[Calculation] = []
+
+    def update(self, calculation: Calculation) -> None:
+
+        ## Buffers the calculation, writing the buffer once it is full
+
+        ## Params:
+        ## Calculation: The calculation to save
+
+        ## Returns:
+        ## None
+
+        if calculation is None:
+
+            raise AttributeError("Calculation cannot be None")
+
+        self.update_batch([calculation])
+
+    def update_batch(self, calculations: List[Calculation]) -> None:
+
+        ## Buffers the calculations, writing the buffer once it is full
+
+        self._pending.extend(calculations)
+
+        if self.flush_every and len(self._pending) >= self.flush_every:
+
+            self.flush()
+
+    def update_message(self, level: int, message: str, *args) -> None:
+
+        ## Messages are not saved
+
+        pass
+
+    def flush(self) -> None:
+
+        ## Writes any buffered calculations
+
+        if self._pending:
+
+            pending, self._pending = self._pending, []
+            self.storage.append(pending)
+
+    def close(self) -> None:
+
+        self.flush()
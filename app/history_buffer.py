@@ -0,0 +1,164 @@
+## history_buffer.py
+## IS 601 Midterm
+## Evan Garvey
+
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Iterable, Iterator, List, Optional
+
+from app.calculation import Calculation
+
+
+class HistoryBuffer:
+
+    ## HistoryBuffer class
+    ## A bounded container for the calculator history
+    ## It is backed by a deque, so appending, evicting and restoring entries
+    ## at either end are all O(1) no matter how large max_history is
+
+    ## Attributes:
+    ## capacity: int - the maximum number of entries held
+
+    def __init__(self, capacity: int, items: Iterable[Calculation] = ()):
+
+        ## Initializes the HistoryBuffer
+
+        ## Params:
+        ## Capacity: the maximum number of entries held
+        ## Items: initial entries, oldest first. Only the newest 'capacity' entries are kept
+
+        ## Returns:
+        ## None
+
+        ## Raises:
+        ## Exception: ValueError
+
+        if capacity <= 0:
+
+            raise ValueError("History capacity must be greater than 0")
+
+        self.capacity = capacity
+        self._entries: Deque[Calculation] = deque(items)
+
+        while len(self._entries) > capacity:
+
+            self._entries.popleft()
+
+    def append(self, calculation: Calculation) -> Optional[Calculation]:
+
+        ## Appends a calculation, evicting the oldest entry if the buffer is full
+
+        ## Params:
+        ## Calculation: the calculation to add
+
+        ## Returns:
+        ## Optional[Calculation]: the evicted entry, so the undo journal can record it
+
+        self._entries.append(calculation)
+
+        if len(self._entries) > self.capacity:
+
+            return self._entries.popleft()
+
+        return None
+
+    def extend(self, calculations: Iterable[Calculation]) -> List[Calculation]:
+
+        ## Appends several calculations, evicting from the front as needed
+
+        ## Params:
+        ## Calculations: the calculations to add, oldest first
+
+        ## Returns:
+        ## List[Calculation]: the evicted entries, oldest first
+
+        self._entries.extend(calculations)
+
+        evicted = []
+        while len(self._entries) > self.capacity:
+
+            evicted.append(self._entries.popleft())
+
+        return evicted
+
+    def extendleft(self, calculations: Iterable[Calculation]) -> None:
+
+        ## Puts entries back at the front of the buffer
+        ## Used by undo to restore evicted entries, so capacity is not enforced here
+
+        ## Params:
+        ## Calculations: the calculations to restore, oldest first
+
+        ## Returns:
+        ## None
+
+        self._entries.extendleft(reversed(list(calculations)))
+
+    def pop(self) -> Calculation:
+
+        ## Removes and returns the newest entry
+
+        return self._entries.pop()
+
+    def popleft(self) -> Calculation:
+
+        ## Removes and returns the oldest entry
+
+        return self._entries.popleft()
+
+    def clear(self) -> None:
+
+        ## Removes every entry
+
+        self._entries.clear()
+
+    def copy(self) -> List[Calculation]:
+
+        ## Returns the entries as a plain list, oldest first
+
+        return list(self._entries)
+
+    def __len__(self) -> int:
+
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Calculation]:
+
+        return iter(self._entries)
+
+    def __reversed__(self) -> Iterator[Calculation]:
+
+        return reversed(self._entries)
+
+    def __getitem__(self, index: Any) -> Any:
+
+        ## Indexed access. Indices near either end are O(1)
+        ## Slices are returned as plain lists
+
+        if isinstance(index, slice):
+
+            if index.step is None and (index.start or 0) >= 0 and (index.stop is None or index.stop >= 0):
+
+                return list(islice(self._entries, index.start, index.stop))
+
+            return list(self._entries)[index]
+
+        return self._entries[index]
+
+    def __eq__(self, other: object) -> bool:
+
+        ## Buffers compare equal to any sequence holding the same entries
+
+        if isinstance(other, HistoryBuffer):
+
+            return list(self._entries) == list(other._entries)
+
+        if isinstance(other, (list, tuple, deque)):
+
+            return list(self._entries) == list(other)
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+
+        return f"HistoryBuffer(capacity={self.capacity}, entries={list(self._entries)!r})"
@@ -0,0 +1,142 @@
+## history_convert.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Converts history files between the CSV layout and the binary format
+## The direction is picked from the source file: binary files are converted to CSV, anything else to binary
+## Rows are streamed, so files of any size convert in constant memory
+
+## Usage:
+## python -m app.history_convert SOURCE DEST
+
+import csv
+import datetime
+from decimal import Decimal, InvalidOperation
+import os
+from pathlib import Path
+import sys
+from typing import List, Optional
+
+from app.history_storage import BINARY_MAGIC, HISTORY_COLUMNS, BinaryHistoryStorage, encode_record
+
+
+def is_binary_history(path: Path) -> bool:
+
+    ## Whether the file starts with the binary history header
+
+    with open(path, 'rb') as f:
+
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+def csv_to_binary(source: Path, dest: Path) -> int:
+
+    ## Converts a CSV history file to the binary format
+
+    ## Params:
+    ## Source: the CSV file
+    ## Dest: the binary file to write
+
+    ## Returns:
+    ## Integer: the number of calculations converted
+
+    ## Raises:
+    ## Exception: ValueError
+
+    count = 0
+    temp_path = Path(dest).with_name(Path(dest).name + '.tmp')
+
+    with open(source, 'r', newline = '', encoding = 'utf-8') as src, open(temp_path, 'wb') as dst:
+
+        dst.write(BINARY_MAGIC)
+
+        for line, row in enumerate(csv.DictReader(src), start = 2):
+
+            try:
+
+                ## Numbers are checked here rather than when the binary file is loaded
+
+                for column in ('num1', 'num2', 'result'):
+
+                    Decimal(row[column])
+
+                dst.write(encode_record(
+                    row['operation'],
+                    row['num1'],
+                    row['num2'],
+                    row['result'],
+                    datetime.datetime.fromisoformat(row['timestamp'])
+                ))
+
+            except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+
+                raise ValueError(f"Invalid history row on line {line}: {e}")
+
+            count += 1
+
+    os.replace(temp_path, dest)
+    return count
+
+def binary_to_csv(source: Path, dest: Path) -> int:
+
+    ## Converts a binary history file to the CSV layout
+
+    ## Params:
+    ## Source: the binary file
+    ## Dest: the CSV file to write
+
+    ## Returns:
+    ## Integer: the number of calculations converted
+
+    count = 0
+
+    with open(dest, 'w', newline = '', encoding = 'utf-8') as dst:
+
+        writer = csv.writer(dst)
+        writer.writerow(HISTORY_COLUMNS)
+
+        for calculation in BinaryHistoryStorage(source).iter_all():
+
+            writer.writerow([
+                calculation.operation,
+                str(calculation.num1),
+                str(calculation.num2),
+                str(calculation.result),
+                calculation.timestamp.isoformat()
+            ])
+            count += 1
+
+    return count
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    args = sys.argv[1:] if argv is None else argv
+
+    if len(args) != 2:
+
+        print("Usage: python -m app.history_convert SOURCE DEST", file = sys.stderr)
+        return 2
+
+    source, dest = Path(args[0]), Path(args[1])
+
+    try:
+
+        if is_binary_history(source):
+
+            count = binary_to_csv(source, dest)
+            print(f"Converted {count} calculations from binary to CSV: {dest}")
+
+        else:
+
+            count = csv_to_binary(source, dest)
+            print(f"Converted {count} calculations from CSV to binary: {dest}")
+
+    except (OSError, ValueError) as e:
+
+        print(f"Error converting history: {e}", file = sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,612 @@
+## history_storage.py
+## IS 601 Midterm
+## Evan Garvey
+
+from abc import ABC, abstractmethod
+import csv
+import datetime
+from decimal import Decimal
+import io
+import mmap
+import os
+from pathlib import Path
+import sqlite3
+import struct
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.calculation import Calculation
+
+## The columns every backend stores, in file order
+
+HISTORY_COLUMNS = ['operation', 'num1', 'num2', 'result', 'timestamp']
+
+def _read_csv_tail(path: Path, rows: int, block_size: int = 1 << 16) -> str:
+
+    ## Reads the header and the last rows of a CSV file without reading the rest of it
+    ## The file is scanned backwards in blocks until enough line breaks have been seen
+
+    ## Params:
+    ## Path: the CSV file
+    ## Rows: how many data rows to keep
+    ## Block_size: how many bytes to read per step
+
+    ## Returns:
+    ## String: the header followed by at most 'rows' data rows
+
+    with open(path, 'rb') as f:
+
+        header = f.readline()
+        data_start = f.tell()
+
+        position = f.seek(0, os.SEEK_END)
+        blocks = []
+        newlines = 0
+
+        ## We need one more line break than rows, as the first line we land in is usually partial
+
+        while position > data_start and newlines <= rows:
+
+            step = min(block_size, position - data_start)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            blocks.append(block)
+            newlines += block.count(b'\n')
+
+    lines = b''.join(reversed(blocks)).splitlines(keepends = True)
+
+    return (header + b''.join(lines[-rows:])).decode('utf-8')
+
+def _row(calculation: Calculation) -> tuple:
+
+    ## A calculation as stored text. Numbers are kept as strings so Decimals round trip exactly
+
+    return (
+        str(calculation.operation),
+        str(calculation.num1),
+        str(calculation.num2),
+        str(calculation.result),
+        calculation.timestamp.isoformat()
+    )
+
+
+class HistoryStorage(ABC):
+
+    ## HistoryStorage class
+    ## The interface every history backend implements
+    ## The Calculator only talks to this, so backends can be swapped through the config
+
+    ## Attributes:
+    ## path: Path - where the history is kept
+
+    def __init__(self, path: Path):
+
+        self.path = Path(path)
+
+    @abstractmethod
+    def exists(self) -> bool:
+
+        ## Whether there is any saved history to load
+
+        pass # pragma: no cover
+
+    @abstractmethod
+    def load_recent(self, limit: int) -> List[Calculation]:
+
+        ## Returns the newest 'limit' calculations, oldest first
+
+        pass # pragma: no cover
+
+    @abstractmethod
+    def save(self, calculations: Iterable[Calculation]) -> None:
+
+        ## Replaces the saved history with the given calculations
+
+        pass # pragma: no cover
+
+    @abstractmethod
+    def append(self, calculations: List[Calculation]) -> None:
+
+        ## Adds calculations after the saved ones
+
+        pass # pragma: no cover
+
+    def query(
+            self,
+            operation: Optional[str] = None,
+            since: Optional[datetime.datetime] = None,
+            until: Optional[datetime.datetime] = None,
+            limit: Optional[int] = None
+    ) -> List[Calculation]:
+
+        ## Returns the saved calculations matching every given filter, oldest first
+        ## This default reads everything and filters in memory. Backends that can do better override it
+
+        ## Params:
+        ## Operation: only calculations of this operation
+        ## Since / until: only calculations in this time range (inclusive)
+        ## Limit: at most this many of the newest matches
+
+        ## Returns:
+        ## List[Calculation]: the matching calculations
+
+        if not self.exists():
+
+            return []
+
+        matches = [
+            calculation for calculation in self.load_recent(0)
+            if (operation is None or calculation.operation == operation)
+            and (since is None or calculation.timestamp >= since)
+            and (until is None or calculation.timestamp <= until)
+        ]
+
+        return matches[-limit:] if limit else matches
+
+    def close(self) -> None:
+
+        ## Releases anything the backend holds open. The backend may still be used afterwards
+
+        pass
+
+
+class CsvHistoryStorage(HistoryStorage):
+
+    ## History kept in a single CSV file
+    ## Saving rewrites the file; appending adds rows at the end
+
+    def exists(self) -> bool:
+
+        return self.path.exists()
+
+    def load_recent(self, limit: int) -> List[Calculation]:
+
+        ## Only the newest rows are read and parsed (0 reads them all)
+        ## Columns are read as strings so Decimals are built from the exact saved text
+
+        import pandas as pd
+
+        if limit:
+
+            source = io.StringIO(_read_csv_tail(self.path, limit))
+
+        else:
+
+            source = self.path
+
+        df = pd.read_csv(
+            source,
+            dtype = str,
+            usecols = HISTORY_COLUMNS,
+            keep_default_na = False
+        )
+
+        if df.empty:
+
+            return []
+
+        return Calculation.from_columns(
+            df['operation'],
+            df['num1'],
+            df['num2'],
+            df['result'],
+            df['timestamp']
+        )
+
+    def save(self, calculations: Iterable[Calculation]) -> None:
+
+        import pandas as pd
+
+        rows = [_row(calculation) for calculation in calculations]
+        pd.DataFrame(rows, columns = HISTORY_COLUMNS).to_csv(self.path, index = False)
+
+    def append(self, calculations: List[Calculation]) -> None:
+
+        with open(self.path, 'a', newline = '', encoding = 'utf-8') as f:
+
+            writer = csv.writer(f)
+            if f.tell() == 0:
+
+                writer.writerow(HISTORY_COLUMNS)
+
+            writer.writerows(_row(calculation) for calculation in calculations)
+
+
+class SqliteHistoryStorage(HistoryStorage):
+
+    ## History kept in a SQLite database
+    ## The database runs in WAL mode, so readers do not block the auto save writer, and every
+    ## save or append is a single transaction. Operation and timestamp are indexed for query()
+
+    ## The connection is opened on first use and may be shared with the observer dispatch thread,
+    ## so every statement runs under a lock
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS history ("
+        " id INTEGER PRIMARY KEY,"
+        " operation TEXT NOT NULL,"
+        " num1 TEXT NOT NULL,"
+        " num2 TEXT NOT NULL,"
+        " result TEXT NOT NULL,"
+        " timestamp TEXT NOT NULL"
+        ")",
+        "CREATE INDEX IF NOT EXISTS idx_history_operation ON history (operation)",
+        "CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)"
+    )
+
+    INSERT = "INSERT INTO history (operation, num1, num2, result, timestamp) VALUES (?, ?, ?, ?, ?)"
+
+    def __init__(self, path: Path):
+
+        super().__init__(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+
+        ## Opens the database and creates the schema if needed
+
+        if self._connection is None:
+
+            connection = sqlite3.connect(self.path, check_same_thread = False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+
+            with connection:
+
+                for statement in self.SCHEMA:
+
+                    connection.execute(statement)
+
+            self._connection = connection
+
+        return self._connection
+
+    def exists(self) -> bool:
+
+        return self.path.exists()
+
+    def load_recent(self, limit: int) -> List[Calculation]:
+
+        ## The newest rows are picked by id (insertion order), so only 'limit' rows are read (0 reads them all)
+
+        sql = "SELECT operation, num1, num2, result, timestamp FROM history"
+
+        if limit:
+
+            return self._select(
+                "SELECT operation, num1, num2, result, timestamp FROM ("
+                " SELECT id, operation, num1, num2, result, timestamp FROM history ORDER BY id DESC LIMIT ?"
+                ") ORDER BY id",
+                (limit,)
+            )
+
+        return self._select(sql + " ORDER BY id", ())
+
+    def save(self, calculations: Iterable[Calculation]) -> None:
+
+        rows = [_row(calculation) for calculation in calculations]
+
+        with self._lock:
+
+            connection = self._connect()
+            with connection:
+
+                connection.execute("DELETE FROM history")
+                connection.executemany(self.INSERT, rows)
+
+    def append(self, calculations: List[Calculation]) -> None:
+
+        rows = [_row(calculation) for calculation in calculations]
+
+        with self._lock:
+
+            connection = self._connect()
+            with connection:
+
+                connection.executemany(self.INSERT, rows)
+
+    def query(
+            self,
+            operation: Optional[str] = None,
+            since: Optional[datetime.datetime] = None,
+            until: Optional[datetime.datetime] = None,
+            limit: Optional[int] = None
+    ) -> List[Calculation]:
+
+        ## Filters in SQL, using the operation and timestamp indexes
+
+        conditions = []
+        params: list = []
+
+        if operation is not None:
+
+            conditions.append("operation = ?")
+            params.append(operation)
+
+        if since is not None:
+
+            conditions.append("timestamp >= ?")
+            params.append(since.isoformat())
+
+        if until is not None:
+
+            conditions.append("timestamp <= ?")
+            params.append(until.isoformat())
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (
+            "SELECT operation, num1, num2, result, timestamp FROM ("
+            f" SELECT id, operation, num1, num2, result, timestamp FROM history{where}"
+            " ORDER BY timestamp DESC, id DESC"
+            f"{' LIMIT ?' if limit else ''}"
+            ") ORDER BY timestamp, id"
+        )
+
+        if limit:
+
+            params.append(limit)
+
+        return self._select(sql, tuple(params))
+
+    def _select(self, sql: str, params: tuple) -> List[Calculation]:
+
+        with self._lock:
+
+            rows = self._connect().execute(sql, params).fetchall()
+
+        if not rows:
+
+            return []
+
+        return Calculation.from_columns(*zip(*rows))
+
+    def close(self) -> None:
+
+        with self._lock:
+
+            if self._connection is not None:
+
+                self._connection.close()
+                self._connection = None
+
+
+## Binary history format
+## The file starts with BINARY_MAGIC, followed by one record per calculation:
+##   operation code   1 byte  (an index into BINARY_OPERATIONS, or 0 for a name stored inline)
+##   timestamp        8 bytes (signed microseconds since 1970-01-01)
+##   lengths          2 bytes each for the inline name (0 unless code is 0), num1, num2 and result
+##   text             the name (utf-8), then num1, num2 and result as Decimal text, so values round trip exactly
+##   record length    2 bytes (size of everything above)
+## Integers are little endian. Keeping every length up front means a record is decoded with one unpack,
+## and the trailing record length lets a reader walk backwards from the end of the file, so the newest
+## records can be found without reading older ones
+
+BINARY_MAGIC = b'CALCHST1'
+
+## Codes are stored in files, so existing entries must never be reordered
+
+BINARY_OPERATIONS = [
+    None,
+    'add',
+    'subtract',
+    'multiply',
+    'divide',
+    'power',
+    'root',
+    'modulo',
+    'integer division',
+    'percentage calculation',
+    'absolute difference'
+]
+
+_OPERATION_CODES = {name: code for code, name in enumerate(BINARY_OPERATIONS) if name}
+_HEAD = struct.Struct('<BqHHHH')
+_LENGTH = struct.Struct('<H')
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds = 1)
+
+def encode_record(operation: str, num1: str, num2: str, result: str, timestamp: datetime.datetime) -> bytes:
+
+    ## Encodes one calculation, given as stored text plus its timestamp
+
+    ## Params:
+    ## Operation / num1 / num2 / result: the calculation as text
+    ## Timestamp: when it was made. Aware timestamps are stored as UTC
+
+    ## Returns:
+    ## Bytes: the encoded record
+
+    ## Raises:
+    ## Exception: ValueError
+
+    if timestamp.tzinfo is not None:
+
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo = None)
+
+    code = _OPERATION_CODES.get(operation, 0)
+    name = operation.encode('utf-8') if code == 0 else b''
+    numbers = [text.encode('ascii') for text in (num1, num2, result)]
+
+    try:
+
+        body = _HEAD.pack(
+            code,
+            (timestamp - _EPOCH) // _MICROSECOND,
+            len(name),
+            *(len(number) for number in numbers)
+        ) + name + b''.join(numbers)
+
+        return body + _LENGTH.pack(len(body))
+
+    except struct.error as e:
+
+        raise ValueError(f"Calculation too large for the binary history format: {e}")
+
+def decode_record(buffer: Sequence, offset: int) -> Tuple[Calculation, int]:
+
+    ## Decodes the record starting at offset
+
+    ## Params:
+    ## Buffer: the file contents (bytes or an mmap)
+    ## Offset: where the record starts
+
+    ## Returns:
+    ## Tuple[Calculation, int]: the decoded calculation and the offset of the next record
+
+    code, micros, name_length, num1_length, num2_length, result_length = _HEAD.unpack_from(buffer, offset)
+    start = offset + _HEAD.size
+    end = start + name_length + num1_length + num2_length + result_length
+    data = buffer[start:end]
+
+    ## Decimal text is ASCII, so a latin-1 decode keeps byte and character positions the same
+
+    text = data.decode('latin-1')
+    num1_end = name_length + num1_length
+    num2_end = num1_end + num2_length
+
+    calculation = Calculation(
+        operation = data[:name_length].decode('utf-8') if code == 0 else BINARY_OPERATIONS[code],
+        num1 = Decimal(text[name_length:num1_end]),
+        num2 = Decimal(text[num1_end:num2_end]),
+        result = Decimal(text[num2_end:]),
+        timestamp = _EPOCH + micros * _MICROSECOND
+    )
+
+    return calculation, end + _LENGTH.size
+
+def iter_record_offsets(buffer: Sequence) -> Iterator[int]:
+
+    ## Yields record offsets newest first, by following the record lengths back from the end
+    ## Nothing is decoded, so stopping early costs only the records visited
+
+    ## Raises:
+    ## Exception: ValueError
+
+    if bytes(buffer[:len(BINARY_MAGIC)]) != BINARY_MAGIC:
+
+        raise ValueError("Not a binary history file")
+
+    end = len(buffer)
+
+    while end > len(BINARY_MAGIC):
+
+        (length,) = _LENGTH.unpack_from(buffer, end - _LENGTH.size)
+        start = end - _LENGTH.size - length
+
+        if start < len(BINARY_MAGIC):
+
+            raise ValueError("Corrupt binary history file")
+
+        yield start
+        end = start
+
+
+class BinaryHistoryStorage(HistoryStorage):
+
+    ## History kept in the compact binary format described above
+    ## Loading memory-maps the file and decodes only the newest records, so load time depends
+    ## on max_history rather than on how large the file has grown
+
+    def exists(self) -> bool:
+
+        return self.path.exists()
+
+    def load_recent(self, limit: int) -> List[Calculation]:
+
+        ## Returns the newest 'limit' calculations, oldest first (0 returns them all)
+
+        if self.path.stat().st_size <= len(BINARY_MAGIC):
+
+            return []
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+
+            offsets = []
+            for offset in iter_record_offsets(buffer):
+
+                offsets.append(offset)
+                if limit and len(offsets) == limit:
+
+                    break
+
+            return [decode_record(buffer, offset)[0] for offset in reversed(offsets)]
+
+    def iter_all(self) -> Iterator[Calculation]:
+
+        ## Yields every saved calculation, oldest first, decoding one record at a time
+
+        if self.path.stat().st_size <= len(BINARY_MAGIC):
+
+            return
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+
+            if bytes(buffer[:len(BINARY_MAGIC)]) != BINARY_MAGIC:
+
+                raise ValueError("Not a binary history file")
+
+            offset = len(BINARY_MAGIC)
+            while offset < len(buffer):
+
+                calculation, offset = decode_record(buffer, offset)
+                yield calculation
+
+    def save(self, calculations: Iterable[Calculation]) -> None:
+
+        ## The file is written next to the old one and swapped in, so a failed save leaves the old history
+
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+
+        with open(temp_path, 'wb') as f:
+
+            f.write(BINARY_MAGIC)
+            f.writelines(encode_record(*_row(calculation)[:4], calculation.timestamp) for calculation in calculations)
+
+        os.replace(temp_path, self.path)
+
+    def append(self, calculations: List[Calculation]) -> None:
+
+        with open(self.path, 'ab') as f:
+
+            if f.tell() == 0:
+
+                f.write(BINARY_MAGIC)
+
+            f.write(b''.join(encode_record(*_row(calculation)[:4], calculation.timestamp) for calculation in calculations))
+
+
+class HistoryStorageFactory:
+
+    ## For creating the HistoryStorage backend named in the config
+    ## This follows the Factory Pattern, like OperationFactory
+
+    _backends: Dict[str, type] = {
+        "csv": CsvHistoryStorage,
+        "sqlite": SqliteHistoryStorage,
+        "binary": BinaryHistoryStorage
+    }
+
+    @classmethod
+    def create(cls, backend: str, path: Path) -> HistoryStorage:
+
+        ## Creates a HistoryStorage object
+
+        ## Params:
+        ## Backend: the backend name, 'csv', 'sqlite' or 'binary'
+        ## Path: where the history is kept
+
+        ## Returns:
+        ## HistoryStorage: the created backend
+
+        ## Raises:
+        ## Exception: ValueError
+
+        storage = cls._backends.get(backend.lower())
+
+        if not storage:
+
+            raise ValueError(f"Unknown history backend: {backend}")
+
+        return storage(path)
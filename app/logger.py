@@ -3,19 +3,323 @@
 ## Evan Garvey
 
 from abc import ABC, abstractmethod
+import gzip
 import logging
+import logging.handlers
+import os
+from pathlib import Path
+import queue
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
 from app.calculator_config import CalculatorConfig
 
+## The logger name carries the session, so the lines of sessions sharing a file can be told apart
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+## The prefix each level's messages are written with
+
+_PREFIXES = {logging.INFO: 'Info: ', logging.WARNING: 'Warning: ', logging.ERROR: 'Error: '}
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+
+    ## A QueueListener whose stop waits for room on a full queue,
+    ## so the stop marker always gets in and everything queued before it is written
+
+    def enqueue_sentinel(self) -> None:
+
+        self.queue.put(self._sentinel)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+
+    ## BoundedQueueHandler class
+    ## The handler the calling thread logs through: it only puts the record on a bounded queue
+    ## A listener thread takes records off the queue, formats them and hands them to the target handlers (the log file)
+    ## When the queue is full the new record is dropped rather than making the caller wait
+
+    ## Attributes:
+    ## enqueued / dropped: int - counters for reporting
+
+    def __init__(self, max_size: int, *handlers: logging.Handler):
+
+        ## Initializes the handler and starts its listener thread
+
+        ## Params:
+        ## Max_size: how many records may be waiting at once
+        ## Handlers: the handlers the listener writes to
+
+        ## Returns:
+        ## None
+
+        ## Raises:
+        ## Exception: ValueError
+
+        if max_size <= 0:
+
+            raise ValueError("Log queue size must be greater than 0")
+
+        super().__init__(queue.Queue(max_size))
+
+        self.max_size = max_size
+        self.handlers = handlers
+        self.enqueued = 0
+        self.dropped = 0
+
+        self._listener: Optional[logging.handlers.QueueListener] = _DrainingQueueListener(
+            self.queue, *handlers, respect_handler_level = True
+        )
+        self._listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+
+        ## The record stays in this process, so it is queued as it is
+        ## Formatting it (which QueueHandler does by default) is left to the listener thread
+
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+
+        ## Called with the handler's lock held, so the counters need no lock of their own
+
+        try:
+
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+
+        except queue.Full:
+
+            self.dropped += 1
+
+    def flush(self) -> None:
+
+        ## Flushes the target handlers. Records still on the queue are only written by close
+
+        for handler in self.handlers:
+
+            handler.flush()
+
+    def close(self) -> None:
+
+        ## Writes out everything queued, stops the listener thread and closes the target handlers
+        ## Called by Calculator.close, and by the logging module at interpreter exit
+
+        if self._listener is not None:
+
+            listener = self._listener
+            self._listener = None
+            listener.stop()
+
+            for handler in self.handlers:
+
+                handler.close()
+
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+
+        ## Returns the handler's counters
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Dict: enqueued, dropped, depth (records waiting now) and max_size
+
+        return {
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'depth': self.queue.qsize(),
+            'max_size': self.max_size
+        }
+
+
+def _compress(source: str, dest: str) -> None:
+
+    ## Gzips source into dest, then removes source
+    ## The data goes to a temporary file first, so dest never holds a half written archive
+
+    partial = dest + '.tmp'
+
+    with open(source, 'rb') as file_in, gzip.open(partial, 'wb') as file_out:
+
+        shutil.copyfileobj(file_in, file_out)
+
+    os.replace(partial, dest)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+
+    ## CompressingRotatingFileHandler class
+    ## A log file handler that starts a new file when the current one reaches max_bytes,
+    ## or when interval seconds have passed since the last rotation, whichever comes first
+    ## Rotated files are numbered like RotatingFileHandler's (calculator.log.1.gz is the newest)
+    ## and gzipped on a background thread, so a rotation only costs a rename
+
+    ## Attributes:
+    ## interval: int - seconds between time based rotations (0 = size only)
+    ## rollover_at: Optional[float] - when the next time based rotation is due
+    ## rotations: int - counter for reporting
+
+    def __init__(
+            self,
+            filename: str,
+            max_bytes: int = 0,
+            interval: int = 0,
+            backup_count: int = 0,
+            encoding: Optional[str] = None
+    ):
+
+        ## Initializes the handler
+
+        ## Params:
+        ## Filename: the log file
+        ## Max_bytes: the size a file may reach before it is rotated (0 = no size limit)
+        ## Interval: seconds between rotations (0 = no time limit)
+        ## Backup_count: how many rotated files to keep
+
+        ## Returns:
+        ## None
+
+        super().__init__(filename, maxBytes = max_bytes, backupCount = backup_count, encoding = encoding)
+
+        self.interval = interval
+        self.rollover_at: Optional[float] = time.time() + interval if interval else None
+        self.rotations = 0
+        self._compression: Optional[threading.Thread] = None
+
+    def namer(self, default_name: str) -> str:
+
+        ## Rotated files are stored compressed
+
+        return default_name + '.gz'
+
+    def rotator(self, source: str, dest: str) -> None:
+
+        ## Moves the full log file out of the way and compresses it on a background thread
+        ## The previous compression has always finished by now (see doRollover), so its uncompressed file is gone
+
+        uncompressed = dest[:-len('.gz')]
+        os.rename(source, uncompressed)
+
+        self._compression = threading.Thread(
+            target = _compress,
+            args = (uncompressed, dest),
+            name = 'log-compression'
+        )
+        self._compression.start()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+
+            return True
+
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+
+        ## Waits for the last rotated file to be compressed before the numbered files are shifted
+        ## This only waits when files fill up faster than they can be compressed
+
+        self.wait_for_compression()
+        super().doRollover()
+        self.rotations += 1
+
+        if self.interval:
+
+            self.rollover_at = time.time() + self.interval
+
+    def wait_for_compression(self) -> None:
+
+        ## Blocks until the last rotated file has been compressed
+
+        if self._compression is not None:
+
+            self._compression.join()
+            self._compression = None
+
+    def close(self) -> None:
+
+        self.wait_for_compression()
+        super().close()
+
+
+## Log file handlers are shared: every logger writing to the same file uses one BoundedQueueHandler
+## (one listener thread, one open file, one rotation schedule), and the last logger to let go closes it
+
+_shared_handlers: Dict[str, BoundedQueueHandler] = {}
+_shared_users: Dict[str, int] = {}
+_shared_lock = threading.Lock()
+
+
+def _acquire_handler(log_file: Path, config: CalculatorConfig) -> BoundedQueueHandler:
+
+    ## Returns the handler for a log file, creating it (from this config's settings) if it is the first user
+
+    key = str(log_file)
+
+    with _shared_lock:
+
+        handler = _shared_handlers.get(key)
+
+        if handler is None:
+
+            log_file.parent.mkdir(parents = True, exist_ok = True)
+            file_handler = CompressingRotatingFileHandler(
+                key,
+                max_bytes = config.log_max_bytes,
+                interval = config.log_rotate_interval,
+                backup_count = config.log_backup_count
+            )
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+            handler = _shared_handlers[key] = BoundedQueueHandler(config.log_queue_size, file_handler)
+            _shared_users[key] = 0
+
+        _shared_users[key] += 1
+        return handler
+
+def _release_handler(handler: BoundedQueueHandler) -> None:
+
+    ## Gives up one use of a shared handler, closing it (and writing out its queue) after the last one
+
+    with _shared_lock:
+
+        for key, shared in _shared_handlers.items():
+
+            if shared is handler:
+
+                _shared_users[key] -= 1
+
+                if _shared_users[key]:
+
+                    return
+
+                del _shared_handlers[key], _shared_users[key]
+                break
+
+    handler.close()
+
+
 class CalculatorLogger(ABC):
 
     ## abstract class for a logger
+    ## Messages are %-style format strings with their arguments passed separately,
+    ## so nothing is formatted unless the message is actually going to be logged
 
-    def log_info(self, message: str) -> None:
+    def log_info(self, message: str, *args) -> None:
 
         ## log an info message.
 
         ## Params: 
-        ## message: The message to log
+        ## message: The message to log, as a format string
+        ## args: The arguments for the format string
 
         ## Returns:
         ## None
@@ -23,34 +327,36 @@ class CalculatorLogger(ABC):
                                         ## Note: Pragma no cover is required here! These lines are covered in testing
                                         ## but Pytest-cov does not recognize it
 
-        self._log(logging.INFO, message) # pragma: no cover
+        self._log(logging.INFO, message, *args) # pragma: no cover
 
-    def log_warning(self, message: str) -> None:
+    def log_warning(self, message: str, *args) -> None:
 
         ## log a warning message.
 
         ## Params: 
-        ## message: The message to log
+        ## message: The message to log, as a format string
+        ## args: The arguments for the format string
 
         ## Returns:
         ## None
 
-        self._log(logging.WARNING, message) # pragma: no cover
+        self._log(logging.WARNING, message, *args) # pragma: no cover
 
-    def log_error(self, message: str) -> None:
+    def log_error(self, message: str, *args) -> None:
 
         ## log an error message.
 
         ## Params: 
-        ## message: The message to log
+        ## message: The message to log, as a format string
+        ## args: The arguments for the format string
 
         ## Returns:
         ## None
 
-        self._log(logging.ERROR, message) # pragma: no cover
+        self._log(logging.ERROR, message, *args) # pragma: no cover
 
     @abstractmethod
-    def _log(self, level: int, message: str) -> None:
+    def _log(self, level: int, message: str, *args) -> None:
 
         ## abstract method for logging
 
@@ -66,10 +372,32 @@ class CalculationLogger(CalculatorLogger):
     ## non-abstract class for a calculation logger.
     ## This will handle any logs related to calculation info, warnings, and errors.
     ## History will be handled separately.
+    ## Records go through a BoundedQueueHandler, so the file is written on a background thread
+
+    ## Each calculator session gets its own logger, named calculator.<session id>, so sessions in one process
+    ## never touch each other's (or the application's) logging setup. Sessions writing to the same file
+    ## share one handler (see _acquire_handler). Until setup_logging is called, messages go to the root logger
+
+    queue_handler: Optional[BoundedQueueHandler] = None
+    logger: logging.Logger = logging.getLogger()
+
+    def __init__(self, config: Optional[CalculatorConfig] = None, name: Optional[str] = None):
+
+        ## Initializes the logger
+
+        ## Params:
+        ## Config: the calculator's config (a fresh one is built if not given)
+        ## Name: the session name the logger is named after
+
+        ## Returns:
+        ## None
+
+        self.config = config
+        self.name = name
         
     def setup_logging(self):
 
-        config = CalculatorConfig()
+        config = self.config or CalculatorConfig()
         self.log_file = config.log_file
 
         if not self.log_file:
@@ -78,58 +406,90 @@ class CalculationLogger(CalculatorLogger):
 
             raise Exception("No log file specified in config")
 
+        ## The logger is built directly rather than through logging.getLogger, which would keep every session's
+        ## logger in the logging module's registry for good. Its parent is None, so nothing propagates to the root
+
+        logger = logging.Logger(f"calculator.{self.name}" if self.name else "calculator", config.log_level)
+
         try:
 
-            logging.basicConfig(
-                filename=str(self.log_file),
-                level=logging.INFO,
-                format='%(asctime)s - %(levelname)s - %(message)s',
-                force=True  # Overwrite any existing logging configuration
-            )
+            self.queue_handler = _acquire_handler(self.log_file, config)
+            logger.addHandler(self.queue_handler)
+            self.logger = logger
 
                         ## Pragma required here! this line is covered in testing locally, but github's testing does not recognize it!
                         ## Feel free to remove this pragma locally to test coverage
 
-            logging.info(f"Logging initialized at: {self.log_file}")  # pragma: no cover
+            self.logger.info("Logging initialized at: %s", self.log_file)  # pragma: no cover
 
         except Exception as e:
 
             ## if there is an error at this point, raise an exception
             ## and use a fallback console logger
 
-            logging.basicConfig(
-                level=logging.WARNING,
-                format='%(asctime)s - [FALLBACK] %(levelname)s - %(message)s',
-                force=True
-            )
-            logging.warning("Failed to configure file logging. Using fallback console logger.")
-            logging.exception(e)
+            self.close()
+
+            fallback = logging.StreamHandler()
+            fallback.setFormatter(logging.Formatter('%(asctime)s - [FALLBACK] %(levelname)s - %(message)s'))
+            logger.setLevel(logging.WARNING)
+            logger.addHandler(fallback)
+            self.logger = logger
+
+            logger.warning("Failed to configure file logging. Using fallback console logger.")
+            logger.exception(e)
 
             raise Exception(f"Could not initialize logger: {e}")
 
-    def _log(self, level: int, message: str) -> None:
+    def _log(self, level: int, message: str, *args) -> None:
 
         ## log a message
+        ## The level is checked first, so a message below the logger's level costs one lookup and is never formatted
 
         ## Params: 
         ## level: The level of the message
-        ## message: The message to log
+        ## message: The message to log, as a format string
+        ## args: The arguments for the format string
 
         ## Returns:
         ## None
 
-        if level == 20:
+        if not self.logger.isEnabledFor(level):
 
-            logging.info(f"Info: {message}")
+            return
 
-        elif level == 30:
+        prefix = _PREFIXES.get(level)
 
-            logging.warning(f"Warning: {message}")
+        if prefix is None:
 
-        elif level == 40:
-
-            logging.error(f"Error: {message}")
+            self.logger.log(level, "Unexpected log level")
 
         else:
 
-            logging.log(level, "Unexpected log level")
\ No newline at end of file
+            self.logger.log(level, prefix + message, *args)
+
+    def close(self) -> None:
+
+        ## Writes out any queued records and stops the logging thread
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## None
+
+        if self.queue_handler is not None:
+
+            self.logger.removeHandler(self.queue_handler)
+            _release_handler(self.queue_handler)
+            self.queue_handler = None
+
+    def stats(self) -> Optional[Dict[str, int]]:
+
+        ## Returns the queue counters, or None when logging has not been set up
+        ## The counters belong to the log file's handler, so they cover every session writing to that file
+
+        if self.queue_handler is None:
+
+            return None
+
+        return self.queue_handler.stats()
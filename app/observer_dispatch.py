@@ -0,0 +1,195 @@
+## observer_dispatch.py
+## IS 601 Midterm
+## Evan Garvey
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict
+
+## Marks the end of the queue for the worker thread
+
+_STOP = object()
+
+
+class AsyncDispatcher:
+
+    ## AsyncDispatcher class
+    ## Moves observer notifications off the calling thread
+    ## Notifications are put on a bounded queue and a single background worker delivers them in order
+
+    ## When the queue is full, the backpressure policy decides what happens:
+    ## block: the caller waits for room
+    ## drop_oldest: the oldest queued notification is discarded to make room
+    ## drop_newest: the new notification is discarded
+
+    ## Attributes:
+    ## policy: str - the backpressure policy
+    ## dispatched / dropped / errors / max_depth: int - counters for reporting
+
+    POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+    def __init__(self, max_size: int = 1024, policy: str = 'block'):
+
+        ## Initializes the dispatcher and starts its worker thread
+
+        ## Params:
+        ## Max_size: how many notifications may be waiting at once
+        ## Policy: the backpressure policy
+
+        ## Returns:
+        ## None
+
+        ## Raises:
+        ## Exception: ValueError
+
+        if policy not in self.POLICIES:
+
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+
+        if max_size <= 0:
+
+            raise ValueError("Queue size must be greater than 0")
+
+        self.policy = policy
+        self._queue: queue.Queue = queue.Queue(max_size)
+
+        self.dispatched = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+
+        self._closed = False
+        self._worker = threading.Thread(target = self._run, name = 'observer-dispatch', daemon = True)
+        self._worker.start()
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> bool:
+
+        ## Queues a call to be made on the worker thread
+
+        ## Params:
+        ## Func: the function to call
+        ## Args: its arguments
+
+        ## Returns:
+        ## Boolean: False if the notification was dropped
+
+        item = (func, args)
+
+        if self.policy == 'block':
+
+            self._queue.put(item)
+
+        elif self.policy == 'drop_newest':
+
+            try:
+
+                self._queue.put_nowait(item)
+
+            except queue.Full:
+
+                self.dropped += 1
+                return False
+
+        else:
+
+            while True:
+
+                try:
+
+                    self._queue.put_nowait(item)
+                    break
+
+                except queue.Full:
+
+                    ## Make room by discarding the oldest waiting notification
+
+                    try:
+
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                        self.dropped += 1
+
+                    except queue.Empty: # pragma: no cover
+
+                        pass
+
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+
+            self.max_depth = depth
+
+        return True
+
+    def drain(self) -> None:
+
+        ## Blocks until every queued notification has been delivered
+
+        self._queue.join()
+
+    def close(self) -> None:
+
+        ## Drains the queue and stops the worker. Safe to call more than once
+
+        if self._closed:
+
+            return
+
+        self._closed = True
+        self.drain()
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    @property
+    def depth(self) -> int:
+
+        ## The number of notifications currently waiting
+
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+
+        ## Returns the dispatcher counters
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Dict[str, Any]: policy, depth, max_depth, dispatched, dropped and errors
+
+        return {
+            'policy': self.policy,
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'dispatched': self.dispatched,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
+
+    def _run(self) -> None:
+
+        ## Worker loop. Delivers notifications until told to stop
+        ## An observer error cannot reach the caller any more, so it is counted and logged instead
+
+        while True:
+
+            item = self._queue.get()
+
+            try:
+
+                if item is _STOP:
+
+                    return
+
+                func, args = item
+                func(*args)
+                self.dispatched += 1
+
+            except Exception:
+
+                self.errors += 1
+                logging.exception("Observer notification failed")
+
+            finally:
+
+                self._queue.task_done()
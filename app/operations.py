@@ -2,10 +2,19 @@
 ## IS 601 Midterm
 ## Evan Garvey
 
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from decimal import Decimal
-from typing import Dict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable
 from app import exceptions
+from app.decimal_math import nth_root
+
+## numpy is only needed by the float64 backend, so it is imported by the vectorized methods themselves
+
+if TYPE_CHECKING: # pragma: no cover
+
+    import numpy as np
 
 class Operation(ABC):
 
@@ -57,6 +66,44 @@ class Operation(ABC):
 
         pass # pragma: no cover
 
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the operation over whole float64 arrays at once.
+        ## This is used by the float64 backend, where speed matters more than exactness
+
+        ## Params:
+        ## Num1: float64 array
+        ## Num2: float64 array
+
+        ## Returns:
+        ## np.ndarray: float64 results, element by element
+
+        ## Each built in operation overrides this with a NumPy implementation.
+        ## This default goes through execute pair by pair, so registered operations still work
+
+        import numpy as np
+
+        return np.array([
+            float(self.execute(Decimal(repr(a)), Decimal(repr(b))))
+            for a, b in zip(num1.tolist(), num2.tolist())
+        ], dtype = np.float64)
+
+    def validate_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> None:
+
+        ## Validates whole arrays of operands. Mirrors validate: if any pair is invalid, we raise
+
+        ## Params:
+        ## Num1: float64 array
+        ## Num2: float64 array
+
+        ## Returns:
+        ## None
+
+        ## Raises:
+        ## Exception: ValidationError
+
+        pass # pragma: no cover
+
     def __str__(self) -> str:
 
         ## Returns the name of the operation
@@ -96,6 +143,15 @@ class Addition(Operation):
 
         self.validate(num1, num2)
         return num1 + num2
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the addition operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.add(num1, num2)
     
 class Subtraction(Operation):
 
@@ -120,8 +176,16 @@ class Subtraction(Operation):
 
         self.validate(num1, num2)
         return num1 - num2
-    
 
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the subtraction operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.subtract(num1, num2)
+    
 class Multiplication(Operation):
 
     ## Multiplication class
@@ -145,6 +209,15 @@ class Multiplication(Operation):
 
         self.validate(num1, num2)
         return num1 * num2
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the multiplication operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.multiply(num1, num2)
     
 class Division(Operation):
 
@@ -187,6 +260,24 @@ class Division(Operation):
 
         self.validate(num1, num2)
         return num1 / num2
+
+    def validate_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> None:
+
+        ## Vectorized validation for the division operation
+
+        import numpy as np
+
+        if np.any(num2 == 0):
+            raise exceptions.ValidationError("Cannot divide by zero")
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the division operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.divide(num1, num2)
     
 class Power(Operation):
 
@@ -226,6 +317,24 @@ class Power(Operation):
 
         self.validate(num1, num2)
         return num1 ** num2
+
+    def validate_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> None:
+
+        ## Vectorized validation for the power operation
+
+        import numpy as np
+
+        if np.any((num1 == 0) & (num2 < 0)):
+            raise exceptions.ValidationError("Cannot raise zero to a negative power")
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the power operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.power(num1, num2)
     
 class Root(Operation):
 
@@ -267,10 +376,33 @@ class Root(Operation):
         ## Num2: decimal
 
         ## Returns:
-        ## Decimal: The result of the root operation
+        ## Decimal: The result of the root operation, to the precision of the active Decimal context
 
         self.validate(num1, num2)
-        return num1 ** (1 / num2)
+        return nth_root(num1, num2)
+
+    def validate_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> None:
+
+        ## Vectorized validation for the root operation
+
+        import numpy as np
+
+        if np.any(num1 <= 0):
+
+            raise exceptions.ValidationError("Cannot take the root of a number less than or equal to zero")
+
+        if np.any(num2 == 0):
+
+            raise exceptions.ValidationError("Cannot take the zeroth root of a number")
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the root operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.power(num1, 1.0 / num2)
     
 class Modulo(Operation):
 
@@ -310,6 +442,26 @@ class Modulo(Operation):
 
         self.validate(num1, num2)
         return num1 % num2
+
+    def validate_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> None:
+
+        ## Vectorized validation for the modulo operation
+
+        import numpy as np
+
+        if np.any(num2 == 0):
+            raise exceptions.ValidationError("Cannot divide by zero")
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the modulo operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        ## fmod keeps the sign of the dividend, the same as Decimal's %
+
+        return np.fmod(num1, num2)
     
 class IntegerDivision(Operation):
 
@@ -349,6 +501,26 @@ class IntegerDivision(Operation):
 
         self.validate(num1, num2)
         return num1 // num2
+
+    def validate_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> None:
+
+        ## Vectorized validation for the integer division operation
+
+        import numpy as np
+
+        if np.any(num2 == 0):
+            raise exceptions.ValidationError("Cannot divide by zero")
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the integer division operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        ## Decimal's // truncates towards zero, so we do the same
+
+        return np.trunc((num1 - np.fmod(num1, num2)) / num2)
     
 class PercentageCalculation(Operation):
 
@@ -377,6 +549,24 @@ class PercentageCalculation(Operation):
             raise exceptions.ValidationError("Cannot divide by zero")
         
         return ((num1 / num2) * 100)
+
+    def validate_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> None:
+
+        ## Vectorized validation for the percentage calculation operation
+
+        import numpy as np
+
+        if np.any(num2 == 0):
+            raise exceptions.ValidationError("Cannot divide by zero")
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the percentage calculation operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.divide(num1, num2) * 100
     
 class AbsoluteDifference(Operation):
 
@@ -401,6 +591,15 @@ class AbsoluteDifference(Operation):
 
         self.validate(num1, num2)
         return abs(num1 - num2)
+
+    def execute_vectorized(self, num1: np.ndarray, num2: np.ndarray) -> np.ndarray:
+
+        ## Executes the absolute difference operation over float64 arrays
+
+        self.validate_vectorized(num1, num2)
+        import numpy as np
+
+        return np.abs(np.subtract(num1, num2))
     
 class OperationFactory:
 
@@ -423,21 +622,39 @@ class OperationFactory:
         "absolute difference": AbsoluteDifference
     }
 
+    ## The REPL commands that name an operation differently, mapped to the operation they mean
+
+    _aliases: Dict[str, str] = {
+        "int_divide": "integer division",
+        "percent": "percentage calculation",
+        "abs_diff": "absolute difference"
+    }
+
+    ## Operations hold no state, so each one is created once and shared (a flyweight)
+    ## _instances maps every accepted name, aliases included, to that shared instance, so create is one dict lookup
+    ## The dispatch registry maps each operation name straight to the instance's execute method.
+    ## Calculation.calculate looks its operation up there, which keeps it in step with the Operation classes
+    ## Both are filled in by register, which is called for the built in operations below the class
+
+    _instances: Dict[str, Operation] = {}
+    dispatch: Dict[str, Callable[[Decimal, Decimal], Decimal]] = {}
+
     @classmethod
     def create(cls, operation_type: str) -> Operation:
         
-        ## Creates an Operation object
+        ## Returns the Operation object for a name or alias
+        ## The same instance is returned every time, so this does not allocate
 
         ## Params:
         ## Operation: string
 
         ## Returns:
-        ## Operation: The created Operation object
+        ## Operation: The shared Operation object
 
         ## Raises:
         ## Exception: ValueError
 
-        operation = cls._operations.get(operation_type.lower())
+        operation = cls._instances.get(operation_type) or cls._instances.get(operation_type.lower())
 
         ## If the operation is not found, raise an error
         ## This error will report what kind of operation was requested
@@ -446,18 +663,18 @@ class OperationFactory:
 
             raise ValueError(f"Invalid operation type: {operation_type}")
         
-        return operation(
-            
-        )
+        return operation
     
     @classmethod
-    def register(cls, name: str, operation_type: type) -> None:
+    def register(cls, name: str, operation_type: type, aliases: Iterable[str] = ()) -> None:
         
         ## Registers an Operation object
+        ## The class is instantiated once here and that instance is shared, so it should not hold state
 
         ## Params:
         ## name: string
         ## operation_type: type
+        ## aliases: other names the operation can be created by
 
         ## Returns:
         ## None
@@ -469,4 +686,41 @@ class OperationFactory:
 
             raise TypeError("Registering operation class is not a subclass of Operation")
         
-        cls._operations[name.lower()] = operation_type
\ No newline at end of file
+        name = name.lower()
+        for alias in aliases:
+
+            cls._aliases[alias.lower()] = name
+
+        operation = operation_type()
+        cls._operations[name] = operation_type
+        cls._instances[name] = operation
+        cls.dispatch[name] = operation.execute
+
+        for alias, target in cls._aliases.items():
+
+            if target == name:
+
+                cls._instances[alias] = operation
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Dict[str, Any]]:
+
+        ## A copy of the registry for introspection. Changing it does not affect the factory
+
+        ## Returns:
+        ## Dict: each operation name mapped to its class and its aliases
+
+        return {
+            name: {
+                'class': operation_type,
+                'aliases': sorted(alias for alias, target in cls._aliases.items() if target == name)
+            }
+            for name, operation_type in cls._operations.items()
+        }
+
+
+for _name, _operation_type in list(OperationFactory._operations.items()):
+
+    OperationFactory.register(_name, _operation_type)
+
+del _name, _operation_type
@@ -0,0 +1,110 @@
+## result_cache.py
+## IS 601 Midterm
+## Evan Garvey
+
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Hashable, Optional
+
+
+class ResultCache:
+
+    ## ResultCache class
+    ## A bounded least-recently-used cache of calculation results
+    ## Keys are (operation name, num1, num2) with the operands already normalized by the InputValidator
+
+    ## Attributes:
+    ## max_size: int - the most results held at once
+    ## hits / misses / evictions: int - counters for reporting
+
+    def __init__(self, max_size: int):
+
+        ## Initializes the ResultCache
+
+        ## Params:
+        ## Max_size: the most results held at once
+
+        ## Returns:
+        ## None
+
+        ## Raises:
+        ## Exception: ValueError
+
+        if max_size <= 0:
+
+            raise ValueError("Cache size must be greater than 0")
+
+        self.max_size = max_size
+        self._results: "OrderedDict[Hashable, Decimal]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Decimal]:
+
+        ## Looks up a result, marking it as most recently used
+
+        ## Params:
+        ## Key: the cache key
+
+        ## Returns:
+        ## Optional[Decimal]: the cached result, or None on a miss
+
+        result = self._results.get(key)
+
+        if result is None:
+
+            self.misses += 1
+            return None
+
+        self._results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Hashable, result: Decimal) -> None:
+
+        ## Stores a result, evicting the least recently used one if the cache is full
+
+        ## Params:
+        ## Key: the cache key
+        ## Result: the result to store
+
+        ## Returns:
+        ## None
+
+        self._results[key] = result
+        self._results.move_to_end(key)
+
+        if len(self._results) > self.max_size:
+
+            self._results.popitem(last = False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+
+        ## Drops every cached result. The counters are kept
+
+        self._results.clear()
+
+    def stats(self) -> Dict[str, int]:
+
+        ## Returns the cache counters
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Dict[str, int]: hits, misses, evictions, size and max_size
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._results),
+            'max_size': self.max_size
+        }
+
+    def __len__(self) -> int:
+
+        return len(self._results)
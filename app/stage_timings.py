@@ -0,0 +1,132 @@
+## stage_timings.py
+## IS 601 Midterm
+## Evan Garvey
+
+import threading
+from typing import Any, Dict, List, Sequence
+
+## The stages of Calculator.perform_operation, in the order they run
+
+STAGES = ('validate', 'execute', 'calculation', 'history', 'undo', 'observers')
+
+## Histogram buckets are powers of two: a time of t ns goes in bucket t.bit_length(), which holds times below 2 ** bucket ns
+## 64 buckets reach 2 ** 63 ns (about 292 years), so no time can fall outside them
+
+BUCKETS = 64
+
+
+class StageTimings:
+
+    ## StageTimings class
+    ## Per operation, per stage latency histograms for Calculator.perform_operation
+    ## The calculator takes a perf_counter_ns timestamp between stages and hands them over in one record call
+
+    def __init__(self):
+
+        ## Initializes the StageTimings
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## None
+
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, List[List[int]]] = {}
+        self._totals: Dict[str, List[int]] = {}
+        self._maxima: Dict[str, List[int]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, operation: str, marks: Sequence[int]) -> None:
+
+        ## Records one perform_operation call
+
+        ## Params:
+        ## Operation: the operation name
+        ## Marks: perf_counter_ns timestamps, one before the first stage and one after each stage
+
+        ## Returns:
+        ## None
+
+        with self._lock:
+
+            histograms = self._histograms.get(operation)
+
+            if histograms is None:
+
+                histograms = self._histograms[operation] = [[0] * BUCKETS for _ in STAGES]
+                self._totals[operation] = [0] * len(STAGES)
+                self._maxima[operation] = [0] * len(STAGES)
+                self._counts[operation] = 0
+
+            totals = self._totals[operation]
+            maxima = self._maxima[operation]
+            self._counts[operation] += 1
+
+            for stage in range(len(STAGES)):
+
+                elapsed = marks[stage + 1] - marks[stage]
+                histograms[stage][elapsed.bit_length()] += 1
+                totals[stage] += elapsed
+
+                if elapsed > maxima[stage]:
+
+                    maxima[stage] = elapsed
+
+    def reset(self) -> None:
+
+        ## Drops everything recorded so far
+
+        with self._lock:
+
+            self._histograms.clear()
+            self._totals.clear()
+            self._maxima.clear()
+            self._counts.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+
+        ## Returns a copy of the timings
+
+        ## Params:
+        ## None
+
+        ## Returns:
+        ## Dict: operation -> stage -> count, mean_ns, p50_ns, p90_ns, p99_ns, max_ns and the histogram buckets
+        ## Percentiles are read from the histogram, so they are the upper bound of the bucket they fall in
+
+        with self._lock:
+
+            return {
+                operation: {
+                    stage: self._summary(
+                        self._counts[operation],
+                        self._totals[operation][index],
+                        self._maxima[operation][index],
+                        histograms[index]
+                    )
+                    for index, stage in enumerate(STAGES)
+                }
+                for operation, histograms in self._histograms.items()
+            }
+
+    @staticmethod
+    def _summary(count: int, total: int, maximum: int, histogram: List[int]) -> Dict[str, Any]:
+
+        summary = {'count': count, 'mean_ns': total // count, 'max_ns': maximum}
+
+        for name, fraction in (('p50_ns', 0.5), ('p90_ns', 0.9), ('p99_ns', 0.99)):
+
+            target = fraction * count
+            seen = 0
+
+            for bucket, bucket_count in enumerate(histogram):
+
+                seen += bucket_count
+                if seen >= target:
+
+                    summary[name] = min(2 ** bucket, maximum)
+                    break
+
+        summary['buckets'] = {2 ** bucket: bucket_count for bucket, bucket_count in enumerate(histogram) if bucket_count}
+        return summary
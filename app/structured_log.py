@@ -0,0 +1,223 @@
+## structured_log.py
+## IS 601 Midterm
+## Evan Garvey
+
+## A structured calculation log: one JSON object per line, one line per calculation
+## The files are always UTF-8, as JSON expects, whatever the calculator's default encoding
+## Numbers are written as strings so Decimals keep every digit, and each line is self contained,
+## so the files can be appended to, concatenated, compressed and read back a line at a time
+
+## Usage (filtering a log from the command line):
+## python -m app.structured_log FILE [--operation add] [--session ID] [--since 2024-01-01T00:00:00] [--min-latency NS]
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+
+from app.calculation import Calculation
+
+
+def calculation_record(calculation: Calculation, session_id: str) -> Dict[str, Any]:
+
+    ## Builds the log record for one calculation
+
+    ## Params:
+    ## Calculation: the calculation
+    ## Session_id: the id of the calculator session it belongs to
+
+    ## Returns:
+    ## Dict: operation, num1, num2, result, timestamp, latency_ns (None if it was not timed) and session_id
+
+    return {
+        'operation': calculation.operation,
+        'num1': str(calculation.num1),
+        'num2': str(calculation.num2),
+        'result': str(calculation.result),
+        'timestamp': calculation.timestamp.isoformat(),
+        'latency_ns': calculation.latency_ns,
+        'session_id': session_id
+    }
+
+
+class JsonLinesWriter:
+
+    ## JsonLinesWriter class
+    ## Appends calculation records to a JSON lines file through an in memory buffer
+    ## The buffer is written out once it holds flush_bytes of text, or when a record arrives
+    ## more than flush_interval seconds after the last write, and always on flush and close
+
+    ## Attributes:
+    ## path: str - the file written to
+    ## session_id: str - written on every record
+    ## written / flushes: int - counters for reporting
+
+    def __init__(
+            self,
+            path: str,
+            session_id: str,
+            flush_bytes: int = 65536,
+            flush_interval: float = 1.0,
+            encoding: str = 'utf-8'
+    ):
+
+        ## Initializes the writer and opens the file for appending
+
+        ## Params:
+        ## Path: the file to write
+        ## Session_id: the id of the calculator session
+        ## Flush_bytes: how much text to buffer before writing (0 = write every record)
+        ## Flush_interval: the most seconds a record waits in the buffer while records keep arriving
+        ## Encoding: the file encoding
+
+        ## Returns:
+        ## None
+
+        self.path = str(path)
+        self.session_id = session_id
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+
+        self.written = 0
+        self.flushes = 0
+
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._deadline = time.monotonic() + flush_interval
+        self._file: Optional[TextIO] = open(self.path, 'a', encoding = encoding)
+
+    def write(self, calculation: Calculation) -> None:
+
+        ## Buffers the record for one calculation
+
+        ## Params:
+        ## Calculation: the calculation
+
+        ## Returns:
+        ## None
+
+        line = json.dumps(calculation_record(calculation, self.session_id)) + '\n'
+
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self.written += 1
+
+        if self._buffered >= self.flush_bytes or time.monotonic() >= self._deadline:
+
+            self.flush()
+
+    def flush(self) -> None:
+
+        ## Writes the buffer to the file
+
+        if self._buffer and self._file is not None:
+
+            self._file.write(''.join(self._buffer))
+            self._file.flush()
+            self._buffer.clear()
+            self._buffered = 0
+            self.flushes += 1
+
+        self._deadline = time.monotonic() + self.flush_interval
+
+    def close(self) -> None:
+
+        ## Writes the buffer and closes the file
+
+        if self._file is not None:
+
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+def read_records(
+        path: str,
+        operation: Optional[str] = None,
+        session_id: Optional[str] = None,
+        since: Optional[str] = None,
+        where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        encoding: str = 'utf-8'
+) -> Iterator[Dict[str, Any]]:
+
+    ## Streams the records of a JSON lines log that match every filter given
+    ## The file is read a line at a time, so memory use does not grow with its size
+    ## Gzipped files (ending in .gz) are read the same way, and blank lines are skipped
+
+    ## Params:
+    ## Path: the file to read
+    ## Operation: only records of this operation
+    ## Session_id: only records of this session
+    ## Since: only records at or after this ISO timestamp (compared as text, so use the same format and time zone)
+    ## Where: only records this function returns True for
+    ## Encoding: the file encoding
+
+    ## Returns:
+    ## Iterator: the matching records, as dicts, in file order
+
+    opener = gzip.open if str(path).endswith('.gz') else open
+
+    with opener(path, 'rt', encoding = encoding) as file:
+
+        for line in file:
+
+            if not line.strip():
+
+                continue
+
+            record = json.loads(line)
+
+            if operation is not None and record.get('operation') != operation:
+
+                continue
+
+            if session_id is not None and record.get('session_id') != session_id:
+
+                continue
+
+            if since is not None and record.get('timestamp', '') < since:
+
+                continue
+
+            if where is not None and not where(record):
+
+                continue
+
+            yield record
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    ## Prints the matching records of a structured log, one JSON object per line
+
+    ## Params:
+    ## Argv: the command line arguments, sys.argv by default
+
+    ## Returns:
+    ## Integer: the exit status
+
+    parser = argparse.ArgumentParser(description = "Filter a structured calculation log")
+    parser.add_argument('path', help = "the JSON lines file (may be gzipped)")
+    parser.add_argument('--operation', help = "only this operation")
+    parser.add_argument('--session', help = "only this session id")
+    parser.add_argument('--since', help = "only records at or after this ISO timestamp")
+    parser.add_argument('--min-latency', type = int, help = "only records that took at least this many ns")
+    args = parser.parse_args(argv)
+
+    where = None
+
+    if args.min_latency is not None:
+
+        where = lambda record: (record.get('latency_ns') or 0) >= args.min_latency
+
+    for record in read_records(args.path, args.operation, args.session, args.since, where):
+
+        sys.stdout.write(json.dumps(record) + '\n')
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+## bench_calculation_dispatch.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Micro-benchmark for the per-calculation overhead of Calculation.calculate
+## Compares the old approach (a dict of lambdas built on every call) with the shared dispatch
+## registry, both for calculate on its own and for building a Calculation without a saved result
+
+## Usage:
+## python -m benchmarks.bench_calculation_dispatch [calls]
+
+from decimal import Decimal
+import sys
+import timeit
+
+from app.calculation import Calculation
+from app.exceptions import OperationError
+from app.operations import OperationFactory
+
+
+def _fail(message: str) -> None:
+
+    raise OperationError(message)
+
+def legacy_calculate(calc: Calculation) -> Decimal:
+
+    ## Calculation.calculate as it was, building its table of lambdas on each call
+    ## (root and percentage kept their old, different semantics)
+
+    operations = {
+        "add": lambda x, y: x + y,
+        "subtract": lambda x, y: x - y,
+        "multiply": lambda x, y: x * y,
+        "divide": lambda x, y: x / y if y != 0 else _fail("Cannot divide by zero"),
+        "power": lambda x, y: pow(x, y) if not (x == 0 and y < 0) else _fail("Cannot calculate zero to the power of a negative number"),
+        "root": lambda x, y: Decimal(pow(float(x), 1 / float(y))),
+        "modulo": lambda x, y: x % y if y != 0 else _fail("Cannot calculate modulo with zero"),
+        "integer division": lambda x, y: x // y if y != 0 else _fail("Cannot divide by zero"),
+        "percentage calculation": lambda x, y: x * (y / 100),
+        "absolute difference": lambda x, y: abs(x - y)
+    }
+
+    return operations.get(calc.operation)(calc.num1, calc.num2)
+
+def per_call_ns(func, calls: int) -> float:
+
+    ## Best of five runs, in nanoseconds per call
+
+    return min(timeit.repeat(func, number = calls, repeat = 5)) / calls * 1e9
+
+def main() -> None:
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    print(f"calls = {calls}")
+    print(f"{'operation':<24}{'before (ns)':>12}{'after (ns)':>12}{'saved (ns)':>12}")
+
+    for operation in ('add', 'divide', 'absolute difference'):
+
+        calc = Calculation(operation, Decimal("12.5"), Decimal("3"), Decimal("0"))
+
+        before = per_call_ns(lambda: legacy_calculate(calc), calls)
+        after = per_call_ns(calc.calculate, calls)
+        print(f"{operation:<24}{before:>12.0f}{after:>12.0f}{before - after:>12.0f}")
+
+    ## The overhead on a whole Calculation built without a saved result (the history load path)
+
+    num1, num2 = Decimal("12.5"), Decimal("3")
+    execute = OperationFactory.dispatch["add"]
+    build = per_call_ns(lambda: Calculation("add", num1, num2), calls)
+    prebuilt = per_call_ns(lambda: Calculation("add", num1, num2, execute(num1, num2)), calls)
+    print(f"{'Calculation(add)':<24}{'':>12}{build:>12.0f}  ({prebuilt:.0f} ns with the result given)")
+
+if __name__ == "__main__":
+    main()
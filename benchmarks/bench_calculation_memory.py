@@ -0,0 +1,108 @@
+## bench_calculation_memory.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Benchmark for the memory used by each history entry, measured with tracemalloc
+## Compares the old Calculation layout (a plain dataclass with a per-instance dict and a datetime)
+## with the current slotted one, building entries the way a history load does: operation names
+## and numbers are parsed from text, so every row starts with its own copy of each string
+
+## Usage:
+## python -m benchmarks.bench_calculation_memory [entries]
+
+from dataclasses import dataclass, field
+import datetime
+from decimal import Decimal
+import gc
+import sys
+import tracemalloc
+from typing import Callable, Iterable, List, Optional
+
+from app.calculation import Calculation, FrozenCalculation
+
+OPERATIONS = ['add', 'subtract', 'multiply', 'divide', 'power', 'root', 'modulus']
+
+
+@dataclass
+class LegacyCalculation:
+
+    ## Same fields as Calculation had before it was slotted (the calculation itself is not needed here)
+
+    operation: str
+    num1: Decimal
+    num2: Decimal
+    result: Optional[Decimal] = None
+    timestamp: datetime.datetime = field(default_factory = datetime.datetime.now)
+
+def rows(entries: int) -> List[tuple]:
+
+    ## The text of each history row, as a CSV reader would hand it over
+
+    start = datetime.datetime(2024, 1, 1)
+
+    return [
+        (
+            OPERATIONS[i % len(OPERATIONS)],
+            str(i),
+            '0.5',
+            str(Decimal(i) + Decimal('0.5')),
+            (start + datetime.timedelta(seconds = i)).isoformat()
+        )
+        for i in range(entries)
+    ]
+
+def bytes_per_entry(cls: Callable, text_rows: List[tuple], numbers: Optional[Iterable[tuple]] = None) -> float:
+
+    ## Builds one instance of cls per row and returns the memory held by them, per entry
+    ## The rows themselves are allocated before tracing starts, so only what the entries keep is counted
+    ## If numbers (already parsed Decimals) are given they are shared instead of parsed, which leaves
+    ## only the cost of the layout itself
+
+    gc.collect()
+    tracemalloc.start()
+
+    if numbers is None:
+
+        numbers = ((Decimal(num1), Decimal(num2), Decimal(result)) for _, num1, num2, result, _ in text_rows)
+
+    entries = [
+        cls(
+            ## A fresh copy of the name, like every row a CSV reader returns
+            row[0][:1] + row[0][1:],
+            *parsed,
+            datetime.datetime.fromisoformat(row[4])
+        )
+        for row, parsed in zip(text_rows, numbers)
+    ]
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = current / len(entries)
+    del entries
+    return size
+
+def main() -> None:
+
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    text_rows = rows(entries)
+    numbers = [(Decimal(num1), Decimal(num2), Decimal(result)) for _, num1, num2, result, _ in text_rows]
+
+    print(f"entries = {entries}")
+    print(f"{'layout':<20}{'bytes/entry':>12}{'without numbers':>18}")
+
+    baseline = bytes_per_entry(LegacyCalculation, text_rows)
+    baseline_layout = bytes_per_entry(LegacyCalculation, text_rows, numbers)
+    print(f"{'dataclass (before)':<20}{baseline:>12.1f}{baseline_layout:>18.1f}")
+
+    for name, cls in (('slotted', Calculation), ('slotted, frozen', FrozenCalculation)):
+
+        size = bytes_per_entry(cls, text_rows)
+        layout = bytes_per_entry(cls, text_rows, numbers)
+        print(
+            f"{name:<20}{size:>12.1f}{layout:>18.1f}"
+            f"  ({(1 - size / baseline) * 100:.0f}% / {(1 - layout / baseline_layout) * 100:.0f}% smaller)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+## bench_history_formats.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Benchmark comparing the CSV history layout with the binary format
+## For each file size it reports the file sizes, the time to load the newest max_history
+## calculations (what Calculator.load_history does), the same load in a fresh interpreter
+## (where the CSV loader also has to import pandas) and the time to load every calculation
+
+## Usage:
+## python -m benchmarks.bench_history_formats [max_history]
+
+from pathlib import Path
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+
+from app.history_convert import csv_to_binary
+from app.history_storage import BinaryHistoryStorage, CsvHistoryStorage
+from benchmarks.bench_load_history import FILE_SIZES, time_call, write_history
+
+COLD_LOAD = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "from app.history_storage import {storage}\n"
+    "{storage}(sys.argv[1]).load_recent(int(sys.argv[2]))\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def cold_load(storage: str, path: Path, max_history: int) -> float:
+
+    ## Loads the newest max_history calculations in a new interpreter, including imports
+    ## Returns the best of three runs, in seconds
+
+    return min(
+        float(subprocess.run(
+            [sys.executable, "-c", COLD_LOAD.format(storage=storage), str(path), str(max_history)],
+            capture_output=True, text=True, check=True
+        ).stdout)
+        for _ in range(3)
+    )
+
+def main() -> None:
+
+    max_history = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    with TemporaryDirectory() as temp_dir:
+
+        csv_path = Path(temp_dir) / "history.csv"
+        bin_path = Path(temp_dir) / "history.bin"
+        csv_storage = CsvHistoryStorage(csv_path)
+        bin_storage = BinaryHistoryStorage(bin_path)
+
+        print(f"max_history = {max_history}")
+        print(
+            f"{'rows':>10} {'csv (MB)':>9} {'bin (MB)':>9}"
+            f" {'csv recent (s)':>15} {'bin recent (s)':>15} {'csv cold (s)':>13} {'bin cold (s)':>13}"
+            f" {'csv all (s)':>12} {'bin all (s)':>12}"
+        )
+
+        for rows in FILE_SIZES:
+
+            write_history(csv_path, rows)
+            csv_to_binary(csv_path, bin_path)
+
+            csv_recent = time_call(lambda: csv_storage.load_recent(max_history))
+            bin_recent = time_call(lambda: bin_storage.load_recent(max_history))
+            csv_cold = cold_load("CsvHistoryStorage", csv_path, max_history)
+            bin_cold = cold_load("BinaryHistoryStorage", bin_path, max_history)
+
+            ## Loading everything is skipped on the largest file as it only measures Calculation construction
+
+            if rows <= 100_000:
+
+                csv_all = time_call(lambda: csv_storage.load_recent(0))
+                bin_all = time_call(lambda: bin_storage.load_recent(0))
+
+            else:
+
+                csv_all = bin_all = float("nan")
+
+            print(
+                f"{rows:>10} {csv_path.stat().st_size / 1e6:>9.1f} {bin_path.stat().st_size / 1e6:>9.1f}"
+                f" {csv_recent:>15.4f} {bin_recent:>15.4f} {csv_cold:>13.4f} {bin_cold:>13.4f}"
+                f" {csv_all:>12.4f} {bin_all:>12.4f}"
+            )
+
+if __name__ == "__main__":
+    main()
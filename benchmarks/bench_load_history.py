@@ -0,0 +1,96 @@
+## bench_load_history.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Benchmark for Calculator.load_history against history file size
+## Compares the old row-by-row loader (read everything, iterrows, recalculate each row)
+## with the bulk loader that only parses the newest max_history rows
+
+## Usage:
+## python -m benchmarks.bench_load_history [max_history]
+
+import datetime
+from decimal import Decimal
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+import pandas as pd
+
+from app.calculation import Calculation
+from app.calculator import Calculator
+from app.calculator_config import CalculatorConfig
+
+FILE_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def write_history(path: Path, rows: int) -> None:
+
+    ## Writes a history file with the given number of rows
+
+    start = datetime.datetime(2024, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+
+        f.write("operation,num1,num2,result,timestamp\n")
+        for i in range(rows):
+
+            f.write(f"add,{i},0.5,{Decimal(i) + Decimal('0.5')},{(start + datetime.timedelta(seconds=i)).isoformat()}\n")
+
+def legacy_load(path: Path, max_history: int) -> list:
+
+    ## The loader as it was before: read the whole file and rebuild every row one at a time
+
+    df = pd.read_csv(path)
+    history = [
+        Calculation.from_dict({
+            'operation': row['operation'],
+            'num1': row['num1'],
+            'num2': row['num2'],
+            'result': row['result'],
+            'timestamp': row['timestamp']
+        }, verify=True)
+        for _, row in df.iterrows()
+    ]
+    return history[-max_history:]
+
+def time_call(func) -> float:
+
+    ## Returns the best of three runs, in seconds
+
+    best = float("inf")
+    for _ in range(3):
+
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+def main() -> None:
+
+    max_history = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    with TemporaryDirectory() as temp_dir:
+
+        config = CalculatorConfig(root_dir=Path(temp_dir), max_history=max_history)
+        calc = Calculator(config)
+        path = config.history_file
+
+        print(f"max_history = {max_history}")
+        print(f"{'rows':>10} {'size (MB)':>10} {'legacy (s)':>12} {'bulk (s)':>10} {'speedup':>8}")
+
+        for rows in FILE_SIZES:
+
+            write_history(path, rows)
+            size = path.stat().st_size / 1e6
+
+            ## The legacy loader is skipped on the largest file as it takes minutes
+
+            legacy = time_call(lambda: legacy_load(path, max_history)) if rows <= 100_000 else float("nan")
+            bulk = time_call(calc.load_history)
+
+            print(f"{rows:>10} {size:>10.1f} {legacy:>12.4f} {bulk:>10.4f} {legacy / bulk:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+## bench_logging.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Micro-benchmark for the per-calculation cost of logging a calculation through LoggingObserver
+## Compares the old approach (the message built with f-strings before the level is known) with the
+## lazy format string API, with the session logger set to each level in turn (CALCULATOR_LOG_LEVEL)
+## Records that are logged go through the real pipeline: a session logger set up as the calculator sets
+## it up, writing through its BoundedQueueHandler to a temporary file
+
+## Usage:
+## python -m benchmarks.bench_logging [calls]
+
+from decimal import Decimal
+import logging
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+import timeit
+
+from app.calculation import Calculation
+from app.calculator_config import CalculatorConfig
+from app.history import LoggingObserver
+from app.logger import CalculationLogger
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+def legacy_update(logger: logging.Logger, calculation: Calculation) -> None:
+
+    ## LoggingObserver.update and CalculationLogger._log as they were, on the session logger
+
+    message = (
+        f"History updated: {calculation.operation}, "
+        f"({calculation.num1}, {calculation.num2}) = "
+        f"{calculation.result}"
+    )
+    logger.info(f"Info: {message}")
+
+def per_call_ns(func, calls: int) -> float:
+
+    ## Best of five runs, in nanoseconds per call
+
+    return min(timeit.repeat(func, number = calls, repeat = 5)) / calls * 1e9
+
+def main() -> None:
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    calculation = Calculation("add", Decimal("12.5"), Decimal("3.25"))
+
+    print(f"calls = {calls}")
+    print(f"{'log level':<12}{'before (ns)':>12}{'after (ns)':>12}{'saved (ns)':>12}")
+
+    with TemporaryDirectory() as temp_dir:
+
+        (Path(temp_dir) / 'logs').mkdir()
+
+        for level in LEVELS:
+
+            ## A fresh session logger per level, with room for every record so none are dropped
+
+            config = CalculatorConfig(root_dir = Path(temp_dir), log_level = level, log_queue_size = calls * 10 + 1)
+            session = CalculationLogger(config, "bench")
+            session.setup_logging()
+            observer = LoggingObserver(session)
+
+            before = per_call_ns(lambda: legacy_update(session.logger, calculation), calls)
+            after = per_call_ns(lambda: observer.update(calculation), calls)
+            print(f"{level:<12}{before:>12.0f}{after:>12.0f}{before - after:>12.0f}")
+
+            session.close()
+
+if __name__ == "__main__":
+    main()
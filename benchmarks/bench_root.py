@@ -0,0 +1,82 @@
+## bench_root.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Benchmark for the nth root at 10, 50 and 200 digits of precision
+## Compares the generic Decimal power Root used before (num1 ** (1 / num2)), the float
+## version Calculation used (Decimal(pow(float(x), 1 / float(y)))) and decimal_math.nth_root
+## Besides the time per call it reports how many of the requested digits each one gets right
+
+## Usage:
+## python -m benchmarks.bench_root [calls]
+
+from decimal import Decimal, localcontext
+import sys
+import timeit
+from typing import Callable, List, Tuple
+
+from app.decimal_math import nth_root
+
+PRECISIONS = [10, 50, 200]
+
+## Square and cube roots without an exact answer, a perfect power (the fast path) and a high root
+
+CASES: List[Tuple[str, str]] = [('2', '2'), ('12345.678', '3'), ('1048576', '4'), ('98765', '17')]
+
+IMPLEMENTATIONS: List[Tuple[str, Callable[[Decimal, Decimal], Decimal]]] = [
+    ('decimal pow', lambda x, n: x ** (1 / n)),
+    ('float', lambda x, n: +Decimal(pow(float(x), 1 / float(n)))),
+    ('nth_root', nth_root)
+]
+
+
+def correct_digits(value: Decimal, reference: Decimal, precision: int) -> int:
+
+    ## How many significant digits of value agree with the reference
+    ## A correctly rounded result gets the full precision
+
+    with localcontext() as ctx:
+
+        ctx.prec = precision
+        rounded = +reference
+
+    if value == rounded:
+
+        return precision
+
+    error = abs(value - reference) / reference
+    return max(0, min(precision, -error.adjusted() - 1))
+
+def main() -> None:
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print(f"calls = {calls}")
+    print(f"{'digits':>6} {'x':>10} {'n':>3} " + " ".join(f"{name + ' (us)':>16} {'ok':>4}" for name, _ in IMPLEMENTATIONS))
+
+    for precision in PRECISIONS:
+
+        for x, n in CASES:
+
+            x, n = Decimal(x), Decimal(n)
+
+            with localcontext() as ctx:
+
+                ctx.prec = precision + 20
+                reference = (x.ln() / n).exp()
+
+            row = f"{precision:>6} {x:>10} {n:>3} "
+
+            with localcontext() as ctx:
+
+                ctx.prec = precision
+
+                for _, func in IMPLEMENTATIONS:
+
+                    elapsed = min(timeit.repeat(lambda: func(x, n), number = calls, repeat = 3)) / calls * 1e6
+                    row += f"{elapsed:>16.1f} {correct_digits(func(x, n), reference, precision):>4} "
+
+            print(row)
+
+if __name__ == "__main__":
+    main()
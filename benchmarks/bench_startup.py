@@ -0,0 +1,106 @@
+## bench_startup.py
+## IS 601 Midterm
+## Evan Garvey
+
+## Startup benchmark based on 'python -X importtime'
+## Measures how long importing the application entry points takes, and fails (exit status 1)
+## if an import goes over budget or pulls in one of the heavy dependencies that should stay deferred
+
+## Usage:
+## python -m benchmarks.bench_startup [budget_ms]
+
+import subprocess
+import sys
+from typing import List, Set, Tuple
+
+ENTRY_POINTS = ['app.calculator', 'app.calculator_batch', 'app.calculator_repl']
+
+## These are only imported by the code paths that use them
+
+DEFERRED_MODULES = ['pandas', 'numpy', 'dotenv']
+
+DEFAULT_BUDGET_MS = 250.0
+
+
+def measure_import(module: str, runs: int = 3) -> Tuple[float, Set[str]]:
+
+    ## Imports a module in a fresh interpreter with -X importtime
+
+    ## Params:
+    ## Module: the module to import
+    ## Runs: how many interpreters to start. The fastest run is kept
+
+    ## Returns:
+    ## Tuple[float, Set[str]]: the cumulative import time in milliseconds, and every module that was imported
+
+    best = None
+    imported: Set[str] = set()
+
+    for _ in range(runs):
+
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output = True,
+            text = True,
+            check = True
+        )
+
+        total = None
+        for line in completed.stderr.splitlines():
+
+            if not line.startswith('import time:') or 'cumulative' in line:
+
+                continue
+
+            _, cumulative, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            imported.add(name)
+
+            if name == module:
+
+                total = int(cumulative) / 1000
+
+        if total is not None and (best is None or total < best):
+
+            best = total
+
+    return best, imported
+
+def check_startup(budget_ms: float = DEFAULT_BUDGET_MS) -> List[str]:
+
+    ## Measures every entry point and returns a list of problems (empty if all is well)
+
+    problems = []
+
+    for module in ENTRY_POINTS:
+
+        elapsed, imported = measure_import(module)
+        deferred = [name for name in DEFERRED_MODULES if name in imported]
+
+        print(f"{module:<24}{elapsed:>10.1f} ms")
+
+        if elapsed > budget_ms:
+
+            problems.append(f"{module} took {elapsed:.1f} ms to import (budget {budget_ms:.0f} ms)")
+
+        if deferred:
+
+            problems.append(f"{module} imports {', '.join(deferred)} at startup")
+
+    return problems
+
+def main() -> int:
+
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+
+    problems = check_startup(budget_ms)
+
+    for problem in problems:
+
+        print(f"FAIL: {problem}")
+
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,8 +2,40 @@
 ## IS 601 Midterm
 ## Evan Garvey
 
-from app.calculator_repl import calculator_repl
+import argparse
+import sys
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    ## Starts the REPL, or runs a batch file when --batch is given
+
+    ## Params:
+    ## Argv: the command line arguments, sys.argv by default
+
+    ## Returns:
+    ## Integer: the exit status
+
+    parser = argparse.ArgumentParser(description = "IS 601 Midterm calculator")
+    parser.add_argument(
+        '--batch',
+        metavar = 'FILE',
+        help = "run one '<operation> <num1> <num2>' calculation per line of FILE ('-' for stdin) without prompting"
+    )
+    args = parser.parse_args(argv)
+
+    ## The REPL is only imported when needed, as it sets up colored console output
+
+    if args.batch is not None:
+
+        from app.calculator_batch import calculator_batch
+        return calculator_batch(args.batch)
+
+    from app.calculator_repl import calculator_repl
+    calculator_repl()
+    return 0
 
 
 if __name__ == "__main__":
-    calculator_repl()
\ No newline at end of file
+    sys.exit(main())
@@ -1,9 +1,11 @@
 from unittest.mock import Mock, patch
 import pytest
 from decimal import Decimal, InvalidOperation
+from dataclasses import FrozenInstanceError
 from datetime import datetime
-from app.calculation import Calculation
+from app.calculation import Calculation, FrozenCalculation
 from app.exceptions import OperationError
+from app.operations import Operation, OperationFactory
 import logging
 
 
@@ -46,7 +48,7 @@ def test_power():
 
 def test_negative_power():
 
-    with pytest.raises(OperationError, match="Cannot calculate zero to the power of a negative number"):
+    with pytest.raises(OperationError, match="Cannot raise zero to a negative power"):
 
         Calculation(operation="power", num1=Decimal("0"), num2=Decimal("-3"))
 
@@ -59,7 +61,7 @@ def test_root():
 
 def test_invalid_root():
 
-    with pytest.raises(OperationError, match="Cannot take the root of a negative number"):
+    with pytest.raises(OperationError, match="Cannot take the root of a number less than or equal to zero"):
 
         Calculation(operation="root", num1=Decimal("-16"), num2=Decimal("2"))
 
@@ -69,11 +71,46 @@ def test_invalid_root_zero():
 
         Calculation(operation="root", num1=Decimal("16"), num2=Decimal("0"))
 
-def test_raise_invalid_root_generic():
+def test_invalid_root_of_zero():
 
-    with pytest.raises(OperationError, match="Invalid root operation"):
+    with pytest.raises(OperationError, match="Cannot take the root of a number less than or equal to zero"):
 
-        Calculation._raise_invalid_root(Decimal("4"), Decimal("2"))
+        Calculation(operation="root", num1=Decimal("0"), num2=Decimal("2"))
+
+@pytest.mark.parametrize("operation", sorted(OperationFactory.dispatch))
+def test_calculation_matches_operation(operation):
+
+    ## Calculation and Operation share one registry, so they cannot disagree
+
+    num1, num2 = Decimal("27"), Decimal("3")
+    calc = Calculation(operation=operation, num1=num1, num2=num2)
+
+    assert calc.result == OperationFactory.create(operation).execute(num1, num2)
+
+def test_percentage_calculation():
+
+    calc = Calculation(operation="percentage calculation", num1=Decimal("25"), num2=Decimal("200"))
+    assert calc.result == Decimal("12.5")
+
+def test_calculation_uses_registered_operation():
+
+    class Double(Operation):
+
+        def execute(self, num1, num2):
+
+            return num1 * 2
+
+    OperationFactory.register("double", Double)
+
+    try:
+
+        assert Calculation(operation="double", num1=Decimal("4"), num2=Decimal("0")).result == Decimal("8")
+
+    finally:
+
+        del OperationFactory._operations["double"]
+        del OperationFactory.dispatch["double"]
+        del OperationFactory._instances["double"]
 
 def test_modulo():
 
@@ -82,7 +119,7 @@ def test_modulo():
 
 def test_modulo_by_zero():
 
-    with pytest.raises(OperationError, match="Cannot calculate modulo with zero"):
+    with pytest.raises(OperationError, match="Cannot divide by zero"):
 
         Calculation(operation="modulo", num1=Decimal("5"), num2=Decimal("0"))
 
@@ -158,7 +195,7 @@ def test_calculation_eq_not_implemented():
 
 import pytest
 from decimal import Decimal, InvalidOperation
-from app.calculation import Calculation
+from app.calculation import Calculation, FrozenCalculation
 
 def test_format_result_handles_invalid_operation():
 
@@ -185,7 +222,7 @@ def test_from_dict_result_mismatch(caplog):
 
     with caplog.at_level(logging.WARNING):
 
-        calc = Calculation.from_dict(data)
+        calc = Calculation.from_dict(data, verify=True)
 
     assert "Saved result 10 does not match calculated result 5" in caplog.text
 
@@ -219,7 +256,7 @@ def test_calculate_generic_exception_handling(monkeypatch):
 
             raise OperationError(f"Calculation failed: {str(e)}")
 
-    monkeypatch.setattr(calc, "calculate", fake_calculate.__get__(calc))
+    monkeypatch.setattr(Calculation, "calculate", fake_calculate)
 
     with pytest.raises(OperationError) as excinfo:
 
@@ -243,4 +280,158 @@ def test_repr():
     assert "num1='2'" in rep
     assert "num2='3'" in rep
     assert "result='5'" in rep
-    assert "timestamp=" in rep
\ No newline at end of file
+    assert "timestamp=" in rep
+
+def test_precomputed_result_is_not_recalculated():
+
+    with patch.object(Calculation, "calculate") as mock_calculate:
+
+        calc = Calculation(operation="power", num1=Decimal("2"), num2=Decimal("10"), result=Decimal("1024"))
+
+    mock_calculate.assert_not_called()
+    assert calc.result == Decimal("1024")
+
+def test_precomputed_result_verify():
+
+    calc = Calculation(operation="add", num1=Decimal("2"), num2=Decimal("3"), result=Decimal("5"), verify=True)
+    assert calc.result == Decimal("5")
+
+def test_from_dict_does_not_recalculate():
+
+    data = {
+        "operation": "add",
+        "num1": "2",
+        "num2": "3",
+        "result": "10",
+        "timestamp": "2024-07-04T12:00:00"
+    }
+
+    with patch.object(Calculation, "calculate") as mock_calculate:
+
+        calc = Calculation.from_dict(data)
+
+    mock_calculate.assert_not_called()
+    assert calc.result == Decimal("10")
+    assert calc.timestamp == datetime(2024, 7, 4, 12, 0, 0)
+
+def test_from_dict_verify_keeps_calculated_result(caplog):
+
+    data = {
+        "operation": "add",
+        "num1": "2",
+        "num2": "3",
+        "result": "10",
+        "timestamp": "2024-07-04T12:00:00"
+    }
+
+    with caplog.at_level(logging.WARNING):
+
+        calc = Calculation.from_dict(data, verify=True)
+
+    assert calc.result == Decimal("5")
+
+def test_from_dict_verify_accepts_working_precision(caplog):
+
+    ## Results saved at a different precision than the default context still verify
+
+    saved = [
+        ("divide", "1", "3", "0.33333333333"),
+        ("root", "2", "2", "1.41421"),
+        ("multiply", "123456789012345678", "987654321098765432", "121932631137021794322511812221002896"),
+    ]
+
+    with caplog.at_level(logging.WARNING):
+
+        for operation, num1, num2, result in saved:
+
+            data = {"operation": operation, "num1": num1, "num2": num2, "result": result, "timestamp": "2024-07-04T12:00:00"}
+            calc = Calculation.from_dict(data, verify=True)
+            assert calc.result == Decimal(result)
+
+    assert "does not match" not in caplog.text
+
+def test_calculation_has_no_instance_dict():
+
+    calc = Calculation(operation="add", num1=Decimal("2"), num2=Decimal("3"))
+
+    assert not hasattr(calc, "__dict__")
+    assert calc.latency_ns is None
+
+    ## A misspelt attribute is an error rather than silently stored
+
+    with pytest.raises(AttributeError):
+
+        calc.reslut = Decimal("6")
+
+def test_operation_names_are_interned():
+
+    name = "".join(["ad", "d"])
+    calc1 = Calculation(operation=name, num1=Decimal("2"), num2=Decimal("3"))
+    calc2 = Calculation(operation="add", num1=Decimal("4"), num2=Decimal("5"))
+
+    assert calc1.operation is calc2.operation
+
+@pytest.mark.parametrize("timestamp", [
+    datetime(2024, 7, 4, 12, 30, 15, 123456),
+    datetime(1965, 1, 1, 0, 0, 0, 1),
+    datetime.fromisoformat("2024-07-04T12:00:00+02:00")
+])
+def test_timestamp_round_trip(timestamp):
+
+    calc = Calculation(operation="add", num1=Decimal("2"), num2=Decimal("3"), timestamp=timestamp)
+
+    assert isinstance(calc._timestamp, int)
+    assert calc.timestamp == timestamp
+    assert calc.timestamp.tzinfo == timestamp.tzinfo
+    assert Calculation.from_dict(calc.to_dict()).timestamp == timestamp
+
+def test_timestamp_can_be_reassigned():
+
+    calc = Calculation(operation="add", num1=Decimal("2"), num2=Decimal("3"))
+    calc.timestamp = datetime(2024, 1, 1)
+
+    assert calc.timestamp == datetime(2024, 1, 1)
+
+def test_calculation_is_not_hashable():
+
+    with pytest.raises(TypeError):
+
+        hash(Calculation(operation="add", num1=Decimal("2"), num2=Decimal("3")))
+
+def test_frozen_calculation():
+
+    timestamp = datetime(2024, 7, 4, 12, 0, 0)
+    calc = Calculation(operation="add", num1=Decimal("2"), num2=Decimal("3"), timestamp=timestamp)
+    frozen = calc.freeze()
+
+    assert isinstance(frozen, FrozenCalculation)
+    assert frozen == calc
+    assert frozen.timestamp == timestamp
+    assert frozen.to_dict() == calc.to_dict()
+    assert frozen.format_result(2) == calc.format_result(2)
+    assert frozen.freeze() is frozen
+
+    for name, value in (("result", Decimal("6")), ("timestamp", timestamp), ("calculate", None),
+                        ("latency_ns", 5), ("foo", 1), ("_frozen", False)):
+
+        with pytest.raises(FrozenInstanceError):
+
+            setattr(frozen, name, value)
+
+    with pytest.raises(FrozenInstanceError):
+
+        del frozen.num1
+
+def test_frozen_calculation_is_hashable():
+
+    frozen1 = FrozenCalculation("add", Decimal("2"), Decimal("3"))
+    frozen2 = FrozenCalculation("add", Decimal("2.0"), Decimal("3"), timestamp=datetime(2024, 1, 1))
+
+    assert frozen1.result == Decimal("5")
+    assert len({frozen1, frozen2}) == 1
+
+def test_frozen_calculation_verify():
+
+    frozen = FrozenCalculation("add", Decimal("2"), Decimal("3"), Decimal("10"), verify=True)
+
+    assert frozen.result == Decimal("5")
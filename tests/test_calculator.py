@@ -12,12 +12,13 @@ import pytest
 from unittest.mock import MagicMock, patch, PropertyMock
 from decimal import Decimal
 from tempfile import TemporaryDirectory
-from app.calculator import Calculator
+from app.calculator import EXACT_DIGITS, Calculator
 from app.calculator_repl import calculator_repl
 from app.calculator_config import CalculatorConfig
 from app.exceptions import OperationError, ValidationError
 from app.history import LoggingObserver
 from app.operations import Addition, OperationFactory
+from app.result_cache import ResultCache
 
     ## An incredible number of imports
     ## A lot gets done here no doubt
@@ -53,13 +54,15 @@ def test_calculator_initialization(calculator):
     assert calculator.redo_stack == []
     assert calculator.operation_strategy is None
 
-@patch('app.logger.CalculationLogger.log_info')
+@patch('logging.Logger.info')
 def test_logging_setup(mock_log_info):
 
-    ## Test that the logging is set up correctly
+    ## Test that the logging is set up correctly, and where the log is gets logged once
 
     calc = Calculator(CalculatorConfig())
-    mock_log_info.assert_any_call(mock.ANY)
+    calls = [c for c in mock_log_info.call_args_list if c.args[0] == "Logging initialized at: %s"]
+    assert len(calls) == 1
+    calc.close()
 
 def test_add_observer(calculator):
 
@@ -151,11 +154,11 @@ def test_save_history(mock_to_csv, calculator):
     mock_to_csv.assert_called_once()
 
 @patch('app.calculator.pd.read_csv')
-@patch('app.calculator.Path.exists', return_value=True)
-def test_load_history(mock_exists, mock_read_csv, calculator):
+def test_load_history(mock_read_csv, calculator):
 
     ## Test that the history can be loaded
 
+    calculator.config.history_file.write_text("operation,num1,num2,result,timestamp\n")
     mock_read_csv.return_value = pd.DataFrame({
         'operation': ['add'],
         'num1': ['2'],
@@ -281,7 +284,7 @@ def test_perform_operation_raises_and_catches(monkeypatch):
     
     # Patch _send_message to monitor calls
     sent_messages = []
-    calc._send_message = lambda level, msg: sent_messages.append((level, msg))
+    calc._send_message = lambda level, msg, *args: sent_messages.append((level, msg % args))
     
     with pytest.raises(Exception, match="Forced failure"):
         calc.perform_operation("1", "1")
@@ -295,7 +298,7 @@ def test_save_history_empty(monkeypatch):
     calc.history = []  # Empty history triggers else block
 
     messages = []
-    calc._send_message = lambda level, msg: messages.append((level, msg))
+    calc._send_message = lambda level, msg, *args: messages.append((level, msg % args))
 
     monkeypatch.setenv("CALCULATOR_HISTORY_FILE", "test_history_empty.csv")
 
@@ -312,7 +315,7 @@ def test_save_history_raises(monkeypatch):
     ]
 
     messages = []
-    calc._send_message = lambda level, msg: messages.append((level, msg))
+    calc._send_message = lambda level, msg, *args: messages.append((level, msg % args))
 
     with patch("pandas.DataFrame.to_csv", side_effect=Exception("mocked to_csv failure")):
         with pytest.raises(OperationError, match="Error saving history: mocked to_csv failure"):
@@ -320,25 +323,34 @@ def test_save_history_raises(monkeypatch):
 
     assert any("Error saving history: mocked to_csv failure" in msg for level, msg in messages)
 
-def test_load_empty_history_file():
+def write_history_header(monkeypatch, tmp_path):
 
-    # Patch Path.exists globally to always return True
-    with patch('pathlib.Path.exists', return_value=True):
-        # Patch pd.read_csv to return an empty DataFrame
-        with patch('pandas.read_csv', return_value=pd.DataFrame()):
+    ## Points the history file at a temporary file holding only a header, so no real history is touched
 
-            calc = Calculator()
-            messages = []
-            calc._send_message = lambda level, msg: messages.append((level, msg))
+    history_file = tmp_path / "calculator_history.csv"
+    monkeypatch.setenv('CALCULATOR_HISTORY_DIR', str(tmp_path))
+    monkeypatch.setenv('CALCULATOR_HISTORY_FILE', str(history_file))
+    history_file.write_text("operation,num1,num2,result,timestamp\n")
 
-            calc.load_history()
+def test_load_empty_history_file(monkeypatch, tmp_path):
 
-            assert any("Loaded empty history file" in msg for level, msg in messages)
-            assert calc.history == []
+    write_history_header(monkeypatch, tmp_path)
 
-def test_load_history_raises_operation_error():
-    with patch('pathlib.Path.exists', return_value=True), \
-         patch('pandas.read_csv', side_effect=Exception("mocked read_csv failure")):
+    # Patch pd.read_csv to return an empty DataFrame
+    with patch('pandas.read_csv', return_value=pd.DataFrame()):
+
+        calc = Calculator()
+        messages = []
+        calc._send_message = lambda level, msg, *args: messages.append((level, msg % args))
+
+        calc.load_history()
+
+        assert any("Loaded empty history file" in msg for level, msg in messages)
+        assert calc.history == []
+
+def test_load_history_raises_operation_error(monkeypatch, tmp_path):
+    write_history_header(monkeypatch, tmp_path)
+    with patch('pandas.read_csv', side_effect=Exception("mocked read_csv failure")):
 
         # Catch the OperationError raised from __init__ when load_history is called
         with pytest.raises(OperationError, match="Error loading history: mocked read_csv failure"):
@@ -401,4 +413,636 @@ def test_undo_returns_false_when_empty():
 def test_redo_returns_false_when_empty():
     calc = Calculator()
     calc.redo_stack.clear()  # make sure redo_stack is empty
-    assert calc.redo() is False
\ No newline at end of file
+    assert calc.redo() is False
+
+def test_undo_redo_multiple_steps(calculator):
+
+    ## Test that several calculations can be undone and redone in order
+
+    calculator.set_operation(OperationFactory.create('add'))
+    calculator.perform_operation(1, 1)
+    calculator.perform_operation(2, 2)
+    calculator.perform_operation(3, 3)
+
+    assert calculator.undo() and calculator.undo()
+    assert [calc.result for calc in calculator.history] == [Decimal('2')]
+
+    assert calculator.redo()
+    assert [calc.result for calc in calculator.history] == [Decimal('2'), Decimal('4')]
+
+    calculator.perform_operation(4, 4)
+    assert calculator.redo() is False
+
+def test_undo_restores_evicted_entry(calculator):
+
+    ## Test that undoing a calculation past max_history brings back the evicted entry
+
+    calculator.config.max_history = 2
+    calculator.history = []
+    calculator.set_operation(OperationFactory.create('add'))
+    calculator.perform_operation(1, 1)
+    calculator.perform_operation(2, 2)
+    calculator.perform_operation(3, 3)
+
+    assert [calc.result for calc in calculator.history] == [Decimal('4'), Decimal('6')]
+
+    calculator.undo()
+    assert [calc.result for calc in calculator.history] == [Decimal('2'), Decimal('4')]
+
+    calculator.redo()
+    assert [calc.result for calc in calculator.history] == [Decimal('4'), Decimal('6')]
+
+def test_undo_does_not_copy_history(calculator):
+
+    ## Test that the journal records deltas rather than snapshots of the history
+
+    calculator.set_operation(OperationFactory.create('add'))
+    calculator.perform_operation(1, 1)
+    calculator.perform_operation(2, 2)
+
+    history = calculator.history
+    assert calculator.undo_stack[-1].added == [history[-1]]
+    assert calculator.undo_stack[-1].evicted == []
+
+    calculator.undo()
+    assert calculator.history is history
+
+def test_perform_operation_executes_once(calculator):
+
+    ## Test that the strategy result is recorded without calculating it a second time
+
+    calculator.set_operation(OperationFactory.create('percentage calculation'))
+
+    with patch.object(Calculation, 'calculate') as mock_calculate:
+
+        result = calculator.perform_operation(1, 4)
+
+    mock_calculate.assert_not_called()
+    assert result == Decimal('25')
+    assert calculator.history[-1].result == result
+
+def test_load_history_reads_only_newest_rows(calculator):
+
+    ## Test that only the last max_history rows of a large file are loaded, exactly as saved
+
+    calculator.config.max_history = 3
+    lines = ["operation,num1,num2,result,timestamp"] + [
+        f"add,{i},0.1,{i}.1,2024-07-04T12:00:{i:02d}" for i in range(50)
+    ]
+    calculator.config.history_file.write_text("\n".join(lines) + "\n")
+
+    with patch('app.calculator.Calculation.calculate') as mock_calculate:
+
+        calculator.load_history()
+
+    mock_calculate.assert_not_called()
+    assert [calc.num1 for calc in calculator.history] == [Decimal('47'), Decimal('48'), Decimal('49')]
+    assert calculator.history[-1].num2 == Decimal('0.1')
+    assert calculator.history[-1].result == Decimal('49.1')
+    assert calculator.history[-1].timestamp == datetime.datetime(2024, 7, 4, 12, 0, 49)
+
+def test_load_history_round_trip(calculator):
+
+    ## Test that saved history loads back the same
+
+    calculator.set_operation(OperationFactory.create('divide'))
+    calculator.perform_operation(1, 3)
+    calculator.perform_operation('0.1', '0.2')
+    calculator.save_history()
+
+    saved = calculator.history.copy()
+    calculator.clear_history()
+    calculator.load_history()
+
+    assert calculator.history == saved
+
+def test_perform_batch(calculator):
+
+    ## Test that a batch is evaluated, recorded once and reported once
+
+    observer = MagicMock()
+    calculator.observers.append(observer)
+
+    results = calculator.perform_batch('multiply', [1, '2', 3.5], [2, 3, '2'])
+
+    assert results == [Decimal('2'), Decimal('6'), Decimal('7')]
+    assert [calc.result for calc in calculator.history] == results
+    assert len(calculator.undo_stack) == 1
+    observer.update_batch.assert_called_once()
+    observer.update.assert_not_called()
+    assert observer.update_batch.call_args.args[0] == calculator.history.copy()
+
+def test_perform_batch_as_array(calculator):
+
+    ## Test that batch results can come back as a NumPy array
+
+    import numpy as np
+
+    results = calculator.perform_batch(OperationFactory.create('add'), [1, 2], [3, 4], as_array=True)
+
+    assert isinstance(results, np.ndarray)
+    assert list(results) == [Decimal('4'), Decimal('6')]
+
+def test_perform_batch_is_one_undo_step(calculator):
+
+    ## Test that a batch overflowing max_history undoes back to the previous history
+
+    calculator.config.max_history = 3
+    calculator.history = []
+    calculator.set_operation(OperationFactory.create('add'))
+    calculator.perform_operation(1, 1)
+    calculator.perform_operation(2, 2)
+
+    calculator.perform_batch('add', range(10), [0] * 10)
+    assert [calc.result for calc in calculator.history] == [Decimal('7'), Decimal('8'), Decimal('9')]
+
+    calculator.undo()
+    assert [calc.result for calc in calculator.history] == [Decimal('2'), Decimal('4')]
+
+    calculator.redo()
+    assert [calc.result for calc in calculator.history] == [Decimal('7'), Decimal('8'), Decimal('9')]
+
+def test_perform_batch_is_all_or_nothing(calculator):
+
+    ## Test that one bad pair leaves the history untouched
+
+    with pytest.raises(ValidationError, match="Cannot divide by zero"):
+
+        calculator.perform_batch('divide', [1, 2], [1, 0])
+
+    with pytest.raises(ValidationError, match="Operand count mismatch"):
+
+        calculator.perform_batch('divide', [1, 2], [1])
+
+    assert calculator.history == []
+    assert calculator.undo_stack == []
+
+def test_perform_batch_empty(calculator):
+
+    ## Test that an empty batch leaves no undo step and notifies no one
+
+    observer = MagicMock()
+    calculator.add_observer(observer)
+
+    assert calculator.perform_batch('add', [], []) == []
+    assert calculator.undo_stack == []
+    assert calculator.undo() is False
+    observer.update_batch.assert_not_called()
+
+def test_perform_batch_decimal_does_not_import_numpy(calculator):
+
+    ## Test that a plain Decimal batch does not need NumPy
+
+    with patch.dict('sys.modules', {'numpy': None}):
+
+        assert calculator.perform_batch('add', [1], [2]) == [Decimal('3')]
+
+def test_perform_batch_unknown_operation(calculator):
+
+    ## Test that an unknown operation name is reported
+
+    with pytest.raises(ValueError, match="Invalid operation type"):
+
+        calculator.perform_batch('not an op', [1], [1])
+
+def test_perform_batch_float64_backend(calculator):
+
+    ## Test that the float64 backend returns floats and records them in the history
+
+    import numpy as np
+
+    calculator.config.backend = 'float64'
+
+    results = calculator.perform_batch('divide', [1, 3], [4, 2])
+    assert results == [0.25, 1.5]
+    assert [calc.result for calc in calculator.history] == [Decimal('0.25'), Decimal('1.5')]
+    assert calculator.last_precision_loss.tolist() == [False, False]
+
+    results = calculator.perform_batch('add', ['0.1', 1], ['0.2', 2], as_array=True)
+    assert results.dtype == np.float64
+    assert calculator.history[-2].result == Decimal('0.30000000000000004')
+    assert calculator.last_precision_loss.tolist() == [False, False]
+
+def test_perform_batch_float64_flags_overflow(calculator):
+
+    ## Test that results float64 cannot represent exactly are flagged and reported
+
+    calculator.config.backend = 'float64'
+    messages = []
+    calculator._send_message = lambda level, msg, *args: messages.append((level, msg % args))
+
+    calculator.perform_batch('power', [2, 2, 3], [60, 3, 40])
+
+    assert calculator.last_precision_loss.tolist() == [True, False, True]
+    assert (30, "Precision loss in 2 of 3 float64 results") in messages
+
+def test_perform_batch_float64_rejects_undefined_results(calculator):
+
+    ## Test that NaN and infinite results fail the batch, as the Decimal backend does, instead of being recorded
+
+    calculator.config.backend = 'float64'
+
+    with pytest.raises(OperationError, match=r"Result of power \(-8, 0.5\) is undefined or out of float64 range"):
+
+        calculator.perform_batch('power', [2, -8], [3, '0.5'])
+
+    with pytest.raises(OperationError, match=r"Result of power \(1E\+1, 4E\+2\) is undefined"):
+
+        calculator.perform_batch('power', [10], [400])
+
+    assert calculator.history == []
+    assert calculator.undo_stack == []
+
+def test_perform_batch_float64_validation(calculator):
+
+    ## Test that the float64 backend keeps the Decimal validation rules
+
+    calculator.config.backend = 'float64'
+
+    with pytest.raises(ValidationError, match="Cannot take the zeroth root of a number"):
+
+        calculator.perform_batch('root', [4, 9], [2, 0])
+
+    with pytest.raises(ValidationError, match="Cannot raise zero to a negative power"):
+
+        calculator.perform_batch('power', [0], [-1])
+
+    assert calculator.history == []
+
+def test_result_cache_disabled_by_default(calculator):
+
+    assert calculator.result_cache is None
+    assert calculator.cache_stats() is None
+
+def test_result_cache_hits_still_record_history(calculator):
+
+    ## Test that a cached result skips execution but is still recorded and reported
+
+    calculator.result_cache = ResultCache(8)
+    observer = MagicMock()
+    calculator.observers.append(observer)
+
+    operation = OperationFactory.create('power')
+    calculator.set_operation(operation)
+    calculator.perform_operation('2', '10')
+
+    with patch.object(type(operation), 'execute') as mock_execute:
+
+        result = calculator.perform_operation(' 2.0 ', '10')
+
+    mock_execute.assert_not_called()
+    assert result == Decimal('1024')
+    assert len(calculator.history) == 2
+    assert observer.update.call_count == 2
+    assert calculator.cache_stats() == {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1, 'max_size': 8}
+
+def test_result_cache_keys_on_operation(calculator):
+
+    ## Test that the same operands under different operations are cached separately
+
+    calculator.result_cache = ResultCache(8)
+
+    calculator.set_operation(OperationFactory.create('add'))
+    assert calculator.perform_operation(2, 3) == Decimal('5')
+
+    calculator.set_operation(OperationFactory.create('multiply'))
+    assert calculator.perform_operation(2, 3) == Decimal('6')
+
+    assert calculator.cache_stats()['misses'] == 2
+
+def test_result_cache_does_not_cache_errors(calculator):
+
+    calculator.result_cache = ResultCache(8)
+    calculator.set_operation(OperationFactory.create('divide'))
+
+    for _ in range(2):
+
+        with pytest.raises(ValidationError, match="Cannot divide by zero"):
+
+            calculator.perform_operation(1, 0)
+
+    assert calculator.cache_stats()['size'] == 0
+
+def test_result_cache_from_config():
+
+    with TemporaryDirectory() as temp_dir:
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), cache_size=4))
+
+    assert calc.result_cache.max_size == 4
+
+def test_observers_are_synchronous_by_default(calculator):
+
+    assert calculator.dispatch_stats() is None
+
+def test_async_observers_drain_on_save():
+
+    ## Test that queued notifications reach every observer before the history is written
+
+    with TemporaryDirectory() as temp_dir:
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), async_observers=True, observer_queue_size=8))
+        observer = MagicMock()
+        calc.add_observer(observer)
+        calc.set_operation(OperationFactory.create('add'))
+
+        for i in range(50):
+
+            calc.perform_operation(i, 1)
+
+        calc.save_history()
+
+        assert observer.update.call_count == 50
+        observer.flush.assert_called_once()
+
+        calc.flush_observers()
+        assert calc.dispatch_stats()['depth'] == 0
+        assert calc.dispatch_stats()['dropped'] == 0
+
+        calc.close()
+
+    observer.close.assert_called_once()
+    assert calc.dispatch_stats() is None
+
+def test_close_delivers_synchronously_afterwards(calculator):
+
+    observer = MagicMock()
+    calculator.add_observer(observer)
+    calculator.close()
+
+    calculator.set_operation(OperationFactory.create('add'))
+    calculator.perform_operation(1, 1)
+
+    observer.update.assert_called_once()
+
+@pytest.mark.parametrize("backend", ["sqlite", "binary"])
+def test_history_backends(monkeypatch, backend):
+
+    ## Test that save and load go through the configured backend, and only max_history rows come back
+
+    monkeypatch.delenv('CALCULATOR_HISTORY_DIR', raising=False)
+    monkeypatch.delenv('CALCULATOR_HISTORY_FILE', raising=False)
+
+    with TemporaryDirectory() as temp_dir:
+
+        config = CalculatorConfig(root_dir=Path(temp_dir), history_backend=backend, max_history=3)
+        calc = Calculator(config)
+        calc.set_operation(OperationFactory.create('add'))
+
+        for i in range(5):
+
+            calc.perform_operation(i, 1)
+
+        calc.save_history()
+        calc.storage.append([Calculation('multiply', Decimal(2), Decimal(3))])
+        calc.close()
+
+        assert config.history_path.exists()
+        assert not config.history_file.exists()
+
+        reloaded = Calculator(config)
+        assert [str(c.result) for c in reloaded.history] == ['4', '5', '6']
+        assert reloaded.history[-1].operation == 'multiply'
+        reloaded.close()
+
+def test_operations_use_configured_precision():
+
+    ## Test that the configured precision sizes the Decimal context, without rounding whole numbers (including results)
+
+    with TemporaryDirectory() as temp_dir:
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), precision=5, max_input_val=Decimal('1e20')))
+
+        calc.set_operation(OperationFactory.create('divide'))
+        assert calc.perform_operation(1, 3) == Decimal('0.333333')
+
+        calc.set_operation(OperationFactory.create('add'))
+        assert calc.perform_operation('12345678901', 1) == Decimal('12345678902')
+
+        ## Products and powers are sized from their result, so large whole numbers stay exact
+
+        calc.set_operation(OperationFactory.create('multiply'))
+        assert str(calc.perform_operation('123456789012', '987654321098')) == '121932631136585886175176'
+        assert str(calc.perform_operation('12345.6789', '98765.4321')) == '1219326311.12635'
+
+        calc.set_operation(OperationFactory.create('power'))
+        assert str(calc.perform_operation(2, 50)) == '1125899906842624'
+        assert calc.perform_batch('power', [2, 3], [64, 2]) == [Decimal('18446744073709551616'), Decimal('9')]
+        assert calc.perform_batch('power', [3], ['0.5']) == [Decimal('1.73205')]
+
+        assert calc.perform_batch('root', [2], [2]) == [Decimal('1.41421')]
+        assert calc.perform_batch('root', [], []) == []
+        calc.close()
+
+def test_large_results_are_rounded(monkeypatch):
+
+    ## Test that results past EXACT_DIGITS are rounded rather than computed in full
+
+    for name in ('CALCULATOR_PRECISION', 'CALCULATOR_MAX_INPUT_VAL', 'CALCULATOR_HISTORY_DIR', 'CALCULATOR_HISTORY_FILE'):
+        monkeypatch.delenv(name, raising=False)
+
+    with TemporaryDirectory() as temp_dir:
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir)))
+        calc.set_operation(OperationFactory.create('power'))
+
+        assert str(calc.perform_operation(2, 10000)) == '1.9950631168807583848837421626835850838E+3010'
+        assert len(calc.perform_operation(2, 3000).as_tuple().digits) == calc.config.precision + EXACT_DIGITS
+
+        ## A percentage is sized like the division it is
+
+        calc.set_operation(OperationFactory.create('percent'))
+        assert calc.perform_operation('1234567890123456789012', '1e-20') == Decimal('1234567890123456789012E+22')
+        calc.close()
+
+def test_decimal_context_is_isolated():
+
+    ## Test that calculators with different precisions do not affect each other or the global context
+
+    import decimal
+    from concurrent.futures import ThreadPoolExecutor
+
+    global_precision = decimal.getcontext().prec
+
+    with TemporaryDirectory() as temp_dir:
+
+        low = Calculator(CalculatorConfig(root_dir=Path(temp_dir), precision=3, auto_save=False))
+        high = Calculator(CalculatorConfig(root_dir=Path(temp_dir), precision=40, auto_save=False))
+
+        for calc in (low, high):
+
+            calc.set_operation(OperationFactory.create('divide'))
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+
+            results = list(pool.map(lambda calc: calc.perform_operation(2, 3), [low, high] * 50))
+
+        assert set(results[0::2]) == {Decimal('0.6667')}
+        assert set(results[1::2]) == {Decimal('0.' + '6' * 40 + '7')}
+        assert decimal.getcontext().prec == global_precision
+        assert low.decimal_context.prec == 3
+
+def test_cost_guard_rejects_expensive_operations(monkeypatch):
+
+    ## Test that power, root and multiply are checked against the budget before they run
+
+    monkeypatch.delenv('CALCULATOR_HISTORY_DIR', raising=False)
+    monkeypatch.delenv('CALCULATOR_HISTORY_FILE', raising=False)
+
+    with TemporaryDirectory() as temp_dir:
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), precision=10, max_input_val=Decimal('1e999'), max_digits=100, max_exponent=1500))
+        calc.set_operation(OperationFactory.create('power'))
+
+        with pytest.raises(OperationError, match="Result of power is out of range"):
+
+            calc.perform_operation('9e998', '9e998')
+
+        with pytest.raises(OperationError, match="Power would need 1009 digits of precision, more than the limit of 100"):
+
+            calc.perform_operation('9e998', '0.5')
+
+        with pytest.raises(OperationError, match="Result of multiply is out of range"):
+
+            calc.perform_batch('multiply', [2, '1e999'], [3, '1e999'])
+
+        assert calc.perform_operation(2, 10) == Decimal('1024')
+        assert calc.cost_stats()['rejected'] == 3
+        assert calc.cost_stats()['checked'] == 5
+        assert len(calc.history) == 1
+        calc.close()
+
+def test_cost_guard_downgrade():
+
+    ## Test that the downgrade policy runs over-budget work at the budget's precision
+
+    with TemporaryDirectory() as temp_dir:
+
+        config = CalculatorConfig(
+            root_dir=Path(temp_dir),
+            precision=50,
+            max_input_val=Decimal('1e999'),
+            max_digits=20,
+            cost_policy='downgrade'
+        )
+        calc = Calculator(config)
+        calc.set_operation(OperationFactory.create('root'))
+
+        assert calc.perform_operation(2, 2) == Decimal('1.4142135623730950488')
+        assert calc.cost_stats()['downgraded'] == 1
+        calc.close()
+
+def test_stage_timing(monkeypatch):
+
+    ## Test that stage timing is off by default and records every stage of perform_operation when on
+
+    from app.stage_timings import STAGES
+
+    monkeypatch.delenv('CALCULATOR_STAGE_TIMING', raising=False)
+
+    with TemporaryDirectory() as temp_dir:
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), auto_save=False))
+        assert calc.stage_stats() is None
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), auto_save=False, stage_timing=True))
+        calc.set_operation(OperationFactory.create('add'))
+        calc.perform_operation(1, 2)
+        calc.perform_operation(3, 4)
+
+        with pytest.raises(ValidationError):
+
+            calc.perform_operation('x', 4)
+
+        stats = calc.stage_stats()
+        assert list(stats) == ['add']
+        assert list(stats['add']) == list(STAGES)
+        assert all(stage['count'] == 2 for stage in stats['add'].values())
+        calc.close()
+
+def test_close_writes_out_queued_log_records(monkeypatch):
+
+    ## Test that calculations are logged through the queue and written out by close
+
+    monkeypatch.delenv('CALCULATOR_HISTORY_DIR', raising=False)
+    monkeypatch.delenv('CALCULATOR_HISTORY_FILE', raising=False)
+
+    with TemporaryDirectory() as temp_dir:
+
+        log_file = Path(temp_dir) / 'calculator.log'
+        monkeypatch.setenv('CALCULATOR_LOG_FILE', str(log_file))
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), auto_save=False, max_input_val=Decimal('1e999')))
+        calc.set_operation(OperationFactory.create('add'))
+        calc.perform_operation(1, 2)
+
+        stats = calc.log_stats()
+        assert stats['enqueued'] > 0
+        assert stats['dropped'] == 0
+
+        calc.close()
+
+        assert "History updated: add, (1, 2) = 3" in log_file.read_text()
+
+def test_structured_log(monkeypatch):
+
+    ## Test that each calculation is written to the structured log with its latency and the session id
+
+    from app.structured_log import read_records
+
+    monkeypatch.delenv('CALCULATOR_HISTORY_DIR', raising=False)
+    monkeypatch.delenv('CALCULATOR_HISTORY_FILE', raising=False)
+
+    with TemporaryDirectory() as temp_dir:
+
+        structured_log = Path(temp_dir) / 'calculations.jsonl'
+        monkeypatch.setenv('CALCULATOR_STRUCTURED_LOG_FILE', str(structured_log))
+
+        calc = Calculator(CalculatorConfig(
+            root_dir=Path(temp_dir),
+            auto_save=False,
+            max_input_val=Decimal('1e999'),
+            structured_log=True
+        ))
+        calc.set_operation(OperationFactory.create('divide'))
+        calc.perform_operation(1, 4)
+        calc.perform_operation(9, 3)
+        calc.close()
+
+        records = list(read_records(str(structured_log)))
+        assert [(r['num1'], r['num2'], r['result']) for r in records] == [('1', '4', '0.25'), ('9', '3', '3')]
+        assert all(r['session_id'] == calc.session_id for r in records)
+        assert all(r['latency_ns'] > 0 for r in records)
+        assert calc.history[0].latency_ns == records[0]['latency_ns']
+
+def test_thousand_calculator_sessions(monkeypatch):
+
+    ## Test that 1,000 calculators in one process each get their own logger but share one log handler,
+    ## and that setting them up stays fast (no root logger rebuilds, no thread per session)
+
+    import threading
+    import time
+
+    monkeypatch.delenv('CALCULATOR_HISTORY_DIR', raising=False)
+    monkeypatch.delenv('CALCULATOR_HISTORY_FILE', raising=False)
+
+    with TemporaryDirectory() as temp_dir:
+
+        monkeypatch.setenv('CALCULATOR_LOG_FILE', str(Path(temp_dir) / 'calculator.log'))
+        config = CalculatorConfig(root_dir=Path(temp_dir), auto_save=False, max_input_val=Decimal('1e999'))
+        threads = threading.active_count()
+
+        start = time.perf_counter()
+        sessions = [Calculator(config) for _ in range(1000)]
+        elapsed = time.perf_counter() - start
+
+        assert len({calc.calculation_logger.logger.name for calc in sessions}) == 1000
+        assert len({id(calc.calculation_logger.queue_handler) for calc in sessions}) == 1
+        assert threading.active_count() <= threads + 1
+        assert elapsed < 10, f"1,000 sessions took {elapsed:.3f}s to set up"
+
+        for calc in sessions:
+
+            calc.close()
+
+        assert threading.active_count() <= threads
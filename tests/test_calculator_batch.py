@@ -0,0 +1,209 @@
+## test_calculator_batch.py
+## IS 601 Midterm
+## Evan Garvey
+
+import io
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
+import pytest
+
+import app.calculator_batch as cb
+from app.calculator import Calculator
+from app.calculator_config import CalculatorConfig
+import main
+
+
+@pytest.fixture(autouse=True)
+def isolated_history(monkeypatch):
+
+    ## Keep history files inside each test's root directory
+
+    monkeypatch.delenv('CALCULATOR_HISTORY_DIR', raising=False)
+    monkeypatch.delenv('CALCULATOR_HISTORY_FILE', raising=False)
+
+@pytest.fixture
+def calc():
+
+    with TemporaryDirectory() as temp_dir:
+
+        yield Calculator(CalculatorConfig(root_dir=Path(temp_dir), auto_save=False, max_undo=5))
+
+def test_run_batch(calc):
+
+    lines = ["add 3 4\n", "\n", "# a comment\n", "Multiply 2 2.5\n", "integer division 7 2\n", "add 1 1\n"]
+    out = io.StringIO()
+
+    assert cb.run_batch(calc, lines, out) == (4, 0)
+    assert out.getvalue() == "7\n5\n3\n2\n"
+    assert len(calc.history) == 4
+
+def test_run_batch_accepts_repl_aliases(calc):
+
+    out = io.StringIO()
+
+    assert cb.run_batch(calc, ["int_divide 7 2", "percent 25 200", "abs_diff 2 5"], out) == (3, 0)
+    assert out.getvalue() == "3\n12.5\n3\n"
+    assert [c.operation for c in calc.history] == ["integer division", "percentage calculation", "absolute difference"]
+
+def test_run_batch_errors_keep_output_aligned(calc):
+
+    lines = ["divide 1 0", "sqrt 4 2", "add 1", "add x 2", "add 2 2"]
+    out = io.StringIO()
+
+    assert cb.run_batch(calc, lines, out) == (5, 4)
+
+    results = out.getvalue().splitlines()
+    assert results[0] == "Error: Cannot divide by zero"
+    assert results[1].startswith("Error: Invalid operation type: sqrt")
+    assert results[2] == "Error: Expected '<operation> <num1> <num2>', got: add 1"
+    assert results[3].startswith("Error: Invalid number format")
+    assert results[4] == "4"
+
+def test_run_batch_undefined_result(calc):
+
+    ## A Decimal signal on one line is reported like any other error and the run carries on
+
+    out = io.StringIO()
+
+    assert cb.run_batch(calc, ["add 1 2", "power -8 0.5", "add 3 4"], out) == (3, 1)
+    assert out.getvalue() == "3\nError: Calculation failed: InvalidOperation\n7\n"
+
+def test_run_batch_keeps_finished_results_on_failure(calc):
+
+    ## Results already computed are written out even when reading the input fails part way
+
+    def lines():
+
+        yield "add 1 2"
+        raise OSError("read failed")
+
+    out = io.StringIO()
+
+    with pytest.raises(OSError):
+
+        cb.run_batch(calc, lines(), out)
+
+    assert out.getvalue() == "3\n"
+
+def test_run_batch_memory_is_bounded(calc):
+
+    ## History and undo are capped, so a long run holds a fixed number of entries
+
+    lines = (f"add {i % 100} 1" for i in range(3000))
+
+    assert cb.run_batch(calc, lines, io.StringIO()) == (3000, 0)
+    assert len(calc.history) == calc.config.max_history
+    assert len(calc.undo_stack) == 5
+
+def test_run_batch_notifies_once_per_chunk(calc, monkeypatch):
+
+    ## Observers get one batch per output chunk (so one log line), not one update per line
+
+    monkeypatch.setattr(cb, "OUTPUT_CHUNK", 2)
+    observer = MagicMock()
+    calc.add_observer(observer)
+
+    assert cb.run_batch(calc, ["add 1 1", "add 2 2", "divide 1 0", "add 3 3", "add 4 4"], io.StringIO()) == (5, 1)
+
+    observer.update.assert_not_called()
+    assert [len(c.args[0]) for c in observer.update_batch.call_args_list] == [2, 1, 1]
+
+    ## Afterwards the calculator notifies each calculation again
+
+    calc.perform_operation(1, 1)
+    observer.update.assert_called_once()
+
+def test_calculator_batch_missing_file(tmp_path):
+
+    err = io.StringIO()
+
+    with patch.object(cb, "Calculator") as mock_calc:
+
+        status = cb.calculator_batch(str(tmp_path / "missing.txt"), io.StringIO(), err)
+
+    assert status == 2
+    assert err.getvalue() == f"Error: cannot read {tmp_path / 'missing.txt'}: No such file or directory\n"
+    mock_calc.assert_not_called()
+
+def test_calculator_batch_output_error(calc, tmp_path):
+
+    source = tmp_path / "input.txt"
+    source.write_text("add 3 4\n")
+    out = MagicMock()
+    out.write.side_effect = BrokenPipeError(32, "Broken pipe")
+    err = io.StringIO()
+
+    with patch.object(cb, "Calculator", return_value=calc):
+
+        status = cb.calculator_batch(str(source), out, err)
+
+    assert status == 2
+    assert err.getvalue() == "Error: Broken pipe\n"
+
+def test_calculator_batch_file(calc, tmp_path):
+
+    source = tmp_path / "input.txt"
+    source.write_text("add 3 4\npower 2 10\n")
+    out = io.StringIO()
+    err = io.StringIO()
+
+    with patch.object(cb, "Calculator", return_value=calc):
+
+        status = cb.calculator_batch(str(source), out, err)
+
+    assert status == 0
+    assert out.getvalue() == "7\n1024\n"
+    assert err.getvalue().startswith("Processed 2 calculations (0 errors) in ")
+
+def test_calculator_batch_stdin_with_errors(calc, monkeypatch):
+
+    monkeypatch.setattr("sys.stdin", io.StringIO("add 1 2\ndivide 1 0\n"))
+    out = io.StringIO()
+
+    with patch.object(cb, "Calculator", return_value=calc):
+
+        status = cb.calculator_batch("-", out, io.StringIO())
+
+    assert status == 1
+    assert out.getvalue().splitlines()[0] == "3"
+
+def test_calculator_batch_auto_save(tmp_path):
+
+    with TemporaryDirectory() as temp_dir:
+
+        calc = Calculator(CalculatorConfig(root_dir=Path(temp_dir), auto_save=True))
+        source = tmp_path / "input.txt"
+        source.write_text("add 3 4\n")
+
+        with patch.object(cb, "Calculator", return_value=calc):
+
+            cb.calculator_batch(str(source), io.StringIO(), io.StringIO())
+
+        ## Rows are buffered a chunk at a time, and written out when the calculator closes
+
+        autosave = calc.observers[-1]
+        assert autosave.flush_every == cb.OUTPUT_CHUNK
+
+        lines = Path(calc.config.history_file).read_text(encoding="utf-8").splitlines()
+
+    assert lines[0] == "operation,num1,num2,result,timestamp"
+    assert lines[-1].startswith("add,3,4,7,")
+
+def test_main_batch_flag():
+
+    with patch("app.calculator_batch.calculator_batch", return_value=0) as mock_batch, \
+         patch("app.calculator_repl.calculator_repl") as mock_repl:
+
+        assert main.main(["--batch", "-"]) == 0
+
+    mock_batch.assert_called_once_with("-")
+    mock_repl.assert_not_called()
+
+def test_main_defaults_to_repl():
+
+    with patch("app.calculator_repl.calculator_repl") as mock_repl:
+
+        assert main.main([]) == 0
+
+    mock_repl.assert_called_once()
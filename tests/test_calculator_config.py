@@ -174,4 +174,215 @@ def test_history_file_resolve_failure(monkeypatch):
     config = CalculatorConfig(root_dir = Path('/new_base_dir'))
 
     with pytest.raises(ValueError, match="Invalid CALCULATOR_HISTORY_FILE path: /fake/path.csv"):
-        _ = config.history_file
\ No newline at end of file
+        _ = config.history_file
+
+def test_auto_save_flush_policy_defaults():
+
+    clear_env_vars('CALCULATOR_AUTO_SAVE_FLUSH_EVERY', 'CALCULATOR_AUTO_SAVE_FSYNC')
+    config = CalculatorConfig()
+    assert config.auto_save_flush_every == 1
+    assert config.auto_save_fsync is False
+
+def test_auto_save_flush_policy_env(monkeypatch):
+
+    monkeypatch.setenv('CALCULATOR_AUTO_SAVE_FLUSH_EVERY', '0')
+    monkeypatch.setenv('CALCULATOR_AUTO_SAVE_FSYNC', 'true')
+    config = CalculatorConfig()
+    assert config.auto_save_flush_every == 0
+    assert config.auto_save_fsync is True
+
+def test_invalid_auto_save_flush_every():
+
+    with pytest.raises(ConfigurationError, match="Auto save flush interval cannot be negative"):
+        config = CalculatorConfig(auto_save_flush_every=-1)
+        config.validate()
+
+def test_backend_configuration(monkeypatch):
+
+    monkeypatch.delenv('CALCULATOR_BACKEND', raising=False)
+    assert CalculatorConfig().backend == 'decimal'
+    assert CalculatorConfig(backend='FLOAT64').backend == 'float64'
+
+    monkeypatch.setenv('CALCULATOR_BACKEND', 'float64')
+    assert CalculatorConfig().backend == 'float64'
+
+def test_invalid_backend():
+
+    with pytest.raises(ConfigurationError, match="Unknown numeric backend: float16"):
+        config = CalculatorConfig(backend='float16')
+        config.validate()
+
+def test_cache_size_configuration(monkeypatch):
+
+    monkeypatch.delenv('CALCULATOR_CACHE_SIZE', raising=False)
+    assert CalculatorConfig().cache_size == 0
+    assert CalculatorConfig(cache_size=128).cache_size == 128
+
+    monkeypatch.setenv('CALCULATOR_CACHE_SIZE', '64')
+    assert CalculatorConfig().cache_size == 64
+
+def test_invalid_cache_size():
+
+    with pytest.raises(ConfigurationError, match="Cache size cannot be negative"):
+        config = CalculatorConfig(cache_size=-1)
+        config.validate()
+
+def test_async_observer_configuration(monkeypatch):
+
+    monkeypatch.delenv('CALCULATOR_ASYNC_OBSERVERS', raising=False)
+    monkeypatch.delenv('CALCULATOR_OBSERVER_BACKPRESSURE', raising=False)
+    config = CalculatorConfig()
+    assert config.async_observers is False
+    assert config.observer_queue_size == 1024
+    assert config.observer_backpressure == 'block'
+
+    monkeypatch.setenv('CALCULATOR_ASYNC_OBSERVERS', 'true')
+    monkeypatch.setenv('CALCULATOR_OBSERVER_QUEUE_SIZE', '16')
+    monkeypatch.setenv('CALCULATOR_OBSERVER_BACKPRESSURE', 'Drop_Oldest')
+    config = CalculatorConfig()
+    assert config.async_observers is True
+    assert config.observer_queue_size == 16
+    assert config.observer_backpressure == 'drop_oldest'
+
+def test_invalid_observer_queue():
+
+    with pytest.raises(ConfigurationError, match="Observer queue size must be greater than 0"):
+        config = CalculatorConfig(observer_queue_size=0)
+        config.validate()
+
+    with pytest.raises(ConfigurationError, match="Unknown backpressure policy: spill"):
+        config = CalculatorConfig(observer_backpressure='spill')
+        config.validate()
+
+def test_invalid_max_undo():
+
+    with pytest.raises(ConfigurationError, match="Max undo must be greater than 0"):
+        config = CalculatorConfig(max_undo=-1)
+        config.validate()
+
+def test_history_backend_configuration(monkeypatch):
+
+    monkeypatch.delenv('CALCULATOR_HISTORY_BACKEND', raising=False)
+    config = CalculatorConfig()
+    assert config.history_backend == 'csv'
+    assert config.history_path == config.history_file
+
+    config = CalculatorConfig(history_backend='SQLite')
+    assert config.history_backend == 'sqlite'
+    assert config.history_path == config.history_db
+    assert config.history_db.name == 'calculator_history.db'
+
+    config = CalculatorConfig(history_backend='binary')
+    assert config.history_path == config.history_bin
+    assert config.history_bin.name == 'calculator_history.bin'
+
+def test_invalid_history_backend():
+
+    with pytest.raises(ConfigurationError, match="Unknown history backend: xml"):
+        config = CalculatorConfig(history_backend='xml')
+        config.validate()
+
+def test_cost_budget_configuration(monkeypatch):
+
+    for name in ('CALCULATOR_MAX_DIGITS', 'CALCULATOR_MAX_EXPONENT', 'CALCULATOR_COST_POLICY'):
+
+        monkeypatch.delenv(name, raising=False)
+
+    config = CalculatorConfig()
+    assert (config.max_digits, config.max_exponent, config.cost_policy) == (2000, 999999, 'reject')
+
+    monkeypatch.setenv('CALCULATOR_MAX_DIGITS', '500')
+    monkeypatch.setenv('CALCULATOR_COST_POLICY', 'Downgrade')
+    config = CalculatorConfig(max_exponent=1000)
+    assert (config.max_digits, config.max_exponent, config.cost_policy) == (500, 1000, 'downgrade')
+
+def test_invalid_cost_budget():
+
+    with pytest.raises(ConfigurationError, match="Max digits must be greater than 0"):
+        config = CalculatorConfig(max_digits=-1)
+        config.validate()
+
+    with pytest.raises(ConfigurationError, match="Max exponent must be greater than 0"):
+        config = CalculatorConfig(max_exponent=-1)
+        config.validate()
+
+    with pytest.raises(ConfigurationError, match="Unknown cost policy: ignore"):
+        config = CalculatorConfig(cost_policy='ignore')
+        config.validate()
+
+def test_stage_timing_configuration(monkeypatch):
+
+    monkeypatch.delenv('CALCULATOR_STAGE_TIMING', raising=False)
+    assert CalculatorConfig().stage_timing is False
+    assert CalculatorConfig(stage_timing=True).stage_timing is True
+
+    monkeypatch.setenv('CALCULATOR_STAGE_TIMING', '1')
+    assert CalculatorConfig().stage_timing is True
+
+def test_log_queue_configuration(monkeypatch):
+
+    monkeypatch.delenv('CALCULATOR_LOG_QUEUE_SIZE', raising=False)
+    assert CalculatorConfig().log_queue_size == 10000
+    assert CalculatorConfig(log_queue_size=16).log_queue_size == 16
+
+    monkeypatch.setenv('CALCULATOR_LOG_QUEUE_SIZE', '64')
+    assert CalculatorConfig().log_queue_size == 64
+
+    with pytest.raises(ConfigurationError, match="Log queue size must be greater than 0"):
+        config = CalculatorConfig(log_queue_size=0)
+        config.validate()
+
+def test_log_level_configuration(monkeypatch):
+
+    monkeypatch.delenv('CALCULATOR_LOG_LEVEL', raising=False)
+    assert CalculatorConfig().log_level == 'INFO'
+    assert CalculatorConfig(log_level='debug').log_level == 'DEBUG'
+
+    monkeypatch.setenv('CALCULATOR_LOG_LEVEL', 'warning')
+    assert CalculatorConfig().log_level == 'WARNING'
+
+    with pytest.raises(ConfigurationError, match="Unknown log level: LOUD"):
+        config = CalculatorConfig(log_level='loud')
+        config.validate()
+
+def test_log_rotation_configuration(monkeypatch):
+
+    for name in ('CALCULATOR_LOG_MAX_BYTES', 'CALCULATOR_LOG_ROTATE_INTERVAL', 'CALCULATOR_LOG_BACKUP_COUNT'):
+        monkeypatch.delenv(name, raising=False)
+
+    config = CalculatorConfig()
+    assert (config.log_max_bytes, config.log_rotate_interval, config.log_backup_count) == (10485760, 0, 5)
+
+    config = CalculatorConfig(log_max_bytes=0, log_rotate_interval=60, log_backup_count=2)
+    assert (config.log_max_bytes, config.log_rotate_interval, config.log_backup_count) == (0, 60, 2)
+
+    monkeypatch.setenv('CALCULATOR_LOG_ROTATE_INTERVAL', '86400')
+    assert CalculatorConfig().log_rotate_interval == 86400
+
+    with pytest.raises(ConfigurationError, match="Log rotation limits cannot be negative"):
+        config = CalculatorConfig(log_max_bytes=-1)
+        config.validate()
+
+    with pytest.raises(ConfigurationError, match="Log backup count must be greater than 0"):
+        config = CalculatorConfig(log_backup_count=0)
+        config.validate()
+
+def test_structured_log_configuration(monkeypatch):
+
+    for name in ('CALCULATOR_STRUCTURED_LOG', 'CALCULATOR_STRUCTURED_LOG_FILE',
+                 'CALCULATOR_STRUCTURED_LOG_FLUSH_BYTES', 'CALCULATOR_STRUCTURED_LOG_FLUSH_INTERVAL'):
+        monkeypatch.delenv(name, raising=False)
+
+    config = CalculatorConfig()
+    assert config.structured_log is False
+    assert (config.structured_log_flush_bytes, config.structured_log_flush_interval) == (65536, 1.0)
+    assert config.structured_log_file == config.log_dir / 'calculations.jsonl'
+
+    monkeypatch.setenv('CALCULATOR_STRUCTURED_LOG', 'true')
+    monkeypatch.setenv('CALCULATOR_STRUCTURED_LOG_FLUSH_INTERVAL', '0.5')
+    config = CalculatorConfig(structured_log_flush_bytes=0)
+    assert (config.structured_log, config.structured_log_flush_bytes, config.structured_log_flush_interval) == (True, 0, 0.5)
+
+    with pytest.raises(ConfigurationError, match="Structured log flush limits cannot be negative"):
+        config = CalculatorConfig(structured_log_flush_interval=-1)
+        config.validate()
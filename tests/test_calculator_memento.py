@@ -9,7 +9,8 @@ print(hasattr(datetime.datetime, 'fromisoformat'))
 from unittest.mock import Mock
 
 from app.calculation import Calculation
-from app.calculator_memento import CalculatorMemento
+from app.calculator_memento import CalculatorMemento, HistoryDelta
+from app.history_buffer import HistoryBuffer
 
 
 def test_calculator_memento_to_dict():
@@ -64,4 +65,30 @@ def test_calculator_memento_from_dict(monkeypatch):
 
     assert called_args == data['history']
     assert memento.history == [calc1, calc2]
-    assert memento.timestamp == datetime.datetime.fromisoformat(data['timestamp'])
\ No newline at end of file
+    assert memento.timestamp == datetime.datetime.fromisoformat(data['timestamp'])
+
+def test_history_delta_undo_redo():
+
+    ## Test that a delta can revert and re-apply an append with an eviction
+
+    calc1, calc2, calc3 = Mock(spec=Calculation), Mock(spec=Calculation), Mock(spec=Calculation)
+    history = HistoryBuffer(2, [calc2, calc3])
+    delta = HistoryDelta(added=[calc3], evicted=[calc1])
+
+    delta.undo(history)
+    assert history == [calc1, calc2]
+
+    delta.redo(history)
+    assert history == [calc2, calc3]
+
+def test_history_delta_empty():
+
+    ## Test that an empty delta leaves the history alone
+
+    calc1 = Mock(spec=Calculation)
+    history = HistoryBuffer(2, [calc1])
+    delta = HistoryDelta()
+
+    delta.undo(history)
+    delta.redo(history)
+    assert history == [calc1]
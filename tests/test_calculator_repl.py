@@ -435,20 +435,88 @@ class FakeInitError(Exception):
 def test_repl_fatal_error_during_init(monkeypatch, capsys):
     # 1) Create a dummy Calculator with the methods/attrs we need
     dummy = SimpleNamespace()
-    dummy.config = SimpleNamespace(history_file="dummy.csv")
+    dummy.config = SimpleNamespace(history_file="dummy.csv", history_backend="csv", auto_save_flush_every=1, auto_save_fsync=False)
     dummy.add_observer = lambda obs: None
-    dummy._send_message = lambda level, msg: None  # no-op
+    dummy._send_message = lambda level, msg, *args: None  # no-op
+    closed = []
+    dummy.close = lambda: closed.append(True)
 
     # 2) Patch Calculator() to return our dummy
     monkeypatch.setattr(cr, "Calculator", lambda *a, **k: dummy)
 
     # 3) Patch AutoSaveObserver to throw, simulating a failure in setup
     monkeypatch.setattr(cr, "AutoSaveObserver",
-                        lambda path: (_ for _ in ()).throw(FakeInitError("autosave init boom")))
+                        lambda path, **kwargs: (_ for _ in ()).throw(FakeInitError("autosave init boom")))
 
     # 4) Run and assert
     with pytest.raises(FakeInitError):
         cr.calculator_repl()
 
     out = capsys.readouterr().out
-    assert "Fatal error during initialization: autosave init boom" in out
\ No newline at end of file
+    assert "Fatal error during initialization: autosave init boom" in out
+    assert closed == [True]
+
+def test_repl_closes_autosave_on_exit(monkeypatch):
+    # The auto save observer is opened in append mode, and the calculator (which closes
+    # its observers and the log) is closed once, after the final save, so the save is logged
+    inputs = ["save", "exit"]
+    autosave = MagicMock()
+    factory = MagicMock(return_value=autosave)
+
+    with patch("app.calculator_repl.Calculator") as MockCalc:
+        inst = MockCalc.return_value
+        inst.config.history_file = "mock_file.csv"
+        monkeypatch.setattr(cr, "AutoSaveObserver", factory)
+
+        with patch.object(builtins, "input", side_effect=lambda _: inputs.pop(0)):
+            calculator_repl()
+
+    assert factory.call_args.kwargs["append"] is True
+    inst.add_observer.assert_called_once_with(autosave)
+    names = [c[0] for c in inst.mock_calls]
+    assert names.index("close") > len(names) - 1 - names[::-1].index("save_history")
+    assert names.count("save_history") == 2
+    assert names.count("close") == 1
+
+def test_repl_cache_stats(capsys):
+    # "cache" prints the counters when caching is on, and a notice when it is off
+    inputs = ["cache", "cache", "exit"]
+
+    with patch("app.calculator_repl.Calculator") as MockCalc:
+        inst = MockCalc.return_value
+        inst.config.history_file = "mock_file.csv"
+        inst.cache_stats.side_effect = [
+            {'hits': 3, 'misses': 2, 'evictions': 1, 'size': 2, 'max_size': 2},
+            None
+        ]
+
+        with patch.object(builtins, "input", side_effect=lambda _: inputs.pop(0)):
+            calculator_repl()
+
+    out = capsys.readouterr().out
+    assert "Result cache: 2/2 entries, 3 hits, 2 misses, 1 evictions" in out
+    assert "Result cache is disabled." in out
+
+def test_repl_stage_stats(capsys):
+    # "stats" prints the stage timings when timing is on, and a notice when it is off
+    inputs = ["stats", "stats", "stats", "exit"]
+    timing = {'count': 2, 'mean_ns': 1500, 'p50_ns': 1024, 'p90_ns': 2048, 'p99_ns': 2048, 'max_ns': 2000, 'buckets': {}}
+
+    with patch("app.calculator_repl.Calculator") as MockCalc:
+        inst = MockCalc.return_value
+        inst.config.history_file = "mock_file.csv"
+        inst.stage_stats.side_effect = [
+            {'add': {'validate': timing, 'execute': timing}},
+            {},
+            None
+        ]
+
+        with patch.object(builtins, "input", side_effect=lambda _: inputs.pop(0)):
+            calculator_repl()
+
+    out = capsys.readouterr().out
+    assert "add (2 calculations), in microseconds:" in out
+    assert "    execute            1.5       1.0       2.0       2.0" in out
+    assert "No calculations timed yet." in out
+    assert "Stage timing is disabled." in out
+
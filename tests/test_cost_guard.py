@@ -0,0 +1,100 @@
+## test_cost_guard.py
+## IS 601 Midterm
+## Evan Garvey
+
+from decimal import Decimal
+import pytest
+
+from app.cost_guard import CostGuard, estimated_exponent
+from app.operations import OperationFactory
+from app.exceptions import OperationError
+
+
+@pytest.fixture
+def guard():
+
+    return CostGuard(max_digits=50, max_exponent=1000)
+
+@pytest.mark.parametrize("operation, num1, num2", [
+    ("add", "9e999", "9e999"),
+    ("power", "2", "100"),
+    ("power", "1", "9e998"),
+    ("power", "0", "9e998"),
+    ("power", "0.5", "-3000"),
+    ("root", "9e999", "2"),
+    ("multiply", "1e500", "1e499")
+])
+def test_allowed(guard, operation, num1, num2):
+
+    assert guard.check(operation, Decimal(num1), Decimal(num2), 20) == 20
+
+@pytest.mark.parametrize("operation, num1, num2, message", [
+    ("power", "9e998", "9e998", "Result of power is out of range"),
+    ("power", "2", "4000", "Result of power is out of range"),
+    ("power", "2", "-4000", "Result of power is out of range"),
+    ("root", "1e999", "0.5", "Result of root is out of range"),
+    ("multiply", "1e600", "1e600", "Result of multiply is out of range"),
+    ("multiply", "1." + "1" * 60, "2", "Operand has 61 digits, more than the limit of 50")
+])
+def test_rejected(guard, operation, num1, num2, message):
+
+    with pytest.raises(OperationError, match=message):
+
+        guard.check(operation, Decimal(num1), Decimal(num2), 20)
+
+    assert guard.stats()['rejected'] == 1
+
+def test_precision_budget(guard):
+
+    ## Only power and root slow down with precision
+
+    assert guard.check("multiply", Decimal(2), Decimal(3), 500) == 500
+
+    with pytest.raises(OperationError, match="Root would need 500 digits of precision, more than the limit of 50"):
+
+        guard.check("root", Decimal(2), Decimal(3), 500)
+
+    downgrade = CostGuard(max_digits=50, max_exponent=1000, policy='downgrade')
+    assert downgrade.check("power", Decimal(2), Decimal("0.5"), 500) == 50
+    assert downgrade.stats()['downgraded'] == 1
+
+def test_stats(guard):
+
+    guard.check("add", Decimal(1), Decimal(1), 20)
+    guard.check("power", Decimal(2), Decimal(2), 20)
+
+    assert guard.stats() == {
+        'checked': 1,
+        'rejected': 0,
+        'downgraded': 0,
+        'policy': 'reject',
+        'max_digits': 50,
+        'max_exponent': 1000
+    }
+
+def test_invalid_guard():
+
+    with pytest.raises(ValueError, match="Cost limits must be greater than 0"):
+
+        CostGuard(0, 1000)
+
+    with pytest.raises(ValueError, match="Unknown cost policy: ignore"):
+
+        CostGuard(50, 1000, 'ignore')
+
+@pytest.mark.parametrize("operation, num1, num2", [
+    ("percentage calculation", "1234567890123456789012", "1e-20"),
+    ("percentage calculation", "999", "1"),
+    ("percentage calculation", "1", "999"),
+    ("divide", "999", "1"),
+    ("multiply", "999", "999"),
+    ("add", "999", "1"),
+    ("power", "2", "50")
+])
+def test_estimated_exponent_is_an_upper_bound(operation, num1, num2):
+
+    num1, num2 = Decimal(num1), Decimal(num2)
+    result = OperationFactory.dispatch[operation](num1, num2)
+
+    assert estimated_exponent(operation, num1, num2) >= result.adjusted()
+
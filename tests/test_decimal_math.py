@@ -0,0 +1,70 @@
+## test_decimal_math.py
+## IS 601 Midterm
+## Evan Garvey
+
+from decimal import Decimal, localcontext
+import pytest
+
+from app.decimal_math import integer_root, nth_root
+
+
+def reference_root(x: Decimal, n: Decimal, precision: int) -> Decimal:
+
+    with localcontext() as ctx:
+
+        ctx.prec = precision + 30
+        root = (x.ln() / n).exp()
+
+    with localcontext() as ctx:
+
+        ctx.prec = precision
+        return +root
+
+@pytest.mark.parametrize("value, n, expected", [
+    (0, 3, 0),
+    (1, 5, 1),
+    (26, 3, 2),
+    (27, 3, 3),
+    (10 ** 40, 4, 10 ** 10),
+    (2 ** 64 - 1, 2, 2 ** 32 - 1),
+    (3 ** 100, 100, 3),
+    (5, 64, 1)
+])
+def test_integer_root(value, n, expected):
+
+    assert integer_root(value, n) == expected
+
+@pytest.mark.parametrize("x, n, expected", [
+    ("16", "2", "4"),
+    ("0.008", "3", "0.2"),
+    ("1E+100", "4", "1E+25"),
+    ("1048576", "20", "2"),
+    ("81", "-2", "0.1111111111111111111111111111"),
+    ("2", "1", "2")
+])
+def test_nth_root_exact(x, n, expected):
+
+    assert nth_root(Decimal(x), Decimal(n)) == Decimal(expected)
+
+@pytest.mark.parametrize("precision", [10, 28, 50, 200])
+@pytest.mark.parametrize("x, n", [("2", "2"), ("12345.678", "3"), ("98765", "17"), ("0.5", "-3"), ("1.5", "2.5"), ("7", "1000")])
+def test_nth_root_is_correctly_rounded(precision, x, n):
+
+    x, n = Decimal(x), Decimal(n)
+
+    with localcontext() as ctx:
+
+        ctx.prec = precision
+        root = nth_root(x, n)
+
+    assert root == reference_root(x, n, precision)
+    assert len(root.as_tuple().digits) <= precision
+
+def test_nth_root_leaves_context_alone():
+
+    with localcontext() as ctx:
+
+        ctx.prec = 12
+        nth_root(Decimal("2"), Decimal("3"))
+
+        assert ctx.prec == 12
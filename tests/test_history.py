@@ -1,10 +1,11 @@
+import datetime
 from pathlib import Path
 import tempfile
 from app.logger import CalculationLogger
 import pytest
-from unittest.mock import Mock, call, patch
+from unittest.mock import MagicMock, Mock, call, patch
 from app.calculation import Calculation
-from app.history import LoggingObserver, AutoSaveObserver
+from app.history import HistoryObserver, LoggingObserver, AutoSaveObserver, StorageObserver
 from app.calculator import Calculator
 from app.calculator_config import CalculatorConfig
 
@@ -22,7 +23,7 @@ def test_logging_observer_logs_calculation(logging_info_mock):
     observer = LoggingObserver(test_logger)
     observer.update(calculation_mock)
     logging_info_mock.assert_called_once_with(
-        20, 'History updated: addition, (5, 3) = 8'
+        20, 'History updated: %s, (%s, %s) = %s', 'addition', 5, 3, 8
     )
 
 def test_logging_observer_no_calculation():
@@ -100,16 +101,16 @@ def test_update_message_suite():
     logger_mock = Mock()
     observer = LoggingObserver(logger_mock)
 
-    observer.update_message(20, 'History updated: addition, (5, 3) = 8')
+    observer.update_message(20, 'History updated: %s, (%s, %s) = %s', 'addition', 5, 3, 8)
     observer.update_message(30, 'Warning: This is a warning message')
     observer.update_message(40, 'Error: This is an error message')
     observer.update_message(50030, 'Unknown log level: 50030')
 
-    logger_mock.log_info.assert_called_once_with('History updated: addition, (5, 3) = 8')
+    logger_mock.log_info.assert_called_once_with('History updated: %s, (%s, %s) = %s', 'addition', 5, 3, 8)
     logger_mock.log_warning.assert_called_once_with('Warning: This is a warning message')
     logger_mock.log_error.assert_has_calls([
         call('Error: This is an error message'),
-        call('Invalid level: 50030')
+        call('Invalid level: %s', 50030)
     ])
     assert logger_mock.log_error.call_count == 2
 
@@ -134,4 +135,157 @@ def test_autosave_observer_writes_csv():
         assert "2" in content
         assert "3" in content
 
-    tmp_path.unlink()  # Remove temp file after test
\ No newline at end of file
+    tmp_path.unlink()  # Remove temp file after test
+
+def make_calculation_mock(operation="add", num1=1, num2=2, result=3):
+
+    calc_mock = Mock(spec=Calculation)
+    calc_mock.operation = operation
+    calc_mock.num1 = num1
+    calc_mock.num2 = num2
+    calc_mock.result = result
+    calc_mock.timestamp = datetime.datetime(2024, 7, 4, 12, 0, 0)
+    return calc_mock
+
+def test_autosave_append_writes_header_once(tmp_path):
+
+    csv_path = tmp_path / "history.csv"
+
+    with AutoSaveObserver(str(csv_path), append=True) as observer:
+
+        observer.update(make_calculation_mock())
+        observer.update(make_calculation_mock("multiply", 2, 3, 6))
+
+    ## A second observer on the same file must not repeat the header
+
+    with AutoSaveObserver(str(csv_path), append=True) as observer:
+
+        observer.update(make_calculation_mock("subtract", 5, 3, 2))
+
+    lines = csv_path.read_text().splitlines()
+    assert lines == [
+        "operation,num1,num2,result,timestamp",
+        "add,1,2,3,2024-07-04T12:00:00",
+        "multiply,2,3,6,2024-07-04T12:00:00",
+        "subtract,5,3,2,2024-07-04T12:00:00",
+    ]
+
+@patch("pandas.DataFrame.to_csv")
+def test_autosave_append_does_not_rewrite(mock_to_csv, tmp_path):
+
+    observer = AutoSaveObserver(str(tmp_path / "history.csv"), append=True)
+    observer.update(make_calculation_mock())
+    observer.close()
+
+    mock_to_csv.assert_not_called()
+
+def test_autosave_append_flush_policy(tmp_path):
+
+    csv_path = tmp_path / "history.csv"
+    observer = AutoSaveObserver(str(csv_path), append=True, flush_every=2)
+
+    observer.update(make_calculation_mock())
+    assert csv_path.read_text() == ""
+
+    observer.update(make_calculation_mock())
+    assert len(csv_path.read_text().splitlines()) == 3
+
+    observer.update(make_calculation_mock())
+    observer.close()
+    assert len(csv_path.read_text().splitlines()) == 4
+
+def test_autosave_append_fsync(tmp_path):
+
+    observer = AutoSaveObserver(str(tmp_path / "history.csv"), append=True, fsync=True)
+
+    with patch("app.history.os.fsync") as mock_fsync:
+
+        observer.update(make_calculation_mock())
+        observer.close()
+
+    assert mock_fsync.call_count == 2
+
+def test_autosave_close_is_idempotent(tmp_path):
+
+    observer = AutoSaveObserver(str(tmp_path / "history.csv"), append=True)
+    observer.close()
+    observer.flush()
+
+    observer.update(make_calculation_mock())
+    observer.close()
+    observer.close()
+
+    assert (tmp_path / "history.csv").exists()
+
+def test_logging_observer_batch_logs_once():
+
+    logger_mock = Mock()
+    observer = LoggingObserver(logger_mock)
+
+    observer.update_batch([make_calculation_mock(), make_calculation_mock(num1=4, result=6)])
+    observer.update_batch([])
+
+    logger_mock.log_info.assert_called_once_with(
+        "History updated: batch of %d calculations, first %s (%s, %s) = %s", 2, 'add', 1, 2, 3
+    )
+
+def test_autosave_append_batch(tmp_path):
+
+    csv_path = tmp_path / "history.csv"
+
+    with AutoSaveObserver(str(csv_path), append=True, flush_every=5) as observer:
+
+        observer.update_batch([make_calculation_mock(num1=i) for i in range(3)])
+
+    assert len(csv_path.read_text().splitlines()) == 4
+
+@patch("pandas.DataFrame.to_csv")
+def test_autosave_rewrite_batch_saves_once(mock_to_csv):
+
+    observer = AutoSaveObserver("batch.csv")
+    observer.update_batch([make_calculation_mock(num1=i) for i in range(3)])
+
+    mock_to_csv.assert_called_once_with("batch.csv", index=False)
+    assert len(observer.df) == 3
+
+def test_observer_default_batch_calls_update():
+
+    class RecordingObserver(HistoryObserver):
+
+        def __init__(self):
+
+            self.seen = []
+
+        def update(self, calculation):
+
+            self.seen.append(calculation)
+
+    observer = RecordingObserver()
+    calcs = [make_calculation_mock(), make_calculation_mock()]
+    observer.update_batch(calcs)
+
+    assert observer.seen == calcs
+
+def test_storage_observer_buffers_and_flushes():
+
+    storage = MagicMock()
+    observer = StorageObserver(storage, flush_every=2)
+    first, second, third = (make_calculation_mock() for _ in range(3))
+
+    observer.update(first)
+    storage.append.assert_not_called()
+
+    observer.update(second)
+    storage.append.assert_called_once_with([first, second])
+
+    observer.update_batch([third])
+    observer.update_message(20, "ignored")
+    observer.close()
+    storage.append.assert_called_with([third])
+    assert storage.append.call_count == 2
+
+def test_storage_observer_rejects_none():
+
+    with pytest.raises(AttributeError, match="Calculation cannot be None"):
+
+        StorageObserver(MagicMock()).update(None)
@@ -0,0 +1,88 @@
+## test_history_buffer.py
+## IS 601 Midterm
+## Evan Garvey
+
+from unittest.mock import Mock
+import pytest
+
+from app.calculation import Calculation
+from app.history_buffer import HistoryBuffer
+
+
+def make_calcs(count):
+
+    ## Builds a list of distinct calculation mocks
+
+    return [Mock(spec=Calculation, name=f"calc{i}") for i in range(count)]
+
+def test_append_evicts_oldest():
+
+    calcs = make_calcs(3)
+    buffer = HistoryBuffer(2)
+
+    assert buffer.append(calcs[0]) is None
+    assert buffer.append(calcs[1]) is None
+    assert buffer.append(calcs[2]) is calcs[0]
+    assert buffer == [calcs[1], calcs[2]]
+
+def test_init_keeps_newest_entries():
+
+    calcs = make_calcs(4)
+    buffer = HistoryBuffer(2, calcs)
+
+    assert len(buffer) == 2
+    assert buffer.copy() == calcs[2:]
+
+def test_invalid_capacity():
+
+    with pytest.raises(ValueError, match="History capacity must be greater than 0"):
+
+        HistoryBuffer(0)
+
+def test_extend_returns_evicted():
+
+    calcs = make_calcs(5)
+    buffer = HistoryBuffer(3, calcs[:2])
+
+    assert buffer.extend(calcs[2:]) == calcs[:2]
+    assert buffer == calcs[2:]
+
+def test_restore_front_and_back():
+
+    calcs = make_calcs(4)
+    buffer = HistoryBuffer(3, calcs[2:])
+
+    buffer.extendleft(calcs[:2])
+    assert buffer == calcs
+
+    assert buffer.pop() is calcs[3]
+    assert buffer.popleft() is calcs[0]
+    assert buffer == calcs[1:3]
+
+def test_indexing_and_slicing():
+
+    calcs = make_calcs(4)
+    buffer = HistoryBuffer(4, calcs)
+
+    assert buffer[0] is calcs[0]
+    assert buffer[-1] is calcs[3]
+    assert buffer[1:3] == calcs[1:3]
+    assert buffer[::-1] == calcs[::-1]
+    assert list(reversed(buffer)) == calcs[::-1]
+
+def test_equality():
+
+    calcs = make_calcs(2)
+
+    assert HistoryBuffer(2, calcs) == HistoryBuffer(5, calcs)
+    assert HistoryBuffer(2, calcs) == tuple(calcs)
+    assert HistoryBuffer(2) == []
+    assert HistoryBuffer(2).__eq__("not a history") is NotImplemented
+
+def test_clear():
+
+    buffer = HistoryBuffer(2, make_calcs(2))
+    buffer.clear()
+
+    assert len(buffer) == 0
+    assert "HistoryBuffer(capacity=2" in repr(buffer)
@@ -0,0 +1,61 @@
+## test_history_convert.py
+## IS 601 Midterm
+## Evan Garvey
+
+import datetime
+from decimal import Decimal
+import pytest
+
+from app.calculation import Calculation
+from app.history_convert import binary_to_csv, csv_to_binary, is_binary_history, main
+from app.history_storage import BinaryHistoryStorage, CsvHistoryStorage
+
+
+@pytest.fixture
+def calculations():
+
+    start = datetime.datetime(2024, 1, 1)
+    return [
+        Calculation("divide", Decimal(i + 1), Decimal(3), timestamp=start + datetime.timedelta(seconds=i))
+        for i in range(20)
+    ]
+
+def test_round_trip(tmp_path, calculations):
+
+    CsvHistoryStorage(tmp_path / "in.csv").save(calculations)
+
+    assert csv_to_binary(tmp_path / "in.csv", tmp_path / "history.bin") == 20
+    assert is_binary_history(tmp_path / "history.bin")
+    assert BinaryHistoryStorage(tmp_path / "history.bin").load_recent(0) == calculations
+
+    assert binary_to_csv(tmp_path / "history.bin", tmp_path / "out.csv") == 20
+    assert not is_binary_history(tmp_path / "out.csv")
+    assert (tmp_path / "out.csv").read_text() == (tmp_path / "in.csv").read_text()
+
+def test_invalid_row(tmp_path):
+
+    source = tmp_path / "in.csv"
+    source.write_text("operation,num1,num2,result,timestamp\nadd,1,two,3,2024-01-01T00:00:00\n")
+
+    with pytest.raises(ValueError, match="Invalid history row on line 2"):
+
+        csv_to_binary(source, tmp_path / "history.bin")
+
+    assert not (tmp_path / "history.bin").exists()
+
+def test_main(tmp_path, calculations, capsys):
+
+    CsvHistoryStorage(tmp_path / "in.csv").save(calculations)
+
+    assert main([str(tmp_path / "in.csv"), str(tmp_path / "history.bin")]) == 0
+    assert main([str(tmp_path / "history.bin"), str(tmp_path / "out.csv")]) == 0
+
+    out = capsys.readouterr().out
+    assert "Converted 20 calculations from CSV to binary" in out
+    assert "Converted 20 calculations from binary to CSV" in out
+
+def test_main_errors(tmp_path, capsys):
+
+    assert main([]) == 2
+    assert main([str(tmp_path / "missing.csv"), str(tmp_path / "history.bin")]) == 1
+    assert "Error converting history" in capsys.readouterr().err
@@ -0,0 +1,194 @@
+## test_history_storage.py
+## IS 601 Midterm
+## Evan Garvey
+
+import datetime
+from decimal import Decimal
+import sqlite3
+import pytest
+
+from app.calculation import Calculation
+from app.history_storage import (
+    BINARY_MAGIC, BinaryHistoryStorage, CsvHistoryStorage, HistoryStorageFactory, SqliteHistoryStorage,
+    _read_csv_tail, decode_record, encode_record
+)
+
+
+def make_calculations(count, operation="add", start=datetime.datetime(2024, 1, 1)):
+
+    return [
+        Calculation(operation, Decimal(i), Decimal("0.5"), timestamp=start + datetime.timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+@pytest.fixture(params=["csv", "sqlite", "binary"])
+def storage(request, tmp_path):
+
+    storage = HistoryStorageFactory.create(request.param, tmp_path / f"history.{request.param}")
+    yield storage
+    storage.close()
+
+def test_read_csv_tail_small_blocks(tmp_path):
+
+    ## Test the backwards reader across block boundaries and files shorter than the tail
+
+    path = tmp_path / "history.csv"
+    path.write_text("header\n" + "".join(f"row{i}\n" for i in range(10)))
+
+    assert _read_csv_tail(path, 3, block_size=4) == "header\nrow7\nrow8\nrow9\n"
+    assert _read_csv_tail(path, 50, block_size=4) == "header\n" + "".join(f"row{i}\n" for i in range(10))
+
+    path.write_text("header\n")
+    assert _read_csv_tail(path, 3) == "header\n"
+
+def test_save_and_load_recent(storage):
+
+    calculations = make_calculations(10)
+
+    assert not storage.exists()
+    storage.save(calculations)
+    assert storage.exists()
+
+    assert storage.load_recent(3) == calculations[-3:]
+    assert storage.load_recent(0) == calculations
+    assert storage.load_recent(3)[0].timestamp == calculations[7].timestamp
+
+def test_save_replaces_and_append_adds(storage):
+
+    storage.save(make_calculations(5))
+    storage.save(make_calculations(2))
+    storage.append(make_calculations(1, operation="multiply"))
+
+    loaded = storage.load_recent(0)
+    assert [c.operation for c in loaded] == ["add", "add", "multiply"]
+
+def test_save_empty(storage):
+
+    storage.save([])
+
+    assert storage.exists()
+    assert storage.load_recent(5) == []
+
+def test_append_to_new_storage(storage):
+
+    storage.append(make_calculations(2))
+
+    assert storage.load_recent(5) == make_calculations(2)
+
+def test_decimals_round_trip_exactly(storage):
+
+    calculation = Calculation("divide", Decimal("1"), Decimal("3"))
+    storage.save([calculation])
+
+    assert storage.load_recent(1)[0].result == calculation.result
+
+def test_query(storage):
+
+    storage.save(make_calculations(5) + make_calculations(5, operation="power", start=datetime.datetime(2024, 2, 1)))
+
+    assert len(storage.query(operation="power")) == 5
+    assert len(storage.query(since=datetime.datetime(2024, 1, 1, 0, 3))) == 7
+    assert len(storage.query(operation="add", until=datetime.datetime(2024, 1, 1, 0, 1))) == 2
+
+    newest = storage.query(operation="add", limit=2)
+    assert [c.num1 for c in newest] == [Decimal(3), Decimal(4)]
+
+def test_query_missing_storage(tmp_path):
+
+    assert CsvHistoryStorage(tmp_path / "missing.csv").query(operation="add") == []
+
+def test_sqlite_uses_wal_and_indexes(tmp_path):
+
+    storage = SqliteHistoryStorage(tmp_path / "history.db")
+    storage.append(make_calculations(1))
+    storage.close()
+
+    connection = sqlite3.connect(tmp_path / "history.db")
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    indexes = {row[1] for row in connection.execute("PRAGMA index_list(history)")}
+    assert {"idx_history_operation", "idx_history_timestamp"} <= indexes
+
+    plan = connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM history WHERE operation = ?", ("add",)
+    ).fetchall()
+    assert "idx_history_operation" in str(plan)
+    connection.close()
+
+def test_sqlite_reopens_after_close(tmp_path):
+
+    storage = SqliteHistoryStorage(tmp_path / "history.db")
+    storage.append(make_calculations(1))
+    storage.close()
+    storage.append(make_calculations(1))
+
+    assert len(storage.load_recent(0)) == 2
+    storage.close()
+
+def test_unknown_backend(tmp_path):
+
+    with pytest.raises(ValueError, match="Unknown history backend: xml"):
+
+        HistoryStorageFactory.create("xml", tmp_path / "history.xml")
+
+def test_binary_record_round_trip():
+
+    timestamp = datetime.datetime(2024, 7, 4, 12, 30, 15, 123456)
+    record = encode_record("power", "2", "0.5", "1.414213562373095048801688724", timestamp)
+    calculation, end = decode_record(BINARY_MAGIC + record, len(BINARY_MAGIC))
+
+    assert end == len(BINARY_MAGIC) + len(record)
+    assert calculation.operation == "power"
+    assert calculation.result == Decimal("1.414213562373095048801688724")
+    assert calculation.timestamp == timestamp
+
+def test_binary_inline_operation_name():
+
+    record = encode_record("mean µ", "1", "3", "2", datetime.datetime(2024, 1, 1))
+    calculation, _ = decode_record(record, 0)
+
+    assert calculation.operation == "mean µ"
+    assert calculation.num2 == Decimal("3")
+
+def test_binary_aware_timestamp_stored_as_utc():
+
+    eastern = datetime.timezone(datetime.timedelta(hours=-5))
+    record = encode_record("add", "1", "1", "2", datetime.datetime(2024, 1, 1, 7, tzinfo=eastern))
+
+    assert decode_record(record, 0)[0].timestamp == datetime.datetime(2024, 1, 1, 12)
+
+def test_binary_rejects_oversized_values():
+
+    with pytest.raises(ValueError, match="too large"):
+
+        encode_record("add", "1" * 70000, "1", "1", datetime.datetime(2024, 1, 1))
+
+def test_binary_is_smaller_than_csv(tmp_path):
+
+    calculations = make_calculations(100)
+    CsvHistoryStorage(tmp_path / "history.csv").save(calculations)
+    BinaryHistoryStorage(tmp_path / "history.bin").save(calculations)
+
+    assert (tmp_path / "history.bin").stat().st_size < (tmp_path / "history.csv").stat().st_size
+
+def test_binary_rejects_other_files(tmp_path):
+
+    path = tmp_path / "history.bin"
+    path.write_text("operation,num1,num2,result,timestamp\n")
+
+    with pytest.raises(ValueError, match="Not a binary history file"):
+
+        BinaryHistoryStorage(path).load_recent(5)
+
+    with pytest.raises(ValueError, match="Not a binary history file"):
+
+        list(BinaryHistoryStorage(path).iter_all())
+
+def test_binary_detects_corruption(tmp_path):
+
+    path = tmp_path / "history.bin"
+    path.write_bytes(BINARY_MAGIC + b"\x01\x02\xff\xff")
+
+    with pytest.raises(ValueError, match="Corrupt binary history file"):
+
+        BinaryHistoryStorage(path).load_recent(5)
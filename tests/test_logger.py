@@ -2,11 +2,16 @@
 ## IS 601 Midterm
 ## Evan Garvey
 
+import gzip
+import logging
+import threading
+import time
 from unittest.mock import patch
 import pytest
 
 from app.calculator_config import CalculatorConfig
-from app.logger import CalculationLogger
+from app import logger as logger_module
+from app.logger import BoundedQueueHandler, CalculationLogger, CompressingRotatingFileHandler
 
 
 class MockLogger(CalculationLogger):
@@ -22,21 +27,21 @@ class MockLogger(CalculationLogger):
 
         super().__init__()
 
-    def log_info(self, message: str) -> None:
+    def log_info(self, message: str, *args) -> None:
 
-        self.info_messages.append(message)
+        self.info_messages.append(message % args)
 
-    def log_warning(self, message: str) -> None:
+    def log_warning(self, message: str, *args) -> None:
 
-        self.warning_messages.append(message)
+        self.warning_messages.append(message % args)
 
-    def log_error(self, message: str) -> None:
+    def log_error(self, message: str, *args) -> None:
 
-        self.error_messages.append(message)
+        self.error_messages.append(message % args)
 
-    def _log(self, level: int, message: str) -> None:
+    def _log(self, level: int, message: str, *args) -> None:
 
-        super()._log(level, message)
+        super()._log(level, message, *args)
     
 class TestMockLogger:
 
@@ -44,6 +49,10 @@ class TestMockLogger:
 
         self.logger = MockLogger()
 
+    def teardown_method(self):
+
+        self.logger.close()
+
     def test_setup_success(self):
 
         self.logger.setup_logging()
@@ -60,13 +69,14 @@ class TestMockLogger:
 
     def test_log_init_failure(self):
 
-        side_effects = [Exception("Mock logging failure"), None]
-
-        with patch("logging.basicConfig", side_effect = side_effects):
+        with patch("app.logger.CompressingRotatingFileHandler", side_effect = Exception("Mock logging failure")):
 
-            with pytest.raises(Exception, match = "Could not initialize logger:"):
+            with pytest.raises(Exception, match = "Could not initialize logger: Mock logging failure"):
 
                 self.logger.setup_logging()
+
+        assert self.logger.queue_handler is None
+        assert self.logger.logger.level == logging.WARNING
     
     def test_arbitrary_log(self):
 
@@ -85,3 +95,260 @@ class TestMockLogger:
         self.logger._log(400020, "Wildly incorrect log code")
         assert Exception
 
+
+class GatedHandler(logging.Handler):
+
+    ## Collects messages, but only once the gate is opened
+
+    def __init__(self):
+
+        super().__init__()
+        self.gate = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+
+        self.gate.wait()
+        self.messages.append(self.format(record))
+
+def make_record(message, *args):
+
+    return logging.LogRecord('test', logging.INFO, __file__, 0, message, args, None)
+
+def test_queue_handler_writes_on_close():
+
+    target = GatedHandler()
+    target.gate.set()
+    handler = BoundedQueueHandler(8, target)
+
+    for i in range(5):
+
+        handler.handle(make_record("record %d", i))
+
+    handler.close()
+
+    assert target.messages == [f"record {i}" for i in range(5)]
+    assert handler.stats() == {'enqueued': 5, 'dropped': 0, 'depth': 0, 'max_size': 8}
+
+def test_queue_handler_drops_when_full():
+
+    ## The listener holds one record while blocked, so the queue fills after 1 + max_size records
+
+    target = GatedHandler()
+    handler = BoundedQueueHandler(2, target)
+
+    for i in range(10):
+
+        handler.handle(make_record("record %d", i))
+
+    assert handler.dropped >= 7
+    assert handler.enqueued + handler.dropped == 10
+
+    target.gate.set()
+    handler.close()
+
+    assert len(target.messages) == handler.enqueued
+
+def test_queue_handler_formats_off_the_calling_thread():
+
+    target = GatedHandler()
+    target.gate.set()
+    handler = BoundedQueueHandler(8, target)
+    record = make_record("%s + %s", 1, 2)
+
+    handler.handle(record)
+    handler.close()
+
+    assert record.args == (1, 2)
+    assert target.messages == ["1 + 2"]
+
+def test_queue_handler_invalid_size():
+
+    with pytest.raises(ValueError, match="Log queue size must be greater than 0"):
+
+        BoundedQueueHandler(0)
+
+def test_logger_close_flushes_and_detaches(tmp_path, monkeypatch):
+
+    log_file = tmp_path / 'calculator.log'
+    monkeypatch.setenv('CALCULATOR_LOG_FILE', str(log_file))
+
+    logger = CalculationLogger()
+    assert logger.stats() is None
+
+    logger.setup_logging()
+    logger.log_info("queued message")
+    handler = logger.queue_handler
+    logger.close()
+
+    assert "Info: queued message" in log_file.read_text()
+    assert handler not in logger.logger.handlers
+    assert handler.stats()['enqueued'] == 2
+    assert logger.stats() is None
+
+    logger.close()
+
+def test_log_formats_only_enabled_levels(monkeypatch):
+
+    ## A message below the logger's level is dropped before its arguments are turned into strings
+
+    class Counted:
+
+        formatted = 0
+
+        def __str__(self):
+
+            Counted.formatted += 1
+            return "counted"
+
+    target = GatedHandler()
+    target.gate.set()
+    test_logger = logging.getLogger('test_lazy_logging')
+    test_logger.propagate = False
+    test_logger.setLevel(logging.WARNING)
+    test_logger.addHandler(target)
+
+    logger = CalculationLogger()
+    monkeypatch.setattr(logger, 'logger', test_logger)
+
+    logger.log_info("History updated: %s", Counted())
+    assert Counted.formatted == 0
+    assert target.messages == []
+
+    logger.log_warning("Precision loss in %s", Counted())
+    assert Counted.formatted == 1
+    assert target.messages == ["Warning: Precision loss in counted"]
+
+    test_logger.removeHandler(target)
+
+def test_rotation_by_size_compresses_backups(tmp_path):
+
+    log_file = tmp_path / 'calculator.log'
+    handler = CompressingRotatingFileHandler(str(log_file), max_bytes=100, backup_count=2)
+
+    for i in range(12):
+
+        handler.handle(make_record("line %02d %s", i, "x" * 21))
+
+    handler.close()
+
+    ## 30 bytes a line and 100 bytes a file: three lines per file, the oldest rotated files are discarded
+
+    assert handler.rotations == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'calculator.log', 'calculator.log.1.gz', 'calculator.log.2.gz'
+    ]
+    assert "line 11" in log_file.read_text()
+    assert "line 08" in gzip.decompress((tmp_path / 'calculator.log.1.gz').read_bytes()).decode()
+    assert "line 05" in gzip.decompress((tmp_path / 'calculator.log.2.gz').read_bytes()).decode()
+
+def test_rotation_by_interval(tmp_path):
+
+    log_file = tmp_path / 'calculator.log'
+    handler = CompressingRotatingFileHandler(str(log_file), interval=3600, backup_count=1)
+
+    handler.handle(make_record("before"))
+    assert handler.rotations == 0
+
+    handler.rollover_at -= 3600
+    handler.handle(make_record("after"))
+    handler.close()
+
+    assert handler.rotations == 1
+    assert handler.rollover_at > 0
+    assert log_file.read_text() == "after\n"
+    assert gzip.decompress((tmp_path / 'calculator.log.1.gz').read_bytes()) == b"before\n"
+
+def test_setup_uses_rotation_settings(tmp_path, monkeypatch):
+
+    monkeypatch.setenv('CALCULATOR_LOG_FILE', str(tmp_path / 'calculator.log'))
+    monkeypatch.setenv('CALCULATOR_LOG_MAX_BYTES', '1234')
+    monkeypatch.setenv('CALCULATOR_LOG_BACKUP_COUNT', '3')
+
+    logger = CalculationLogger()
+    logger.setup_logging()
+    file_handler, = logger.queue_handler.handlers
+    logger.close()
+
+    assert isinstance(file_handler, CompressingRotatingFileHandler)
+    assert file_handler.maxBytes == 1234
+    assert file_handler.backupCount == 3
+    assert file_handler.rollover_at is None
+
+def test_sessions_have_their_own_loggers(tmp_path, monkeypatch):
+
+    ## Sessions get separate loggers, leave the root logger alone, and share one handler per log file
+
+    monkeypatch.setenv('CALCULATOR_LOG_FILE', str(tmp_path / 'calculator.log'))
+    config = CalculatorConfig()
+    root_handlers = list(logging.getLogger().handlers)
+
+    first = CalculationLogger(config, "first")
+    second = CalculationLogger(config, "second")
+    first.setup_logging()
+    second.setup_logging()
+
+    assert first.logger is not second.logger
+    assert first.queue_handler is second.queue_handler
+    assert logging.getLogger().handlers == root_handlers
+    assert "calculator.first" not in logging.Logger.manager.loggerDict
+
+    first.log_info("from %s", "first")
+    first.close()
+
+    ## The file stays open for the second session
+
+    second.log_info("from %s", "second")
+    handler = second.queue_handler
+    second.close()
+
+    lines = (tmp_path / 'calculator.log').read_text().splitlines()
+    assert any("calculator.first - INFO - Info: from first" in line for line in lines)
+    assert any("calculator.second - INFO - Info: from second" in line for line in lines)
+    assert handler._listener is None
+    assert str(tmp_path / 'calculator.log') not in logger_module._shared_handlers
+
+def test_setup_uses_log_level(tmp_path, monkeypatch):
+
+    monkeypatch.setenv('CALCULATOR_LOG_FILE', str(tmp_path / 'calculator.log'))
+    logger = CalculationLogger(CalculatorConfig(log_level='WARNING'), "quiet")
+    logger.setup_logging()
+
+    assert logger.logger.level == logging.WARNING
+    logger.log_info("skipped")
+    logger.log_warning("kept")
+    logger.close()
+
+    lines = (tmp_path / 'calculator.log').read_text().splitlines()
+    assert [line.split(" - ", 1)[1] for line in lines] == ["calculator.quiet - WARNING - Warning: kept"]
+
+def test_thousand_sessions_setup_time(tmp_path, monkeypatch):
+
+    ## 1,000 sessions in one process: one handler and one writer thread between them,
+    ## and setting a session up costs no more than building its logger
+
+    monkeypatch.setenv('CALCULATOR_LOG_FILE', str(tmp_path / 'calculator.log'))
+    config = CalculatorConfig()
+    threads = threading.active_count()
+
+    start = time.perf_counter()
+    sessions = [CalculationLogger(config, f"session-{i}") for i in range(1000)]
+
+    for session in sessions:
+
+        session.setup_logging()
+
+    elapsed = time.perf_counter() - start
+
+    assert len({id(session.queue_handler) for session in sessions}) == 1
+    assert threading.active_count() <= threads + 1
+    assert elapsed < 2, f"1,000 sessions took {elapsed:.3f}s to set up"
+
+    for session in sessions:
+
+        session.close()
+
+    assert threading.active_count() <= threads
+    lines = (tmp_path / 'calculator.log').read_text().splitlines()
+    assert len(lines) == 1000
+    assert len({line.split(' - ')[1] for line in lines}) == 1000
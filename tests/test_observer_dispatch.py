@@ -0,0 +1,106 @@
+## test_observer_dispatch.py
+## IS 601 Midterm
+## Evan Garvey
+
+import threading
+import pytest
+
+from app.observer_dispatch import AsyncDispatcher
+
+
+def blocked_dispatcher(max_size, policy):
+
+    ## Returns a dispatcher whose worker is stuck on a first call until the event is set
+
+    gate = threading.Event()
+    started = threading.Event()
+
+    def hold():
+
+        started.set()
+        gate.wait(5)
+
+    dispatcher = AsyncDispatcher(max_size, policy)
+    dispatcher.submit(hold)
+    started.wait(5)
+
+    return dispatcher, gate
+
+def test_calls_are_delivered_in_order():
+
+    seen = []
+    dispatcher = AsyncDispatcher(4)
+
+    for i in range(20):
+
+        dispatcher.submit(seen.append, i)
+
+    dispatcher.drain()
+
+    assert seen == list(range(20))
+    assert dispatcher.stats()['dispatched'] == 20
+    assert dispatcher.depth == 0
+
+    dispatcher.close()
+
+def test_drop_newest():
+
+    seen = []
+    dispatcher, gate = blocked_dispatcher(2, 'drop_newest')
+
+    assert dispatcher.submit(seen.append, 1)
+    assert dispatcher.submit(seen.append, 2)
+    assert not dispatcher.submit(seen.append, 3)
+
+    gate.set()
+    dispatcher.close()
+
+    assert seen == [1, 2]
+    assert dispatcher.dropped == 1
+    assert dispatcher.max_depth == 2
+
+def test_drop_oldest():
+
+    seen = []
+    dispatcher, gate = blocked_dispatcher(2, 'drop_oldest')
+
+    for i in range(1, 5):
+
+        assert dispatcher.submit(seen.append, i)
+
+    gate.set()
+    dispatcher.close()
+
+    assert seen == [3, 4]
+    assert dispatcher.dropped == 2
+
+def test_errors_are_counted_not_raised(caplog):
+
+    def boom():
+
+        raise RuntimeError("observer broke")
+
+    dispatcher = AsyncDispatcher(4)
+    dispatcher.submit(boom)
+    dispatcher.close()
+
+    assert dispatcher.errors == 1
+    assert "Observer notification failed" in caplog.text
+
+def test_close_is_idempotent():
+
+    dispatcher = AsyncDispatcher(4)
+    dispatcher.close()
+    dispatcher.close()
+
+    assert not dispatcher._worker.is_alive()
+
+def test_invalid_arguments():
+
+    with pytest.raises(ValueError, match="Unknown backpressure policy: spill"):
+
+        AsyncDispatcher(4, 'spill')
+
+    with pytest.raises(ValueError, match="Queue size must be greater than 0"):
+
+        AsyncDispatcher(0)
@@ -287,10 +287,118 @@ class TestOperationFactory:
 
             OperationFactory.register("invalid_operation", TestOp)
 
+    def test_create_returns_shared_instances(self):
+
+        assert OperationFactory.create("add") is OperationFactory.create("ADD")
+        assert OperationFactory.dispatch["add"] == OperationFactory.create("add").execute
+
+    @pytest.mark.parametrize("alias, op_class", [
+        ("int_divide", IntegerDivision),
+        ("percent", PercentageCalculation),
+        ("abs_diff", AbsoluteDifference)
+    ])
+    def test_create_from_alias(self, alias, op_class):
+
+        operation = OperationFactory.create(alias)
+
+        assert isinstance(operation, op_class)
+        assert operation is OperationFactory.create(operation.name)
+
+    def test_register_with_aliases(self):
+
+        class Halve(Operation):
+
+            def execute(self, num1: Decimal, num2: Decimal) -> Decimal:
+
+                return num1 / 2
+
+        try:
+
+            OperationFactory.register("halve", Halve, aliases=["HALF"])
+
+            assert OperationFactory.create("half") is OperationFactory.create("halve")
+            assert OperationFactory.snapshot()["halve"] == {"class": Halve, "aliases": ["half"]}
+
+        finally:
+
+            for name in ("halve", "half"):
+
+                OperationFactory._instances.pop(name)
+
+            del OperationFactory._operations["halve"]
+            del OperationFactory._aliases["half"]
+            del OperationFactory.dispatch["halve"]
+
+    def test_snapshot(self):
+
+        snapshot = OperationFactory.snapshot()
+
+        assert snapshot["integer division"] == {"class": IntegerDivision, "aliases": ["int_divide"]}
+        assert snapshot["add"]["aliases"] == []
+
+        ## The snapshot is a copy
+
+        snapshot.clear()
+        assert "add" in OperationFactory.snapshot()
+
     def test_names(self):
 
         test_factory = OperationFactory()
 
         for op_name, op_class in test_factory._operations.items():
             if op_name != "test_op":
-                assert op_name == op_class().name 
\ No newline at end of file
+                assert op_name == op_class().name 
+
+class TestVectorizedOperations:
+
+    ## The float64 implementations should agree with the Decimal ones on every valid case
+
+    operation_tests = [
+        TestAddition, TestSubtraction, TestMultiplication, TestDivision, TestPower, TestRoot,
+        TestModulo, TestIntegerDivision, TestPercentageCalculation, TestAbsoluteDifference
+    ]
+
+    def test_matches_decimal_results(self):
+
+        import numpy as np
+
+        for test in self.operation_tests:
+
+            operation = test.operation_class()
+            cases = [case for name, case in test.valid_test_cases.items() if name != "large_nums"]
+
+            num1 = np.array([float(case["num1"]) for case in cases])
+            num2 = np.array([float(case["num2"]) for case in cases])
+            expected = [float(Decimal(case["expected"])) for case in cases]
+
+            assert operation.execute_vectorized(num1, num2) == pytest.approx(expected), test.__name__
+
+    def test_same_validation_errors(self):
+
+        import numpy as np
+
+        for test in self.operation_tests:
+
+            operation = test.operation_class()
+
+            for name, case in test.invalid_test_cases.items():
+
+                num1 = np.array([1.0, float(case["num1"])])
+                num2 = np.array([1.0, float(case["num2"])])
+
+                with pytest.raises(case["error"], match = case["message"]):
+
+                    operation.execute_vectorized(num1, num2)
+
+    def test_default_falls_back_to_execute(self):
+
+        import numpy as np
+
+        class TestOp(Operation):
+
+            def execute(self, num1: Decimal, num2: Decimal) -> Decimal:
+
+                return num1 * 2 + num2
+
+        result = TestOp().execute_vectorized(np.array([1.5, 2.0]), np.array([0.25, 1.0]))
+        assert result.tolist() == [3.25, 5.0]
@@ -0,0 +1,52 @@
+## test_result_cache.py
+## IS 601 Midterm
+## Evan Garvey
+
+from decimal import Decimal
+import pytest
+
+from app.result_cache import ResultCache
+
+
+def test_get_and_put():
+
+    cache = ResultCache(2)
+
+    assert cache.get(("add", Decimal("1"), Decimal("2"))) is None
+    cache.put(("add", Decimal("1"), Decimal("2")), Decimal("3"))
+    assert cache.get(("add", Decimal("1"), Decimal("2"))) == Decimal("3")
+
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1, 'max_size': 2}
+
+def test_least_recently_used_is_evicted():
+
+    cache = ResultCache(2)
+    cache.put("a", Decimal("1"))
+    cache.put("b", Decimal("2"))
+
+    ## Touching 'a' makes 'b' the oldest
+
+    cache.get("a")
+    cache.put("c", Decimal("3"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == Decimal("1")
+    assert cache.get("c") == Decimal("3")
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+def test_clear_keeps_counters():
+
+    cache = ResultCache(2)
+    cache.put("a", Decimal("1"))
+    cache.get("a")
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.hits == 1
+
+def test_invalid_size():
+
+    with pytest.raises(ValueError, match="Cache size must be greater than 0"):
+
+        ResultCache(0)
@@ -0,0 +1,58 @@
+## test_stage_timings.py
+## IS 601 Midterm
+## Evan Garvey
+
+from app.stage_timings import STAGES, StageTimings
+
+
+def marks(*durations):
+
+    ## Builds timestamps from the time spent in each stage
+
+    times = [1000]
+    for duration in durations:
+
+        times.append(times[-1] + duration)
+
+    return times
+
+def test_record_and_snapshot():
+
+    timings = StageTimings()
+
+    for _ in range(99):
+
+        timings.record("add", marks(100, 1000, 10, 10, 10, 10))
+
+    timings.record("add", marks(100, 50000, 10, 10, 10, 10))
+
+    snapshot = timings.snapshot()
+    assert list(snapshot) == ["add"]
+    assert list(snapshot["add"]) == list(STAGES)
+
+    execute = snapshot["add"]["execute"]
+    assert execute["count"] == 100
+    assert execute["mean_ns"] == (99 * 1000 + 50000) // 100
+    assert execute["max_ns"] == 50000
+
+    ## 1000 ns falls in the bucket below 1024 ns, 50000 in the one below 65536 ns
+
+    assert execute["p50_ns"] == 1024
+    assert execute["p90_ns"] == 1024
+    assert execute["p99_ns"] == 1024
+    assert execute["buckets"] == {1024: 99, 65536: 1}
+    assert snapshot["add"]["validate"]["p99_ns"] == 100
+
+def test_snapshot_is_a_copy_and_reset():
+
+    timings = StageTimings()
+    timings.record("divide", marks(1, 2, 3, 4, 5, 6))
+
+    snapshot = timings.snapshot()
+    timings.record("divide", marks(1, 2, 3, 4, 5, 6))
+
+    assert snapshot["divide"]["undo"]["count"] == 1
+    assert timings.snapshot()["divide"]["undo"]["count"] == 2
+
+    timings.reset()
+    assert timings.snapshot() == {}
@@ -0,0 +1,35 @@
+## test_startup.py
+## IS 601 Midterm
+## Evan Garvey
+
+import pytest
+
+from benchmarks.bench_startup import DEFERRED_MODULES, ENTRY_POINTS, measure_import
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_heavy_dependencies_are_deferred(module):
+
+    _, imported = measure_import(module, runs=1)
+
+    for name in DEFERRED_MODULES:
+
+        assert name not in imported
+
+## The wall clock import budget depends on the machine, so it is checked by running
+## python -m benchmarks.bench_startup rather than here
+
+def test_pandas_is_still_available_as_attribute():
+
+    ## Code and tests that reach pandas through app.calculator keep working
+
+    import numpy
+    import pandas
+    import app.calculator
+
+    assert app.calculator.pd is pandas
+    assert app.calculator.np is numpy
+
+    with pytest.raises(AttributeError):
+
+        app.calculator.missing
@@ -0,0 +1,162 @@
+## test_structured_log.py
+## IS 601 Midterm
+## Evan Garvey
+
+import datetime
+from decimal import Decimal
+import gzip
+import json
+from unittest.mock import Mock
+
+from app.calculation import Calculation
+from app.history import LoggingObserver
+from app.structured_log import JsonLinesWriter, calculation_record, main, read_records
+
+
+def make_calculation(operation="add", num1="1", num2="2", hour=12):
+
+    calculation = Calculation(operation, Decimal(num1), Decimal(num2), timestamp=datetime.datetime(2024, 1, 1, hour))
+    calculation.latency_ns = 1500
+    return calculation
+
+def test_calculation_record():
+
+    record = calculation_record(make_calculation(num1="0.1", num2="0.2"), "abc")
+
+    assert record == {
+        'operation': 'add',
+        'num1': '0.1',
+        'num2': '0.2',
+        'result': '0.3',
+        'timestamp': '2024-01-01T12:00:00',
+        'latency_ns': 1500,
+        'session_id': 'abc'
+    }
+
+    untimed = Calculation("add", Decimal(1), Decimal(2))
+    assert calculation_record(untimed, "abc")['latency_ns'] is None
+
+def test_writer_buffers_until_flush_bytes(tmp_path):
+
+    path = tmp_path / "calculations.jsonl"
+    line_length = len(json.dumps(calculation_record(make_calculation(), "abc"))) + 1
+    writer = JsonLinesWriter(str(path), "abc", flush_bytes=line_length * 3, flush_interval=3600)
+
+    writer.write(make_calculation())
+    writer.write(make_calculation())
+    assert path.read_text() == ""
+
+    writer.write(make_calculation())
+    assert len(path.read_text().splitlines()) == 3
+    assert writer.flushes == 1
+
+    writer.write(make_calculation())
+    writer.close()
+    writer.close()
+
+    assert len(path.read_text().splitlines()) == 4
+    assert writer.written == 4
+
+def test_writer_flushes_on_interval(tmp_path):
+
+    path = tmp_path / "calculations.jsonl"
+    writer = JsonLinesWriter(str(path), "abc", flush_bytes=1 << 20, flush_interval=3600)
+
+    writer.write(make_calculation())
+    assert path.read_text() == ""
+
+    writer._deadline = 0
+    writer.write(make_calculation())
+    assert len(path.read_text().splitlines()) == 2
+    writer.close()
+
+def test_writer_appends(tmp_path):
+
+    path = tmp_path / "calculations.jsonl"
+
+    for session in ("first", "second"):
+
+        writer = JsonLinesWriter(str(path), session)
+        writer.write(make_calculation())
+        writer.close()
+
+    assert [record['session_id'] for record in read_records(str(path))] == ["first", "second"]
+
+def write_log(path, records):
+
+    opener = gzip.open if str(path).endswith('.gz') else open
+
+    with opener(path, 'wt', encoding='utf-8') as file:
+
+        for record in records:
+
+            file.write(json.dumps(record) + '\n')
+
+        file.write('\n')
+
+def sample_records():
+
+    return [
+        calculation_record(make_calculation("add", hour=9), "one"),
+        calculation_record(make_calculation("divide", "1", "3", hour=10), "one"),
+        calculation_record(make_calculation("add", "5", "5", hour=11), "two"),
+        calculation_record(make_calculation("power", "2", "10", hour=12), "two")
+    ]
+
+def test_read_records_filters(tmp_path):
+
+    path = tmp_path / "calculations.jsonl"
+    write_log(path, sample_records())
+
+    assert len(list(read_records(str(path)))) == 4
+    assert [r['result'] for r in read_records(str(path), operation="add")] == ["3", "10"]
+    assert [r['operation'] for r in read_records(str(path), session_id="two")] == ["add", "power"]
+    assert [r['operation'] for r in read_records(str(path), since="2024-01-01T10:30:00")] == ["add", "power"]
+    assert [r['result'] for r in read_records(str(path), where=lambda r: Decimal(r['result']) > 5)] == ["10", "1024"]
+    assert list(read_records(str(path), operation="add", session_id="one", since="2024-01-01T10:00:00")) == []
+
+def test_read_records_is_lazy(tmp_path):
+
+    ## Records are produced as the file is read, not collected first
+
+    path = tmp_path / "calculations.jsonl"
+    write_log(path, sample_records())
+    path.open('a').write("not json\n")
+
+    records = read_records(str(path))
+    assert next(records)['operation'] == "add"
+
+def test_read_records_gzip(tmp_path):
+
+    path = tmp_path / "calculations.jsonl.gz"
+    write_log(path, sample_records())
+
+    assert [r['operation'] for r in read_records(str(path), session_id="one")] == ["add", "divide"]
+
+def test_main_prints_matches(tmp_path, capsys):
+
+    path = tmp_path / "calculations.jsonl"
+    write_log(path, sample_records())
+
+    assert main([str(path), '--operation', 'add', '--session', 'two', '--min-latency', '1000']) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)['result'] for line in lines] == ["10"]
+
+    main([str(path), '--min-latency', '2000'])
+    assert capsys.readouterr().out == ""
+
+def test_logging_observer_writes_to_sink():
+
+    sink = Mock()
+    observer = LoggingObserver(Mock(), sink)
+    first, second = make_calculation(), make_calculation(num1="4")
+
+    observer.update(first)
+    observer.update_batch([first, second])
+    observer.flush()
+    observer.close()
+
+    assert [c.args[0] for c in sink.write.call_args_list] == [first, first, second]
+    sink.flush.assert_called_once()
+    sink.close.assert_called_once()